@@ -0,0 +1,171 @@
+import multiprocessing
+import time
+from multiprocessing import shared_memory
+import numpy as np
+import serial
+import frame_decoder
+import transports
+import session_recorder
+
+DEFAULT_CAPACITY = 1 << 16  # Rows, about a minute at 1 kHz
+RING_COLUMNS = 4  # time, roll, pitch, yaw
+
+# Header slots (int64)
+SEQUENCE, CAPACITY, STATUS, PENDING = range(4)  # PENDING: end sequence of the write in progress
+HEADER_SLOTS = 4
+
+# Values of the STATUS slot
+STARTING, RUNNING, FAILED, STOPPED = range(4)
+
+
+class SharedRing(object):
+    """Single-writer ring of (time, roll, pitch, yaw) rows in multiprocessing shared memory.
+
+    The writer announces the end of the write it is starting (PENDING), fills the rows, then publishes
+    them by bumping the sequence counter, so readers never need a lock: they copy everything between
+    their last sequence and the current one, then drop any row the writer may have been overwriting
+    while they were copying, finished or not, which PENDING bounds."""
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, name=None):
+        if name is None:
+            size = 8 * (HEADER_SLOTS + capacity * RING_COLUMNS)
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+
+        self.header = np.ndarray((HEADER_SLOTS,), dtype=np.int64, buffer=self.shm.buf)
+        if name is None:
+            self.header[:] = 0, capacity, STARTING, 0
+        self.capacity = int(self.header[CAPACITY])
+        self.rows = np.ndarray((self.capacity, RING_COLUMNS), dtype=float, buffer=self.shm.buf,
+                               offset=8 * HEADER_SLOTS)
+
+        # Reader side
+        self.read_sequence = 0
+        self.overruns = 0  # Rows lost because the reader fell more than a full ring behind
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @property
+    def sequence(self):
+        return int(self.header[SEQUENCE])
+
+    @property
+    def status(self):
+        return int(self.header[STATUS])
+
+    @status.setter
+    def status(self, value):
+        self.header[STATUS] = value
+
+    def write(self, time_point, angles):
+        """Publish an (N, 3) batch of angles that arrived at time_point"""
+        sequence = self.sequence
+        # A batch larger than the ring keeps its newest rows, but the sequence still advances by the
+        # whole batch: readers count the rows cut here as overruns, like rows the writer lapped
+        total = len(angles)
+        angles = angles[-self.capacity:]
+        self.header[PENDING] = sequence + total  # Before any row is touched, see read_new
+        index = (sequence + total - len(angles) + np.arange(len(angles))) % self.capacity
+        self.rows[index, 0] = time_point
+        self.rows[index, 1:] = angles
+        self.header[SEQUENCE] = sequence + total  # Publish only once the rows are in place
+
+    def read_new(self):
+        """Rows published since the last call. Returns (N,) times and (N, 3) angles"""
+        sequence = self.sequence
+        start = max(self.read_sequence, sequence - self.capacity)
+        batch = self.rows[np.arange(start, sequence) % self.capacity]
+
+        # The writer may have lapped the oldest rows during the copy, or be overwriting them right now
+        valid_from = min(max(start, int(self.header[PENDING]) - self.capacity), sequence)
+        batch = batch[valid_from - start:]
+        self.overruns += valid_from - self.read_sequence
+        self.read_sequence = sequence
+        return batch[:, 0], batch[:, 1:]
+
+    def close(self):
+        # Views must be released before the mapping can be closed
+        del self.header, self.rows
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
+
+
+def _acquire(ring_name, port, baudrate, record_path, threadkill):
+    """Body of the acquisition process: read, decode and publish until threadkill is set"""
+    ring = SharedRing(name=ring_name)
+    try:
+        # A read timeout lets the loop notice threadkill even when the device goes quiet
+        ser = transports.open_transport(port, baudrate, timeout=0.1)
+    except serial.serialutil.SerialException:
+        print("Connection Failed")
+        ring.status = FAILED
+        ring.close()
+        return
+    ring.status = RUNNING
+
+    parser = frame_decoder.FrameParser()
+    recorder = None
+    if record_path is not None:
+        recorder = session_recorder.SessionRecorder(record_path, start_time=time.time())
+
+    while not threadkill.is_set():
+        chunk = ser.read(max(ser.in_waiting, 1))
+        time_point = time.time()  # Arrival, before decoding
+        angles = parser.feed(chunk)["angle"]
+        if recorder is not None:
+            recorder.write(time_point, parser.raw_frames)
+        if len(angles):
+            ring.write(time_point, angles)
+
+    if recorder is not None:
+        recorder.close()
+    ser.close()
+    ring.status = STOPPED
+    ring.close()
+
+
+class AcquisitionProcess(object):
+    """Runs the serial reader and frame decoder in a separate process.
+
+    Decoded angles come back through a SharedRing, so heavy redraws in the GUI process and serial reads
+    no longer compete for the same GIL. Setting `threadkill` (a multiprocessing.Event) stops it, exactly
+    like the acquisition thread."""
+
+    def __init__(self, port=transports.DEFAULT_PORT, threadkill=None, baudrate=transports.DEFAULT_BAUDRATE,
+                 record_path=None, capacity=DEFAULT_CAPACITY):
+        self.threadkill = multiprocessing.Event() if threadkill is None else threadkill
+        self.ring = SharedRing(capacity)
+        self.process = multiprocessing.Process(
+            target=_acquire,
+            args=(self.ring.name, port, baudrate, record_path, self.threadkill),
+            daemon=True,
+        )
+
+    def start(self, timeout=5.):
+        """Start the process and wait until it is connected. Returns False when the connection failed"""
+        self.process.start()
+        deadline = time.time() + timeout
+        while self.ring.status == STARTING and self.process.is_alive() and time.time() < deadline:
+            time.sleep(0.01)
+        return self.ring.status == RUNNING
+
+    def read_batch(self, poll_interval=0.001):
+        """Block until new samples were published (or threadkill is set). Returns (times, angles)"""
+        times, angles = self.ring.read_new()
+        while not len(angles) and not self.threadkill.is_set():
+            time.sleep(poll_interval)
+            times, angles = self.ring.read_new()
+        return times, angles
+
+    def stop(self, timeout=2.):
+        self.threadkill.set()
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.ring.close()
+        self.ring.unlink()
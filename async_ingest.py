@@ -0,0 +1,190 @@
+import asyncio
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import frame_decoder
+import perf_stats
+
+DEFAULT_QUEUE_SIZE = 64  # Batches per consumer
+POLL_INTERVAL = 0.001  # Used for transports without a file descriptor
+
+# Drop policies applied when a consumer queue is full
+BLOCK = "block"  # Backpressure: stop reading until the consumer catches up, bytes wait in the OS buffer
+DROP_OLDEST = "drop_oldest"
+DROP_NEWEST = "drop_newest"
+
+# One decoded read: host arrival time, (N, 3) angles, all packets by name, the raw valid frames and
+# time.perf_counter() stamps of the 'arrival' and 'decoded' stages
+Batch = namedtuple("Batch", "time angles frames raw_frames stamps")
+
+
+class Consumer(object):
+    """Bounded queue in front of one consumer callable (plain function or coroutine function).
+
+    Plain functions run on a thread of their own, in order: a slow one only fills its queue, where the
+    drop policy applies, instead of holding up the event loop and with it the reading of the port."""
+
+    def __init__(self, handle, maxsize=DEFAULT_QUEUE_SIZE, policy=BLOCK, name=None, inline=False):
+        if policy not in (BLOCK, DROP_OLDEST, DROP_NEWEST):
+            raise ValueError(f"Unknown drop policy {policy}")
+        self.handle = handle
+        self.policy = policy
+        self.name = name or getattr(handle, "__name__", "consumer")
+        self.maxsize = maxsize
+        self.inline = inline  # Called right in the read loop, no queue: for latency-critical outputs
+        self.queue = None  # Created on the loop that runs the pipeline
+        self.dropped = 0  # Batches discarded by the drop policy
+
+    async def offer(self, batch):
+        if self.inline:
+            result = self.handle(batch)
+            if asyncio.iscoroutine(result):
+                await result
+            return
+        if self.policy == BLOCK:
+            await self.queue.put(batch)
+            return
+        if self.queue.full():
+            self.dropped += 1  # Reported per consumer, the pipeline's 'dropped' counter is frames lost on the wire
+            if self.policy == DROP_NEWEST:
+                return
+            self.queue.get_nowait()
+        self.queue.put_nowait(batch)
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        executor = None
+        if not asyncio.iscoroutinefunction(self.handle):
+            executor = ThreadPoolExecutor(1, thread_name_prefix=f"consumer-{self.name}")
+        try:
+            while True:
+                batch = await self.queue.get()
+                if executor is None:
+                    await self.handle(batch)
+                    continue
+                result = await loop.run_in_executor(executor, self.handle, batch)
+                if asyncio.iscoroutine(result):
+                    await result
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=True)  # The batch in progress completes before any final flush
+
+
+class IngestPipeline(object):
+    """asyncio serial ingestion: read -> parse -> fan out decoded batches to bounded consumer queues.
+
+    On POSIX the port's file descriptor is watched by the event loop, elsewhere (Windows, simulated
+    transports) in_waiting is polled. Cancelling the run() task stops everything promptly, and
+    start_in_thread() runs the pipeline on a dedicated loop thread next to the Qt event loop.
+
+    Read and parse times, ingested/corrupt/dropped frames, the serial buffer fill and every queue depth
+    are reported through stats, a perf_stats.PerfStats that can be shared with the consumers."""
+
+    def __init__(self, ser, parser=None, stats=None):
+        self.ser = ser
+        self.parser = frame_decoder.FrameParser() if parser is None else parser
+        self.stats = perf_stats.PerfStats(("ingested", "corrupt", "dropped"), ("read", "parse")) \
+            if stats is None else stats
+        self.stats.add_gauge("serial_buffer", lambda: self.ser.in_waiting)
+        self.consumers = []
+        self.loop = None
+        self.thread = None
+        self._task = None
+        self._fd = _fileno(ser)
+
+    def add_consumer(self, handle, maxsize=DEFAULT_QUEUE_SIZE, policy=BLOCK, name=None, inline=False):
+        consumer = Consumer(handle, maxsize, policy, name, inline)
+        self.consumers.append(consumer)
+        if not inline:
+            self.stats.add_gauge(f"queue_{consumer.name}", lambda: consumer.queue.qsize() if consumer.queue else 0)
+        if policy != BLOCK:
+            self.stats.add_gauge(f"queue_{consumer.name}_dropped", lambda: consumer.dropped)
+        return consumer
+
+    def queue_depths(self):
+        return {c.name: (c.queue.qsize() if c.queue is not None else 0) for c in self.consumers}
+
+    async def _wait_readable(self):
+        loop = asyncio.get_running_loop()
+        ready = loop.create_future()
+        loop.add_reader(self._fd, lambda: ready.done() or ready.set_result(None))
+        try:
+            await ready
+        finally:
+            loop.remove_reader(self._fd)
+
+    async def _read_chunk(self):
+        while True:
+            if self._fd is not None:
+                try:
+                    await self._wait_readable()
+                except NotImplementedError:  # Proactor loop on Windows has no add_reader
+                    self._fd = None
+            waiting = self.ser.in_waiting
+            if waiting:
+                with self.stats.timed("read"):
+                    return self.ser.read(waiting)
+            if self._fd is None:
+                await asyncio.sleep(POLL_INTERVAL)
+
+    async def run(self):
+        for consumer in self.consumers:
+            consumer.queue = asyncio.Queue(consumer.maxsize)
+        tasks = [asyncio.create_task(consumer.run()) for consumer in self.consumers if not consumer.inline]
+        try:
+            while True:
+                chunk = await self._read_chunk()
+                stamps = {"arrival": time.perf_counter()}
+                time_point = time.time()
+                corrupt, dropped = self.parser.corrupt_frames, self.parser.dropped_frames
+                frames = self.parser.feed(chunk)
+                stamps["decoded"] = time.perf_counter()
+                self.stats.add_time("parse", stamps["decoded"] - stamps["arrival"])
+                self.stats.count("ingested", len(frames["angle"]))
+                self.stats.count("corrupt", self.parser.corrupt_frames - corrupt)
+                self.stats.count("dropped", self.parser.dropped_frames - dropped)
+                if not len(self.parser.raw_frames):
+                    continue
+                batch = Batch(time_point, frames["angle"], frames, self.parser.raw_frames, stamps)
+                for consumer in self.consumers:
+                    await consumer.offer(batch)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            # Consumers that must not lose data still get what was queued before the stop
+            for consumer in self.consumers:
+                while not consumer.inline and consumer.policy == BLOCK and not consumer.queue.empty():
+                    result = consumer.handle(consumer.queue.get_nowait())
+                    if asyncio.iscoroutine(result):
+                        await result
+
+    def start_in_thread(self):
+        """Run the pipeline on its own event loop in a daemon thread"""
+        self.loop = asyncio.new_event_loop()
+        self._task = self.loop.create_task(self.run())
+        self.thread = threading.Thread(target=self._run_loop, daemon=True)
+        self.thread.start()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_until_complete(self._task)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self.loop.close()
+
+    def stop(self):
+        """Cancel the pipeline from any thread and wait for it to finish"""
+        if self.thread is not None and self.thread.is_alive():
+            self.loop.call_soon_threadsafe(self._task.cancel)
+            self.thread.join()
+
+
+def _fileno(ser):
+    try:
+        return ser.fileno()
+    except (AttributeError, OSError):
+        return None
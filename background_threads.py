@@ -1,65 +1,72 @@
 import serial
 import time
-import threading
+import async_ingest
+import frame_decoder
+import transports
+import session_recorder
+import perf_stats
 
 
 class SerialCommunication(object):
-    def __init__(self, port="COM3", baudrate=115200):
+    def __init__(self, port=transports.DEFAULT_PORT, baudrate=transports.DEFAULT_BAUDRATE, record_path=None,
+                 stats=None):
         try:
-            self.ser = serial.Serial(port="COM5", baudrate=115200)
+            self.ser = transports.open_transport(port, baudrate)
         except serial.serialutil.SerialException:
             print("Connection Failed")
+            self.ser = None
         self.tri_angles = (0, 0, 0)
-        self.ser.reset_input_buffer()
+        self.parser = frame_decoder.FrameParser()
+        self.stats = perf_stats.PerfStats() if stats is None else stats
 
-    def get_data(self):
-        while True:
-            buf = bytearray()
-            for i in range(11):
-                buf.extend(self.ser.read())
+        # Optional session recording of every valid frame
+        self.recorder = None
+        if record_path is not None and self.ser is not None:
+            self.recorder = session_recorder.SessionRecorder(record_path, start_time=time.time())
 
-            if str(buf.hex()[0:3]) != "555":
-                self.ser.reset_input_buffer()
-                # print(f"{str(buf[0:3].hex())} -> Corrupt Data. Reset...")
+    def close(self):
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+        if self.ser is not None:
+            self.ser.close()
+            self.ser = None
 
-            elif buf.hex()[0:4] == "5553":
-                hex_buf = buf.hex()
-                rollL = int(hex_buf[4:6], 16)
-                rollH = int(hex_buf[6:8], 16)
-                pitchL = int(hex_buf[8:10], 16)
-                pitchH = int(hex_buf[10:12], 16)
-                yawL = int(hex_buf[12:14], 16)
-                yawH = int(hex_buf[14:16], 16)
 
-                roll = ((((rollH << 8) | rollL)/32768)*180)
-                if roll > 180:
-                    roll -= 360
-                pitch = ((((pitchH << 8) | pitchL)/32768)*180)
-                if pitch > 180:
-                    pitch -= 360
-                yaw = ((((yawH << 8) | yawL)/32768)*180)
-                if yaw > 180:
-                    yaw -= 360
+class UpdateThread(object):
+    """Feeds an AnglePlots from an async_ingest.IngestPipeline running on its own daemon loop thread.
 
-                self.ser.reset_input_buffer()
-                self.tri_angles = (roll, pitch, yaw)
-                break
-        return self.tri_angles
+    The pipeline waits on the port without ever blocking in a read, so stop() returns promptly even
+    when the device has gone quiet, and the application can exit while it is still running."""
 
-
-class UpdateThread(threading.Thread):
-    def __init__(self, plot_obj):
-        super(UpdateThread, self).__init__()
+    def __init__(self, plot_obj, port=transports.DEFAULT_PORT, record_path=None):
         self.plot = plot_obj
         self.t0 = time.time()
-        self.serial_channel = SerialCommunication()
+        self.serial_channel = SerialCommunication(port, record_path=record_path, stats=plot_obj.stats)
+        self.pipeline = None
+        if self.serial_channel.ser is None:
+            return
+        self.pipeline = async_ingest.IngestPipeline(self.serial_channel.ser, self.serial_channel.parser,
+                                                    plot_obj.stats)
+        # Paced by the serial port itself, the plot redraws at its own rate
+        self.pipeline.add_consumer(self._update_plot, name="plot", inline=True)
+        if self.serial_channel.recorder is not None:
+            self.pipeline.add_consumer(self._record_batch, name="recorder")
+
+    def start(self):
+        if self.pipeline is not None:
+            self.pipeline.start_in_thread()
+
+    def stop(self):
+        if self.pipeline is not None:
+            self.pipeline.stop()
+        self.serial_channel.close()
+
+    # Pipeline consumers, called on the ingestion loop thread
+    def _update_plot(self, batch):
+        if len(batch.angles):
+            self.serial_channel.tri_angles = tuple(batch.angles[-1])
+            self.plot.update(batch.time - self.t0, batch.angles)
 
-    def run(self):
-        while True:
-            ser_data = self.serial_channel.get_data()
-            t1 = time.time()
-            elapsed_time = t1 - self.t0
-            # print(elapsed_time)
-            # print(ser_data)
-            self.plot.update(elapsed_time, ser_data)
-            time.sleep(0.1)  # Frequency defined here
+    def _record_batch(self, batch):
+        self.serial_channel.recorder.write(batch.time, batch.raw_frames)
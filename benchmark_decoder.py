@@ -0,0 +1,83 @@
+"""Micro-benchmark: bulk NumPy frame decoding vs. the old per-frame hex-string path.
+
+Both large chunks and the few-frame reads that fd-driven readers really get are timed: the
+parser's per-feed cost, not its per-frame cost, dominates those."""
+import struct
+import timeit
+import numpy as np
+import frame_decoder
+
+
+def make_stream(n_frames, seed=0):
+    """Build a byte stream of n_frames random angle frames"""
+    rng = np.random.default_rng(seed)
+    stream = bytearray()
+    for r, p, y in rng.integers(-32767, 32768, size=(n_frames, 3)):
+        frame = bytearray(struct.pack("<BBhhhH", 0x55, 0x53, r, p, y, 0))
+        frame.append(sum(frame) & 0xFF)
+        stream.extend(frame)
+    return bytes(stream)
+
+
+def legacy_decode(stream):
+    """The original SerialCommunication.get_data parsing, applied frame by frame"""
+    angles = []
+    for k in range(0, len(stream) - 10, 11):
+        buf = bytearray()
+        for i in range(11):
+            buf.extend(stream[k + i:k + i + 1])
+        if str(buf.hex()[0:3]) != "555":
+            continue
+        elif buf.hex()[0:4] == "5553":
+            hex_buf = buf.hex()
+            rollL = int(hex_buf[4:6], 16)
+            rollH = int(hex_buf[6:8], 16)
+            pitchL = int(hex_buf[8:10], 16)
+            pitchH = int(hex_buf[10:12], 16)
+            yawL = int(hex_buf[12:14], 16)
+            yawH = int(hex_buf[14:16], 16)
+
+            roll = ((((rollH << 8) | rollL)/32768)*180)
+            if roll > 180:
+                roll -= 360
+            pitch = ((((pitchH << 8) | pitchL)/32768)*180)
+            if pitch > 180:
+                pitch -= 360
+            yaw = ((((yawH << 8) | yawL)/32768)*180)
+            if yaw > 180:
+                yaw -= 360
+            angles.append((roll, pitch, yaw))
+    return angles
+
+
+def parser_feed_time(stream, frames_per_read, repeat=5):
+    """Seconds per frame of FrameParser.feed() over the stream cut into reads of frames_per_read frames"""
+    size = frame_decoder.FRAME_LEN * frames_per_read
+    chunks = [stream[i:i + size] for i in range(0, len(stream), size)]
+
+    def feed_all():
+        parser = frame_decoder.FrameParser()
+        for chunk in chunks:
+            parser.feed(chunk)
+    return min(timeit.repeat(feed_all, number=1, repeat=repeat)) / (len(stream) // frame_decoder.FRAME_LEN)
+
+
+def run(n_frames=2000, repeat=5, read_sizes=(1, 3, 5, 20, 100)):
+    stream = make_stream(n_frames)
+    assert np.allclose(legacy_decode(stream), frame_decoder.decode_angle_frames(stream))
+
+    legacy = min(timeit.repeat(lambda: legacy_decode(stream), number=1, repeat=repeat))
+    bulk = min(timeit.repeat(lambda: frame_decoder.decode_angle_frames(stream), number=1, repeat=repeat))
+
+    print(f"Frames per run: {n_frames}")
+    print(f"Per-frame hex path: {legacy / n_frames * 1e6:8.3f} us/frame")
+    print(f"Bulk NumPy decoder: {bulk / n_frames * 1e6:8.3f} us/frame")
+    print(f"Speed-up:           {legacy / bulk:8.1f}x")
+    for frames_per_read in read_sizes:
+        feed = parser_feed_time(stream, frames_per_read, repeat)
+        print(f"FrameParser, {frames_per_read:3d} frames/read: {feed * 1e6:8.3f} us/frame "
+              f"({legacy / n_frames / feed:5.1f}x the hex path)")
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,368 @@
+"""Benchmark suite for the decode -> speed -> store -> render pipeline.
+
+Every case runs in a fresh process, so its peak RSS is its own, with Qt on the offscreen platform.
+Byte streams are synthetic (transports.SyntheticTransport) or a recording, cut into the chunks a
+reader polling every READ_PERIOD would get at the swept input rate. Results go to a JSON file that a
+later run can be compared against with --compare.
+
+    python benchmark_suite.py --output results.json
+    python benchmark_suite.py --rates 1000 5000 --recording session.rec --compare results.json
+"""
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import socket
+import sys
+import threading
+import time
+import numpy as np
+import frame_decoder
+import net_stream
+import session_recorder
+import speed_engine
+import transports
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+READ_PERIOD = 0.001  # Seconds between reads of the simulated port
+DEFAULT_RATES = (100, 500, 1000, 2000, 5000)  # Samples/s
+DEFAULT_CORRUPTION = (0., 0.01, 0.1)  # Fraction of corrupted frames
+DEFAULT_HISTORY = (10, 60, 600)  # Seconds of history behind the plots
+DEFAULT_DURATION = 5.  # Seconds of stream per ingest case
+RENDER_FRAMES = 200  # Redraws per render case
+REGRESSION_THRESHOLD = 0.2  # Relative throughput loss reported by --compare
+
+
+# Streams
+def make_stream(rate, duration, corruption=0., recording=None, seed=0):
+    """Raw bytes of `duration` seconds at `rate` samples/s, from the synthetic IMU or a recording"""
+    if recording is None:
+        return transports.SyntheticTransport(rate, corruption, seed)._produce(int(rate * duration))
+    if session_recorder.is_session_file(recording):
+        return session_recorder.SessionReader(recording).raw_bytes()
+    with open(recording, "rb") as f:
+        return f.read()
+
+
+def split_reads(stream, rate):
+    """Chunks of the stream as successive reads every READ_PERIOD would return them"""
+    angle_frames = max(len(frame_decoder.find_frames(np.frombuffer(stream, np.uint8), frame_decoder.ANGLE_ID)), 1)
+    n_reads = max(int(angle_frames / rate / READ_PERIOD), 1)
+    bounds = np.linspace(0, len(stream), n_reads + 1).astype(int)
+    return [stream[a:b] for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+
+
+def decoded_batches(chunks):
+    parser = frame_decoder.FrameParser()
+    return [angles for angles in (parser.feed(chunk)["angle"] for chunk in chunks) if len(angles)]
+
+
+def batch_times(batches, rate):
+    """Per-batch host timestamps matching the input rate"""
+    times, n = [], 0
+    for angles in batches:
+        times.append(np.arange(n, n + len(angles)) / rate)
+        n += len(angles)
+    return times
+
+
+# Measurement
+def _timed_calls(calls):
+    """Run each zero-argument callable once, returning the per-call durations in seconds"""
+    durations = np.empty(len(calls))
+    for i, call in enumerate(calls):
+        start = time.perf_counter()
+        call()
+        durations[i] = time.perf_counter() - start
+    return durations
+
+
+def _summary(durations, samples):
+    total = durations.sum()
+    return {
+        "samples": int(samples),
+        "calls": len(durations),
+        "seconds": float(total),
+        "throughput": float(samples / total) if total else None,  # Samples (or frames) per second
+        "per_sample_us": float(total / samples * 1e6) if samples else None,
+        "latency_p50_us": float(np.percentile(durations, 50) * 1e6),  # Per call: every sample of a batch waits for it
+        "latency_p99_us": float(np.percentile(durations, 99) * 1e6),
+        "latency_max_us": float(durations.max() * 1e6),
+    }
+
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10  # Bytes on macOS, kB elsewhere
+
+
+# Qt, only imported by the cases that need it
+def _qt_app():
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5 import QtWidgets
+    return QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv[:1])
+
+
+def _plot_data(gl=False):
+    """A PlotData fed only by the benchmark: its transport and render timer are stopped right away"""
+    import merged_code
+    window = merged_code.MainWindow("loop://", use_gl=gl)
+    plot = window.target_plot
+    if plot.pipeline is not None:
+        plot.pipeline.stop()
+    plot.render_scheduler.stop()
+    window.show()
+    return window, plot
+
+
+def _gl_painted(chart):
+    """Whether a GLStripChart really drew through GL, not just whether one was requested"""
+    return chart is not None and chart.gl_frames > 0
+
+
+# Cases: each takes the case parameters and returns a summary dict
+def bench_parser(rate, corruption, recording, duration, **_):
+    chunks = split_reads(make_stream(rate, duration, corruption, recording), rate)
+    parser = frame_decoder.FrameParser()
+    results = []
+    durations = _timed_calls([lambda c=chunk: results.append(len(parser.feed(c)["angle"])) for chunk in chunks])
+    summary = _summary(durations, sum(results))
+    summary.update(corrupt_frames=parser.corrupt_frames, dropped_frames=parser.dropped_frames)
+    return summary
+
+
+def bench_speed(rate, corruption, recording, duration, **_):
+    batches = decoded_batches(split_reads(make_stream(rate, duration, corruption, recording), rate))
+    start = time.perf_counter()
+    engine = speed_engine.SpeedEngine.from_axis((-30, -20, -90), (30, 20, 90), 0, dead_zone=(5, 95), expo=1.5)
+    calibration = time.perf_counter() - start
+    summary = _summary(_timed_calls([lambda a=angles: engine(a) for angles in batches]), sum(map(len, batches)))
+    summary["calibration_us"] = calibration * 1e6
+    return summary
+
+
+def bench_angle_plots_update(rate, corruption, recording, duration, **_):
+    app = _qt_app()
+    import plot_gui_class
+    plots = plot_gui_class.AnglePlots(hud=False)
+    plots.render_scheduler.stop()
+    batches = decoded_batches(split_reads(make_stream(rate, duration, corruption, recording), rate))
+    times = batch_times(batches, rate)
+    calls = [lambda t=t, a=angles: plots.update(t, a) for t, angles in zip(times, batches)]
+    summary = _summary(_timed_calls(calls), sum(map(len, batches)))
+    plots.close()
+    app.processEvents()
+    return summary
+
+
+def bench_angle_plots_redraw(rate, history, gl, recording, **_):
+    app = _qt_app()
+    import plot_gui_class
+    plots = plot_gui_class.AnglePlots(hud=False, use_gl=gl)
+    plots.render_scheduler.stop()
+    # AnglePlots keeps a single 30 s window, longer histories draw the same as 30 s
+    n = int(rate * min(history, 30))
+    batches = decoded_batches(split_reads(make_stream(rate, n / rate, 0., recording), rate))
+    angles = np.concatenate(batches)[:plots.store.capacity]
+    plots.store.extend(np.arange(len(angles)) / rate, angles)
+
+    def render():
+        plots.redraw()
+        app.processEvents()
+    summary = _summary(_timed_calls([render] * RENDER_FRAMES), RENDER_FRAMES)
+    summary.update(points=len(angles), gl_active=_gl_painted(plots.gl_chart))
+    plots.close()
+    app.processEvents()
+    return summary
+
+
+def bench_plot_data_ingest(rate, corruption, recording, duration, **_):
+    app = _qt_app()
+    window, plot = _plot_data()
+    batches = decoded_batches(split_reads(make_stream(rate, duration, corruption, recording), rate))
+    times = batch_times(batches, rate)
+    calls = [lambda t=t + plot.t0, a=angles: plot._add_samples(t, a, {"arrival": time.perf_counter()})
+             for t, angles in zip(times, batches)]
+    summary = _summary(_timed_calls(calls), sum(map(len, batches)))
+    window.close()
+    app.processEvents()
+    return summary
+
+
+def bench_plot_data_update(rate, history, gl, recording, **_):
+    app = _qt_app()
+    window, plot = _plot_data(gl)
+    stream = make_stream(rate, history, 0., recording)
+    angles = np.concatenate(decoded_batches([stream]))
+    # Filled in one go: the pyramid ends up the same as after `history` seconds of live data
+    plot._add_samples(np.arange(len(angles)) / rate + plot.t0, angles, {"arrival": time.perf_counter()})
+
+    def render():
+        plot.update_data()
+        app.processEvents()
+    summary = _summary(_timed_calls([render] * RENDER_FRAMES), RENDER_FRAMES)
+    summary.update(points=len(angles), gl_active=_gl_painted(plot.gl_chart))
+    window.close()
+    app.processEvents()
+    return summary
+
+
+def bench_stream(rate, corruption, recording, duration, **_):
+    """Publishing over localhost at the real input pace to one reading and one stalled client"""
+    batches = decoded_batches(split_reads(make_stream(rate, duration, corruption, recording), rate))
+    engine = speed_engine.SpeedEngine.from_axis((-30, -20, -90), (30, 20, 90), 0)
+    server = net_stream.StreamServer("127.0.0.1", 0).start()
+    reader = net_stream.StreamClient(*server.address)
+    stalled = socket.socket()  # Connected, never reads: once the socket buffers are full its queue drops
+    stalled.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+    stalled.connect(server.address)
+    while len(server.clients) < 2:
+        time.sleep(0.01)
+    done = threading.Event()
+
+    def receive():
+        while not done.is_set():
+            reader.read()
+    thread = threading.Thread(target=receive)
+    thread.start()
+
+    start = time.perf_counter()
+    durations = np.empty(len(batches))
+    for i, (t, angles) in enumerate(zip(batch_times(batches, rate), batches)):
+        time.sleep(max(start + t[-1] - time.perf_counter(), 0))
+        speeds = engine(angles)
+        call = time.perf_counter()
+        server.publish(t, angles, speeds)
+        durations[i] = time.perf_counter() - call
+    samples = sum(map(len, batches))
+    time.sleep(0.2)  # Let the reading client drain
+    summary = _summary(durations, samples)
+    (_, reader_dropped), (_, stalled_dropped) = server.client_stats().values()  # In connection order
+    summary.update(received=reader.received / samples, reader_dropped=reader_dropped, stalled_dropped=stalled_dropped)
+    done.set()
+    thread.join()
+    reader.close()
+    stalled.close()
+    server.stop()
+    return summary
+
+
+# Name -> (function, swept parameters)
+CASES = {
+    "parser": (bench_parser, ("rate", "corruption")),
+    "speed": (bench_speed, ("rate",)),
+    "angle_plots_update": (bench_angle_plots_update, ("rate",)),
+    "angle_plots_redraw": (bench_angle_plots_redraw, ("rate", "history", "gl")),
+    "plot_data_ingest": (bench_plot_data_ingest, ("rate",)),
+    "plot_data_update": (bench_plot_data_update, ("rate", "history", "gl")),
+    "stream": (bench_stream, ("rate",)),
+}
+
+
+def _run_case(case, params):
+    """Child process entry point"""
+    function, _ = CASES[case]
+    try:
+        result = function(**params)
+        result["status"] = "ok"
+    except ImportError as e:  # Qt or pyqtgraph missing: the case is skipped, not failed
+        result = {"status": "skipped", "error": str(e)}
+    except Exception as e:
+        result = {"status": "failed", "error": f"{type(e).__name__}: {e}"}
+    result["peak_rss_mb"] = _peak_rss_mb()
+    return result
+
+
+def case_parameters(case, rates, corruptions, histories, recording, duration, gl=(False,)):
+    """Every combination of the parameters the case sweeps, the others at their first value"""
+    _, swept = CASES[case]
+    sweeps = {
+        "rate": rates,
+        "corruption": corruptions if recording is None else (None,),  # A recording has its own corruption
+        "history": histories,
+        "gl": gl,
+    }
+    for values in itertools.product(*(sweeps[name] if name in swept else sweeps[name][:1] for name in sweeps)):
+        params = dict(zip(sweeps, values))
+        params.update(recording=recording, duration=duration)
+        yield {name: params[name] for name in swept}, params
+
+
+def run(cases, rates, corruptions, histories, recording=None, duration=DEFAULT_DURATION, gl=False):
+    # A new process per case: peak RSS stays per case and Qt state never leaks between cases
+    context = multiprocessing.get_context("spawn")
+    results = []
+    with context.Pool(1, maxtasksperchild=1) as pool:
+        for case in cases:
+            for swept, params in case_parameters(case, rates, corruptions, histories, recording, duration,
+                                                   (False, True) if gl else (False,)):
+                result = pool.apply(_run_case, (case, params))
+                results.append({"case": case, "params": swept, **result})
+                _print_result(results[-1])
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "recording": recording,
+        "read_period": READ_PERIOD,
+        "results": results,
+    }
+
+
+def _print_result(result):
+    params = " ".join(f"{k}={v}" for k, v in result["params"].items())
+    if result["status"] != "ok":
+        print(f"{result['case']:20s} {params:32s} {result['status']}: {result['error']}")
+        return
+    print(f"{result['case']:20s} {params:32s} {result['throughput']:14.0f}/s "
+          f"p99 {result['latency_p99_us']:10.1f} us  rss {result['peak_rss_mb'] or 0:7.1f} MB")
+
+
+def compare(report, baseline, threshold=REGRESSION_THRESHOLD):
+    """Cases whose throughput fell by more than `threshold` against the baseline report"""
+    key = lambda r: (r["case"], json.dumps(r["params"], sort_keys=True))
+    previous = {key(r): r for r in baseline["results"] if r["status"] == "ok"}
+    regressions = []
+    for result in report["results"]:
+        old = previous.get(key(result))
+        if result["status"] != "ok" or old is None:
+            continue
+        change = result["throughput"] / old["throughput"] - 1
+        if change < -threshold:
+            regressions.append((result["case"], result["params"], change))
+    return regressions
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description="Benchmark the decode -> store -> render pipeline")
+    arg_parser.add_argument("--cases", nargs="+", choices=list(CASES), default=list(CASES))
+    arg_parser.add_argument("--rates", nargs="+", type=float, default=DEFAULT_RATES, help="samples/s")
+    arg_parser.add_argument("--corruption", nargs="+", type=float, default=DEFAULT_CORRUPTION)
+    arg_parser.add_argument("--history", nargs="+", type=float, default=DEFAULT_HISTORY, help="seconds")
+    arg_parser.add_argument("--duration", type=float, default=DEFAULT_DURATION, help="seconds of stream per case")
+    arg_parser.add_argument("--recording", metavar="PATH", help="session recording or raw capture instead of synthetic data")
+    arg_parser.add_argument("--gl", action="store_true", help="also run the render cases on the OpenGL path")
+    arg_parser.add_argument("--output", default="benchmark_results.json")
+    arg_parser.add_argument("--compare", metavar="BASELINE", help="previous results file to check for regressions")
+    args = arg_parser.parse_args()
+
+    report = run(args.cases, args.rates, args.corruption, args.history, args.recording, args.duration, args.gl)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=1)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f))
+        for case, params, change in regressions:
+            print(f"REGRESSION {case} {params}: throughput {change:+.0%}")
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,200 @@
+"""Headless acquisition: read the IMU and stream decoded angles and speed without any GUI.
+
+Only the serial, parsing and storage modules are imported, never PyQt5 or pyqtgraph, so this runs on
+a trackside box without a display and starts reading almost as soon as Python is up.
+
+    python capture.py COM5                                   # text to stdout
+    python capture.py /dev/ttyUSB0 --format csv -o run.csv   # CSV file
+    python capture.py COM5 --record run.rec --format none    # binary session recording only
+    python capture.py synthetic://?rate=1000 --min -30 0 0 --max 30 0 0 --axis roll --duration 10
+    python capture.py --profile alice                        # port, axis and calibration of a saved profile
+    python capture.py COM5 --format none --serve 8765        # feed remote dashboards (merged_code.py --subscribe)
+"""
+import time
+_start = time.perf_counter()  # Before the heavier imports, for --verbose startup reporting
+
+import argparse
+import os
+import sys
+import numpy as np
+import serial
+import frame_decoder
+import orientation_filter
+import profile_store
+import session_recorder
+import speed_engine
+import transports
+
+AXES = profile_store.AXES
+COLUMNS = ("time", "roll", "pitch", "yaw", "speed")
+READ_TIMEOUT = 0.1  # Seconds, bounds how late --duration and Ctrl-C are noticed on a quiet port
+
+
+class Capture(object):
+    """Reads a transport until stopped and hands every decoded batch to the writer and the recorder"""
+
+    def __init__(self, ser, engine=None, write=None, recorder=None, orientation=None, server=None):
+        self.ser = ser
+        self.orientation = orientation  # Optional orientation_filter.OrientationFilter
+        self.parser = frame_decoder.FrameParser()
+        self.engine = speed_engine.SpeedEngine() if engine is None else engine
+        self.write = write  # Called with an (N, 5) array of time, roll, pitch, yaw, speed
+        self.recorder = recorder
+        self.server = server  # Optional net_stream.StreamServer
+        self.samples = 0
+
+    def run(self, duration=None):
+        t0 = time.time()
+        while duration is None or time.time() - t0 < duration:
+            if getattr(self.ser, "exhausted", False) and not self.ser.in_waiting:
+                break  # A replay that ran out, nothing more will ever arrive
+            frames = self.parser.read(self.ser)
+            time_point = time.time()
+            angles = frames["angle"] if self.orientation is None else self.orientation(time_point, frames)
+            if self.recorder is not None and len(self.parser.raw_frames):
+                self.recorder.write(time_point, self.parser.raw_frames)
+            if not len(angles):
+                continue
+            self.samples += len(angles)
+            if self.write is None and self.server is None:
+                continue
+            speeds = self.engine(angles)
+            if self.server is not None:
+                self.server.publish(time_point, angles, speeds)
+            if self.write is not None:
+                rows = np.empty((len(angles), len(COLUMNS)))
+                rows[:, 0] = time_point - t0
+                rows[:, 1:4] = angles
+                rows[:, 4] = speeds
+                self.write(rows)
+
+
+def text_writer(stream, delimiter):
+    """Writer printing one line per sample, flushed per batch so pipes see data at sensor rate"""
+    def write(rows):
+        np.savetxt(stream, rows, fmt="%.6f", delimiter=delimiter)
+        stream.flush()
+    return write
+
+
+def run_gui(port, record_path):
+    """The full plotting window, Qt and pyqtgraph are only imported here"""
+    from PyQt5 import QtWidgets
+    import merged_code
+    app = QtWidgets.QApplication(sys.argv[:1])
+    window = merged_code.MainWindow(port, record_path=record_path)
+    window.show()
+    return app.exec_()
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Headless IMU capture, no GUI")
+    arg_parser.add_argument("port", nargs="?",
+                            help="serial port or transport URL, e.g. COM5 or synthetic://?rate=500 (default: the "
+                                 "profile's port, else COM5)")
+    arg_parser.add_argument("--baudrate", type=int)
+    arg_parser.add_argument("--profile", metavar="NAME",
+                            help="take port, baud rate, axis and calibration from this saved profile, options given "
+                                 "here override it")
+    arg_parser.add_argument("--profiles", metavar="PATH", default=profile_store.DEFAULT_PATH, help="profile file")
+    arg_parser.add_argument("--format", choices=("text", "csv", "none"), default="text",
+                            help="sample output format, none to only record")
+    arg_parser.add_argument("-o", "--output", metavar="PATH", help="write samples here instead of stdout")
+    arg_parser.add_argument("--record", metavar="PATH", help="record every valid frame to a binary session file")
+    arg_parser.add_argument("--duration", type=float, help="stop after this many seconds")
+    arg_parser.add_argument("--min", nargs=3, type=float, metavar=("ROLL", "PITCH", "YAW"),
+                            help="calibration start position")
+    arg_parser.add_argument("--max", nargs=3, type=float, metavar=("ROLL", "PITCH", "YAW"),
+                            help="calibration end position")
+    arg_parser.add_argument("--axis", choices=AXES, help="axis driving the speed (default: roll)")
+    arg_parser.add_argument("--filter", choices=(orientation_filter.LOWPASS, orientation_filter.COMPLEMENTARY),
+                            help="smooth the angles, or fuse accel and gyro packets for roll and pitch")
+    arg_parser.add_argument("--smoothing", type=float, default=orientation_filter.DEFAULT_SMOOTHING,
+                            help="0 (no delay) to 1 (smoothest)")
+    arg_parser.add_argument("--serve", metavar="[HOST:]PORT",
+                            help="publish every batch to remote dashboards, e.g. 8765")
+    arg_parser.add_argument("--gui", action="store_true", help="open the plotting window instead (imports Qt)")
+    arg_parser.add_argument("-v", "--verbose", action="store_true", help="report startup time and stats on stderr")
+    args = arg_parser.parse_args(argv)
+
+    profile = profile_store.Profile(None)
+    if args.profile is not None:
+        try:
+            profile = profile_store.ProfileStore(args.profiles).get(args.profile)
+        except (OSError, ValueError) as e:
+            print(f"Profiles unavailable: {e}", file=sys.stderr)
+            return 1
+        except KeyError:
+            print(f"No profile named {args.profile}", file=sys.stderr)
+            return 1
+    for name, value in (("port", args.port), ("baudrate", args.baudrate), ("min_pos", args.min),
+                        ("max_pos", args.max)):
+        if value is not None:
+            setattr(profile, name, tuple(value) if isinstance(value, list) else value)
+    if args.axis is not None:
+        profile.axis = AXES.index(args.axis)
+
+    if args.gui:
+        return run_gui(profile.port, args.record)
+
+    try:
+        ser = transports.open_transport(profile.port, profile.baudrate, timeout=READ_TIMEOUT)
+    except serial.serialutil.SerialException as e:
+        print(f"Connection Failed: {e}", file=sys.stderr)
+        return 1
+
+    engine = profile.engine()
+    if not engine.calibrated and profile.calibrated:
+        print("Calibration range is empty, speed stays at 0", file=sys.stderr)
+
+    output = None
+    write = None
+    if args.format != "none":
+        output = sys.stdout if args.output is None else open(args.output, "w", newline="")
+        delimiter = "," if args.format == "csv" else " "
+        if args.format == "csv":
+            output.write(",".join(COLUMNS) + "\n")
+        write = text_writer(output, delimiter)
+
+    recorder = None
+    if args.record is not None:
+        recorder = session_recorder.SessionRecorder(args.record, start_time=time.time())
+
+    orientation = None
+    if args.filter is not None:
+        orientation = orientation_filter.OrientationFilter(args.filter, args.smoothing)
+    server = None
+    if args.serve is not None:
+        import net_stream  # Brings in asyncio, only worth loading when serving
+        try:
+            server = net_stream.StreamServer(*net_stream.parse_address(args.serve)).start()
+        except OSError as e:
+            print(f"Stream server failed: {e}", file=sys.stderr)
+            ser.close()
+            return 1
+    capture = Capture(ser, engine, write, recorder, orientation, server)
+    if args.verbose:
+        print(f"Reading {profile.port} {(time.perf_counter() - _start) * 1e3:.1f} ms after start", file=sys.stderr)
+    try:
+        capture.run(args.duration)
+    except KeyboardInterrupt:
+        pass
+    except BrokenPipeError:
+        # Output piped into head & co.: silence the final flush of the interpreter too
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+    finally:
+        ser.close()
+        if recorder is not None:
+            recorder.close()
+        if server is not None:
+            server.stop()
+        if output is not None and output is not sys.stdout:
+            output.close()
+
+    if args.verbose:
+        print(f"{capture.samples} samples, {capture.parser.stats()}", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
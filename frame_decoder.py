@@ -0,0 +1,214 @@
+import struct
+import numpy as np
+
+# WT-style IMU packet layout: 0x55 <type> <8 data bytes> <checksum>
+FRAME_LEN = 11
+HEADER = 0x55
+ACCEL_ID = 0x51
+GYRO_ID = 0x52
+ANGLE_ID = 0x53
+MAG_ID = 0x54
+ANGLE_SCALE = 180 / 32768  # Raw int16 -> degrees
+
+PACKET_TYPES = {ACCEL_ID: "accel", GYRO_ID: "gyro", ANGLE_ID: "angle", MAG_ID: "mag"}
+PACKET_SCALES = {
+    ACCEL_ID: 16 / 32768,  # g
+    GYRO_ID: 2000 / 32768,  # °/s
+    ANGLE_ID: ANGLE_SCALE,  # °
+    MAG_ID: 1,  # Raw counts
+}
+
+# Byte offsets of the three int16 values (xL..zH) inside a frame
+_VALUE_BYTES = np.arange(2, 8)
+_FRAME_BYTES = np.arange(FRAME_LEN)
+_VALUES = struct.Struct("<hhh")
+
+# Below this many buffered bytes (about 20 accel/gyro/angle triplets) a plain Python scan beats the
+# ~20 NumPy calls of the vectorised path, whose fixed cost dominates the 1-5 sample reads of fd-driven
+# readers. Measured crossover, see benchmark_decoder.py
+SCALAR_MAX_BYTES = 640
+
+
+def find_frames(buf, frame_id=ANGLE_ID):
+    """Return the start offset of every complete 0x55 <frame_id> frame in a uint8 array"""
+    if buf.size < FRAME_LEN:
+        return np.empty(0, dtype=np.intp)
+    starts = np.flatnonzero((buf[:-1] == HEADER) & (buf[1:] == frame_id))
+    return starts[starts <= buf.size - FRAME_LEN]
+
+
+def valid_checksums(buf, starts):
+    """Boolean mask of the frames whose last byte matches the low byte of the sum of the other ten"""
+    frames = buf[starts[:, None] + _FRAME_BYTES]
+    return (frames[:, :-1].sum(axis=1) & 0xFF) == frames[:, -1]
+
+
+def frame_values(buf, starts, scale):
+    """Gather the three int16 values of every frame and scale them. Returns an (N, 3) float array"""
+    raw = np.ascontiguousarray(buf[starts[:, None] + _VALUE_BYTES]).view("<i2")
+    return raw.astype(float) * scale
+
+
+def decode_angle_frames(chunk):
+    """Decode every checksum-valid angle frame in a chunk of raw bytes at once.
+    Returns an (N, 3) float array of (roll, pitch, yaw) in degrees"""
+    buf = np.frombuffer(chunk, dtype=np.uint8)
+    starts = find_frames(buf)
+    starts = starts[valid_checksums(buf, starts)]
+    return frame_values(buf, starts, ANGLE_SCALE)
+
+
+def _drop_overlaps(starts):
+    """Keep the first of any frames that overlap. Only needed when a payload happens to look like a frame"""
+    kept = []
+    end = -1
+    for start in starts.tolist():
+        if start >= end:
+            kept.append(start)
+            end = start + FRAME_LEN
+    return np.array(kept, dtype=np.intp)
+
+
+class FrameParser(object):
+    """Incremental parser for the raw IMU byte stream.
+
+    Bytes are appended to a rolling buffer, every checksum-valid frame of any known packet type is
+    decoded, misaligned or corrupt bytes are skipped up to the next header, and the incomplete tail is
+    kept for the next call. Nothing is ever flushed from the serial port."""
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self.raw_frames = np.empty((0, FRAME_LEN), dtype=np.uint8)  # Valid frames of the last feed, in order
+
+        # Counters
+        self.frame_counts = dict.fromkeys(PACKET_TYPES.values(), 0)
+        self.corrupt_frames = 0  # Headers whose checksum did not match
+        self.dropped_frames = 0  # Frame slots lost to skipped bytes
+        self.skipped_bytes = 0
+        self._open_gap = 0  # Skipped bytes at the end of the consumed data, the gap may go on next feed
+
+    def read(self, ser):
+        """Read everything waiting on the serial port (blocking for at least one byte) and parse it"""
+        return self.feed(ser.read(max(ser.in_waiting, 1)))
+
+    def feed(self, chunk):
+        """Parse a chunk of raw bytes. Returns a dict of packet name -> (N, 3) float array"""
+        self._buffer += chunk
+        frames, consumed = self._parse_small() if len(self._buffer) <= SCALAR_MAX_BYTES else self._parse()
+        del self._buffer[:consumed]
+        return frames
+
+    def stats(self):
+        return {
+            "frames": dict(self.frame_counts),
+            "corrupt_frames": self.corrupt_frames,
+            "dropped_frames": self.dropped_frames,
+            "skipped_bytes": self.skipped_bytes,
+        }
+
+    def _parse(self):
+        # The NumPy view must not outlive this call, the bytearray cannot be resized while it exists
+        buf = np.frombuffer(self._buffer, dtype=np.uint8)
+        n = buf.size
+
+        starts = np.flatnonzero((buf[:-1] == HEADER) & (buf[1:] >= ACCEL_ID) & (buf[1:] <= MAG_ID))
+        starts = starts[starts <= n - FRAME_LEN]
+        ok = valid_checksums(buf, starts)
+        good = starts[ok]
+        if good.size > 1 and np.any(np.diff(good) < FRAME_LEN):
+            good = _drop_overlaps(good)
+        ends = good + FRAME_LEN
+
+        # Failed headers lying inside an accepted frame are just payload bytes, not corrupt frames
+        bad = starts[~ok]
+        if good.size:
+            owner = np.searchsorted(good, bad, side="right") - 1
+            bad = bad[(owner < 0) | (bad >= ends[owner.clip(0)])]
+        self.corrupt_frames += bad.size
+
+        # Keep the last FRAME_LEN - 1 bytes unless they were consumed, they may hold a partial frame
+        consumed = max(int(ends[-1]) if good.size else 0, n - FRAME_LEN + 1, 0)
+        gaps = np.append(good, consumed) - np.insert(ends, 0, 0)
+        if good.size:
+            middle = gaps[1:-1]
+            self._count_gaps(int(gaps[0]), int(gaps[-1]), int((-(-middle // FRAME_LEN)).sum()), int(middle.sum()))
+        else:
+            self._count_gaps(int(gaps[0]))
+
+        self.raw_frames = buf[good[:, None] + _FRAME_BYTES]
+        frames = {}
+        ids = buf[good + 1]
+        for packet_id, name in PACKET_TYPES.items():
+            selected = good[ids == packet_id]
+            frames[name] = frame_values(buf, selected, PACKET_SCALES[packet_id])
+            self.frame_counts[name] += len(selected)
+        return frames, consumed
+
+    def _parse_small(self):
+        """Same result as _parse() for a few frames, scanning the bytearray in Python"""
+        buf = self._buffer
+        n = len(buf)
+        good = []
+        last = n - FRAME_LEN  # Last offset a complete frame can start at
+        i = buf.find(HEADER)
+        while 0 <= i <= last:
+            if ACCEL_ID <= buf[i + 1] <= MAG_ID:
+                if sum(buf[i:i + FRAME_LEN - 1]) & 0xFF == buf[i + FRAME_LEN - 1]:
+                    good.append(i)
+                    i = buf.find(HEADER, i + FRAME_LEN)  # Headers inside an accepted frame are payload
+                    continue
+                self.corrupt_frames += 1
+            i = buf.find(HEADER, i + 1)
+
+        consumed = max(good[-1] + FRAME_LEN if good else 0, n - FRAME_LEN + 1, 0)
+        if good:
+            middle = [start - end for start, end in zip(good[1:], good) if start - end > FRAME_LEN]
+            self._count_gaps(good[0], consumed - good[-1] - FRAME_LEN,
+                             sum(-(-(gap - FRAME_LEN) // FRAME_LEN) for gap in middle),
+                             sum(middle) - FRAME_LEN * len(middle))
+        else:
+            self._count_gaps(consumed)
+
+        values = {name: [] for name in PACKET_TYPES.values()}
+        for start in good:
+            values[PACKET_TYPES[buf[start + 1]]].append(_VALUES.unpack_from(buf, start + 2))
+        frames = {}
+        for packet_id, name in PACKET_TYPES.items():
+            rows = values[name]
+            if rows:
+                frames[name] = np.array(rows, dtype=float)
+                frames[name] *= PACKET_SCALES[packet_id]
+                self.frame_counts[name] += len(rows)
+            else:
+                frames[name] = np.empty((0, 3))
+        self.raw_frames = np.frombuffer(b"".join(buf[start:start + FRAME_LEN] for start in good),
+                                        dtype=np.uint8).reshape(-1, FRAME_LEN)
+        return frames, consumed
+
+    def _count_gaps(self, lead, trailing=None, middle_dropped=0, middle_bytes=0):
+        """Account the bytes skipped before the first accepted frame (lead), between frames (middle) and
+        after the last one (trailing, None when no frame was accepted and lead is the whole feed).
+        The lead continues the open gap of the previous feed and the trailing gap stays open, so a gap
+        straddling feeds counts as many lost frame slots as it would in a single feed"""
+        open_gap = self._open_gap
+        self.skipped_bytes += lead + middle_bytes + (trailing or 0)
+        dropped = -(-(open_gap + lead) // FRAME_LEN) - -(-open_gap // FRAME_LEN)
+        if trailing is None:
+            self._open_gap = open_gap + lead
+        else:
+            dropped += middle_dropped - (-trailing // FRAME_LEN)
+            self._open_gap = trailing
+        self.dropped_frames += dropped
+
+
+def encode_frames(packet_id, values, scale=None):
+    """Inverse of frame_values: build checksummed frames from an (N, 3) array of scaled values.
+    Returns an (N, FRAME_LEN) uint8 array"""
+    scale = PACKET_SCALES[packet_id] if scale is None else scale
+    raw = np.clip(np.round(np.asarray(values, dtype=float) / scale), -32768, 32767).astype("<i2")
+    frames = np.zeros((len(raw), FRAME_LEN), dtype=np.uint8)
+    frames[:, 0] = HEADER
+    frames[:, 1] = packet_id
+    frames[:, 2:8] = raw.view(np.uint8).reshape(-1, 6)
+    frames[:, -1] = frames[:, :-1].sum(axis=1) & 0xFF
+    return frames
@@ -0,0 +1,227 @@
+"""Optional OpenGL render path for the live plots.
+
+GLStripChart draws several columns of a SampleStore from vertex buffers that live as long as the
+plot. Like the store itself the buffers are circular and written twice, so the newest samples are
+always one contiguous range: each frame only uploads the samples appended since the last one and
+issues one draw call per curve, while the view transform is applied on the GPU. Redraw cost
+therefore no longer grows with the window length, and barely with the number of curves or lanes.
+
+Needs PyOpenGL and a working GL context (hardware, or Mesa llvmpipe on GPU-less boxes). When either
+is missing, gl_available() is False and the GUIs keep their QPainter curves."""
+import numpy as np
+import pyqtgraph as pg
+from PyQt5 import QtCore, QtGui
+from sample_store import TIME
+
+try:
+    from OpenGL import GL
+    from OpenGL.GL import shaders
+except ImportError:
+    GL = None
+
+VERTEX_SHADER = """
+#version 120
+attribute float t;
+attribute float value;
+uniform mat3 transform;  // (t - t_base, value) -> normalized device coordinates
+void main() {
+    vec3 position = transform * vec3(t, value, 1.0);
+    gl_Position = vec4(position.xy, 0.0, 1.0);
+}
+"""
+
+FRAGMENT_SHADER = """
+#version 120
+uniform vec4 color;
+void main() {
+    gl_FragColor = color;
+}
+"""
+
+FLOAT_SIZE = 4
+
+
+def gl_available():
+    """Whether PyOpenGL is installed and the Qt platform can create a GL context"""
+    if GL is None:
+        return False
+    context = QtGui.QOpenGLContext()
+    return context.create() and context.isValid()
+
+
+class GLStripChart(pg.GraphicsObject):
+    """All curves of one SampleStore, drawn from persistent GL vertex buffers.
+
+    Call sync() from the GUI thread when the store has new samples (the render scheduler's redraw):
+    it only copies the new rows, the upload happens in the next paint where the GL context is current.
+    Painting on anything but a GL viewport (image export, ...) falls back to QPainter paths."""
+
+    def __init__(self, store, columns, pens, capacity=None):
+        super(GLStripChart, self).__init__()
+        self.store = store
+        self.columns = list(columns)
+        self.colors = [pg.mkColor(pen).getRgbF() for pen in pens]
+        self.capacity = int(store.capacity if capacity is None else capacity)
+
+        self._synced_count = 0  # store.count at the last sync
+        self._store_length = 0  # len(store) at the last sync
+        self._length = 0  # Valid samples in the GL ring
+        self._head = 0  # Next write position in [0, capacity)
+        self._pending = []  # Rows copied by sync(), waiting for the next paint to be uploaded
+        self._t_base = None  # Times are uploaded relative to this, float32 keeps its precision
+        self._bounds = QtCore.QRectF()
+        self._program = None
+        self._buffers = None  # One VBO for the times, one per curve
+        self.gl_frames = 0  # Paints that went through the native GL branch, not the QPainter fallback
+
+    # Data side, GUI thread
+    def sync(self):
+        with self.store.lock:  # Counters and rows of one state, copied: the writer reuses the memory
+            count, length = self.store.count, len(self.store)
+            new = min(count - self._synced_count, length, self.capacity)
+            rows = np.column_stack([self.store.column(index, new) for index in [TIME] + self.columns])
+            t_start = self.store.column(TIME, min(length, self.capacity))[0] if length else None
+        appended = count - self._synced_count
+        if not appended:
+            return
+        if length < min(self._store_length + appended, self.store.capacity):
+            # The store was cleared in between, start over from what it holds now
+            self._pending = []
+            self._length = self._head = 0
+            self.prepareGeometryChange()
+            self._bounds = QtCore.QRectF()
+        self._synced_count = count
+        self._store_length = length
+        if not new:
+            return
+
+        if self._t_base is None:
+            self._t_base = rows[0, 0]
+        self._pending.append(rows)
+        if sum(len(block) for block in self._pending) > self.capacity:  # Not painted for a while (hidden)
+            self._pending = [np.concatenate(self._pending)[-self.capacity:]]
+        self._update_bounds(rows, t_start)
+        self.update()
+
+    def _update_bounds(self, rows, t_start):
+        low, high = rows[:, 1:].min(), rows[:, 1:].max()
+        if not self._bounds.isNull():
+            low, high = min(low, self._bounds.top()), max(high, self._bounds.bottom())
+        bounds = QtCore.QRectF(t_start, low, rows[-1, 0] - t_start, high - low)
+        if bounds != self._bounds:
+            self.prepareGeometryChange()
+            self._bounds = bounds
+
+    def boundingRect(self):
+        return self._bounds
+
+    def dataBounds(self, ax, frac=1.0, orthoRange=None):
+        if self._bounds.isNull():
+            return None, None
+        if ax == 0:
+            return self._bounds.left(), self._bounds.right()
+        return self._bounds.top(), self._bounds.bottom()
+
+    # GL side, paint
+    def paint(self, painter, *args):
+        if painter.paintEngine().type() not in (QtGui.QPaintEngine.OpenGL, QtGui.QPaintEngine.OpenGL2):
+            self._paint_fallback(painter)
+            return
+        painter.beginNativePainting()
+        try:
+            if self._program is None:
+                self._init_gl()
+            self._upload()
+            if self._length > 1:
+                self._draw(painter)
+            self.gl_frames += 1
+        finally:
+            painter.endNativePainting()
+
+    def _paint_fallback(self, painter):
+        time_data, *columns = self.store.snapshot([TIME] + self.columns)
+        for values, color in zip(columns, self.colors):
+            painter.setPen(pg.mkPen(pg.mkColor(*[int(c * 255) for c in color])))
+            painter.drawPath(pg.arrayToQPath(time_data, values))
+
+    def _init_gl(self):
+        self._program = shaders.compileProgram(
+            shaders.compileShader(VERTEX_SHADER, GL.GL_VERTEX_SHADER),
+            shaders.compileShader(FRAGMENT_SHADER, GL.GL_FRAGMENT_SHADER),
+        )
+        self._buffers = GL.glGenBuffers(len(self.columns) + 1)
+        for buffer in self._buffers:
+            GL.glBindBuffer(GL.GL_ARRAY_BUFFER, buffer)
+            GL.glBufferData(GL.GL_ARRAY_BUFFER, 2 * self.capacity * FLOAT_SIZE, None, GL.GL_DYNAMIC_DRAW)
+        GL.glBindBuffer(GL.GL_ARRAY_BUFFER, 0)
+
+    def _upload(self):
+        if not self._pending:
+            return
+        rows = np.concatenate(self._pending)[-self.capacity:]
+        self._pending = []
+        rows[:, 0] -= self._t_base
+        block = np.ascontiguousarray(rows.T, dtype=np.float32)
+        n = len(rows)
+
+        # Same layout as SampleStore: at most two segments, each written to both halves of the ring
+        first = min(n, self.capacity - self._head)
+        for buffer, values in zip(self._buffers, block):
+            GL.glBindBuffer(GL.GL_ARRAY_BUFFER, buffer)
+            for offset in (0, self.capacity):
+                GL.glBufferSubData(GL.GL_ARRAY_BUFFER, (offset + self._head) * FLOAT_SIZE, first * FLOAT_SIZE,
+                                   values[:first])
+                if n > first:
+                    GL.glBufferSubData(GL.GL_ARRAY_BUFFER, offset * FLOAT_SIZE, (n - first) * FLOAT_SIZE,
+                                       values[first:])
+        GL.glBindBuffer(GL.GL_ARRAY_BUFFER, 0)
+        self._head = (self._head + n) % self.capacity
+        self._length = min(self._length + n, self.capacity)
+
+    def _transform(self, painter):
+        """Row-major 3x3 matrix from (t - t_base, value) to normalized device coordinates, in float64"""
+        device = painter.deviceTransform()
+        to_device = np.array([
+            [device.m11(), device.m21(), device.dx()],
+            [device.m12(), device.m22(), device.dy()],
+            [0., 0., 1.],
+        ])
+        viewport = painter.device()
+        width, height = viewport.width(), viewport.height()
+        to_ndc = np.array([[2 / width, 0., -1.], [0., -2 / height, 1.], [0., 0., 1.]])
+        from_base = np.array([[1., 0., self._t_base], [0., 1., 0.], [0., 0., 1.]])
+        return to_ndc @ to_device @ from_base
+
+    def _draw(self, painter):
+        # The view box clips its children, native GL has to be told
+        view_box = self.getViewBox()
+        if view_box is not None:
+            ratio = painter.device().devicePixelRatioF()
+            clip = painter.deviceTransform().mapRect(self.mapRectFromView(view_box.viewRect()))
+            GL.glEnable(GL.GL_SCISSOR_TEST)
+            GL.glScissor(int(clip.left() * ratio), int((painter.device().height() - clip.bottom()) * ratio),
+                         int(np.ceil(clip.width() * ratio)), int(np.ceil(clip.height() * ratio)))
+
+        GL.glUseProgram(self._program)
+        GL.glUniformMatrix3fv(GL.glGetUniformLocation(self._program, "transform"), 1, GL.GL_TRUE,
+                              self._transform(painter).astype(np.float32))
+        color_location = GL.glGetUniformLocation(self._program, "color")
+        t_location = GL.glGetAttribLocation(self._program, "t")
+        value_location = GL.glGetAttribLocation(self._program, "value")
+
+        GL.glBindBuffer(GL.GL_ARRAY_BUFFER, self._buffers[0])
+        GL.glEnableVertexAttribArray(t_location)
+        GL.glVertexAttribPointer(t_location, 1, GL.GL_FLOAT, GL.GL_FALSE, 0, None)
+        GL.glEnableVertexAttribArray(value_location)
+        first = self._head + self.capacity - self._length  # Oldest sample of the contiguous range
+        for buffer, color in zip(self._buffers[1:], self.colors):
+            GL.glBindBuffer(GL.GL_ARRAY_BUFFER, buffer)
+            GL.glVertexAttribPointer(value_location, 1, GL.GL_FLOAT, GL.GL_FALSE, 0, None)
+            GL.glUniform4f(color_location, *color)
+            GL.glDrawArrays(GL.GL_LINE_STRIP, first, self._length)
+
+        GL.glDisableVertexAttribArray(t_location)
+        GL.glDisableVertexAttribArray(value_location)
+        GL.glBindBuffer(GL.GL_ARRAY_BUFFER, 0)
+        GL.glUseProgram(0)
+        GL.glDisable(GL.GL_SCISSOR_TEST)
@@ -0,0 +1,124 @@
+import numpy as np
+
+DEFAULT_FACTOR = 4  # Children per block between two levels
+
+
+class _Level(object):
+    """Growable (time, min, max) arrays of one pyramid level.
+
+    An unpaired level holds raw samples: a single value array, `hi` is the same array as `lo`."""
+
+    def __init__(self, channels, capacity=1024, paired=True):
+        self.size = 0
+        self.paired = paired
+        self.time = np.empty(capacity)
+        self.lo = np.empty((capacity, channels), dtype=np.float32)
+        self.hi = np.empty((capacity, channels), dtype=np.float32) if paired else self.lo
+
+    def extend(self, time, lo, hi=None):
+        n = len(time)
+        if self.size + n > len(self.time):  # Amortised O(1): double the capacity
+            capacity = max(2 * len(self.time), self.size + n)
+            for name in ("time", "lo", "hi") if self.paired else ("time", "lo"):
+                old = getattr(self, name)
+                new = np.empty((capacity,) + old.shape[1:], dtype=old.dtype)
+                new[:self.size] = old[:self.size]
+                setattr(self, name, new)
+            if not self.paired:
+                self.hi = self.lo
+        self.time[self.size:self.size + n] = time
+        self.lo[self.size:self.size + n] = lo
+        if self.paired:
+            self.hi[self.size:self.size + n] = hi
+        self.size += n
+
+
+class MinMaxPyramid(object):
+    """Multi-resolution min/max summary of a multi-channel time series.
+
+    Level 0 holds the raw samples once, every block of `factor` entries of a level is summarised by one
+    (start time, min, max) entry of the next. Levels are completed incrementally as samples arrive, so
+    any time range can be drawn with about one min/max pair per screen pixel at constant cost, without
+    losing peaks."""
+
+    def __init__(self, channels, factor=DEFAULT_FACTOR):
+        self.channels = channels
+        self.factor = factor
+        self.levels = [_Level(channels, paired=False)]
+
+    def __len__(self):
+        return self.levels[0].size
+
+    @property
+    def count(self):
+        """Samples added so far, like SampleStore.count: enough for a RenderScheduler to watch"""
+        return self.levels[0].size
+
+    @property
+    def last_time(self):
+        level = self.levels[0]
+        return level.time[level.size - 1] if level.size else 0.
+
+    def extend(self, times, values):
+        """Append (N,) times (or a scalar) and an (N, channels) array of values"""
+        values = np.asarray(values, dtype=np.float32).reshape(-1, self.channels)
+        if not len(values):
+            return
+        times = np.broadcast_to(np.asarray(times, dtype=float), (len(values),))
+        self.levels[0].extend(times, values)
+
+        # Complete as many parent blocks as the new children allow, level by level
+        depth = 0
+        while True:
+            child = self.levels[depth]
+            if child.size < self.factor:
+                break
+            if depth + 1 == len(self.levels):
+                self.levels.append(_Level(self.channels))
+            parent = self.levels[depth + 1]
+            done = parent.size * self.factor
+            n_blocks = (child.size - done) // self.factor
+            if not n_blocks:
+                break
+            end = done + n_blocks * self.factor
+            lo = child.lo[done:end].reshape(n_blocks, self.factor, -1).min(axis=1)
+            hi = child.hi[done:end].reshape(n_blocks, self.factor, -1).max(axis=1)
+            parent.extend(child.time[done:end:self.factor], lo, hi)
+            depth += 1
+
+    def query(self, t_start, t_end, width):
+        """Points to draw the range [t_start, t_end] on `width` pixels.
+
+        Returns (x, y) with y of shape (M, channels). Ranges with few samples come back raw, otherwise
+        each pixel column gets its min and max, interleaved, so M is about 2 * width."""
+        width = max(int(width), 1)
+        for depth, level in enumerate(self.levels):
+            # One extra entry each side so lines continue past the edges of the view
+            start = max(int(np.searchsorted(level.time[:level.size], t_start, side="right")) - 1, 0)
+            stop = min(int(np.searchsorted(level.time[:level.size], t_end, side="left")) + 1, level.size)
+            if stop - start <= width * self.factor or level is self.levels[-1]:
+                break
+
+        n = stop - start
+        if n <= 0:
+            return np.empty(0), np.empty((0, self.channels), dtype=np.float32)
+        if level is self.levels[0] and n <= width:
+            return level.time[start:stop], level.lo[start:stop]
+
+        edges = np.unique(np.linspace(start, stop, min(width, n) + 1).astype(int)[:-1])
+        lo = np.minimum.reduceat(level.lo[start:stop], edges - start)
+        hi = np.maximum.reduceat(level.hi[start:stop], edges - start)
+        x = level.time[edges]
+
+        # Newest raw samples not summarised at this level yet become one last min/max pair
+        raw = self.levels[0]
+        tail = level.size * self.factor ** depth
+        if depth and stop == level.size and tail < raw.size:
+            x = np.append(x, raw.time[tail])
+            lo = np.vstack((lo, raw.lo[tail:raw.size].min(axis=0)))
+            hi = np.vstack((hi, raw.hi[tail:raw.size].max(axis=0)))
+
+        y = np.empty((2 * len(x), self.channels), dtype=np.float32)
+        y[0::2] = lo
+        y[1::2] = hi
+        return np.repeat(x, 2), y
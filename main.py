@@ -1,20 +1,31 @@
 from PyQt5 import QtWidgets
 import background_threads
 import plot_gui_class
+import transports
 import sys
 
 
 class GyroObject(object):
     """App class"""
-    def __init__(self):
-        self.app = QtWidgets.QApplication(sys.argv)
-        self.plot = plot_gui_class.AnglePlots()
+    def __init__(self, hud=False):
+        self.app = QtWidgets.QApplication(sys.argv[:1])
+        self.plot = plot_gui_class.AnglePlots(hud=hud)
         # self.plot.show()
 
 
 if __name__ == '__main__':
-    my_gyro = GyroObject()
-    update_thread = background_threads.UpdateThread(my_gyro.plot)
+    import argparse
+    arg_parser = argparse.ArgumentParser(description="Roll, pitch and yaw plots of the IMU")
+    arg_parser.add_argument("port", nargs="?", default=transports.DEFAULT_PORT,
+                            help="serial port or transport URL, e.g. COM5 or synthetic://?rate=500")
+    arg_parser.add_argument("record_path", nargs="?", help="record the session to this binary file")
+    arg_parser.add_argument("--hud", action="store_true", help="show live performance stats over the plot")
+    args = arg_parser.parse_args()
+
+    my_gyro = GyroObject(hud=args.hud)
+    update_thread = background_threads.UpdateThread(my_gyro.plot, args.port, args.record_path)
     update_thread.start()
 
-    sys.exit(my_gyro.app.exec_())
+    exit_code = my_gyro.app.exec_()
+    update_thread.stop()
+    sys.exit(exit_code)
@@ -1,18 +1,43 @@
 from PyQt5 import QtWidgets
-from PyQt5.QtCore import pyqtSignal, pyqtSlot
+from PyQt5.QtCore import pyqtSlot
 import pyqtgraph as pg
 from pyqtgraph.Qt import QtCore, QtGui
 from pyqtgraph import GraphicsLayoutWidget
 from threading import Thread, Event
-from collections import deque
+import multiprocessing
 import serial
 from PyQt5.QtGui import QPixmap
 import time
+import copy
+import transports
+import session_recorder
+import acquisition_process
+import async_ingest
+import speed_engine
+import throttle_output
+import perf_stats
+import streaming_stats
+import orientation_filter
+import gl_render
+import sample_store
+import render_scheduler
+import lod_pyramid
+import session_analytics
+import profile_store
+import net_stream
+import numpy as np
+from sample_store import ROLL, PITCH, YAW, SPEED
+
+FOLLOW_WINDOW = profile_store.DEFAULT_WINDOW  # Seconds shown while following the newest data
+CURVES = ("roll", "pitch", "yaw", "speed")  # Channel order of the history pyramid
+LIVE_RATE = 5000  # Samples/s the GL vertex buffers are sized for, over the followed window
 
 
 # Root window with all widgets
 class MainWindow(QtWidgets.QWidget):
-    def __init__(self):
+    def __init__(self, port=transports.DEFAULT_PORT, record_path=None, use_process=False, throttle_url=None,
+                 hud=False, stats_path=None, filter_mode=None, smoothing=orientation_filter.DEFAULT_SMOOTHING,
+                 use_gl=False, profiles=None, profile=None, serve=None, subscribe=None):
         super(MainWindow, self).__init__()
         self.setWindowTitle("Scalextric Python GUI")
 
@@ -22,8 +47,18 @@ class MainWindow(QtWidgets.QWidget):
         self.speed_lbl = QtWidgets.QLabel(f"Current Speed: 0 %")
         self.eqn_lbl = QtWidgets.QLabel(f"Speed Equation: N/A")
 
-        # Connecting to a plot object to get data
-        self.target_plot = PlotData(self)
+        # Connecting to a plot object to get data. The profile's port and baud rate only apply here,
+        # everything else it holds can be switched while acquiring
+        self.profiles = profiles  # Optional profile_store.ProfileStore
+        self.profile = profile
+        baudrate = transports.DEFAULT_BAUDRATE if profile is None else profile.baudrate
+        window = FOLLOW_WINDOW if profile is None else profile.window
+        engine = None if profile is None else profile.engine()  # In place before the first batch
+        self.target_plot = PlotData(self, port, record_path=record_path, use_process=use_process,
+                                    throttle_url=throttle_url, hud=hud, stats_path=stats_path,
+                                    filter_mode=filter_mode, smoothing=smoothing, use_gl=use_gl,
+                                    baudrate=baudrate, window=window, serve=serve, subscribe=subscribe,
+                                    engine=engine)
 
         # Create the grid property manager
         layout = QtWidgets.QGridLayout()
@@ -50,6 +85,26 @@ class MainWindow(QtWidgets.QWidget):
         self.axis_sel.addItem("Pitch: y-axis")
         self.axis_sel.addItem("Yaw: z-axis")
 
+        # Latency vs. smoothness of the orientation filter, only when one is used
+        self.smoothing_sld = QtWidgets.QSlider(QtCore.Qt.Horizontal)
+        self.smoothing_sld.setRange(0, 100)
+        self.smoothing_sld.setValue(int(round(smoothing * 100)))
+        self.smoothing_sld.valueChanged.connect(self._smoothing_changed)
+        self.smoothing_lbl = QtWidgets.QLabel()
+        self._smoothing_changed(self.smoothing_sld.value())
+
+        # Stored profiles, typing a new name and saving creates one
+        self.profile_sel = QtWidgets.QComboBox()
+        self.profile_sel.setEditable(True)
+        self.save_profile_btn = QtWidgets.QPushButton("Save Profile")
+        self.save_profile_btn.clicked.connect(self._save_profile)
+        if self.profiles is not None:
+            self.profile_sel.addItems(self.profiles.names())
+            if self.profile is not None:
+                self.profile_sel.setCurrentText(self.profile.name)
+                self.target_plot.apply_profile(self.profile)
+            self.profile_sel.activated[str].connect(self._profile_selected)
+
         # LOGO
         self.pixmap = QPixmap('logo.png')
         self.pix_lbl = QtWidgets.QLabel(self)
@@ -57,29 +112,78 @@ class MainWindow(QtWidgets.QWidget):
         # Add widgets to layout
         # layout.addWidget(rst_btn, 1, 1)
         # layout.addWidget(cal_btn, 2, 1)
-        layout.addWidget(self.cal_max_btn, 4, 1)
-        layout.addWidget(self.cal_min_btn, 3, 1)
+        if subscribe is None:  # A thin client shows the server's speeds, calibration happens there
+            layout.addWidget(self.cal_max_btn, 4, 1)
+            layout.addWidget(self.cal_min_btn, 3, 1)
+            layout.addWidget(self.axis_sel, 2, 1)
         layout.addWidget(self.sys_info_lbl, 1, 1)
         layout.addWidget(self.speed_lbl, 5, 1)
         # layout.addWidget(self.eqn_lbl, 5, 1)
         # layout.addWidget(self.data_tbl, 7, 1)
         layout.addWidget(self.target_plot.plot, 0, 4, 0, 4)
-        layout.addWidget(self.axis_sel, 2, 1)
         layout.addWidget(self.pix_lbl, 0, 1)
+        if self.target_plot.orientation is not None:
+            layout.addWidget(self.smoothing_lbl, 6, 1)
+            layout.addWidget(self.smoothing_sld, 7, 1)
+        if self.profiles is not None and subscribe is None:
+            layout.addWidget(self.profile_sel, 8, 1)
+            layout.addWidget(self.save_profile_btn, 9, 1)
 
         # Add grid to the main window
         self.setLayout(layout)
 
+    @pyqtSlot(int)
+    def _smoothing_changed(self, value):
+        delay = self.target_plot.set_smoothing(value / 100)
+        self.smoothing_lbl.setText(f"Smoothing: {value} % (delay {delay * 1000:.0f} ms)")
 
-class PlotData(GraphicsLayoutWidget):
+    @pyqtSlot(str)
+    def _profile_selected(self, name):
+        if name not in self.profiles.profiles:
+            return  # A new name being typed, only saving creates it
+        self.profile = self.profiles.select(name)
+        self.target_plot.apply_profile(self.profile)
+
+    def calibrated(self):
+        """Keep a new calibration in the active profile, so it survives restarts"""
+        if self.profiles is not None and self.profile is not None:
+            self.profile = self.target_plot.current_profile(self.profile.name, self.profile)
+            self.profiles.put(self.profile)
+
+    @pyqtSlot()
+    def _save_profile(self):
+        """Store the current port, window, axis and calibration under the name in the profile box"""
+        name = self.profile_sel.currentText().strip()
+        if not name:
+            self.target_plot.update_sys_info(" Enter a profile name first")
+            return
+        self.profile = self.target_plot.current_profile(name, self.profile)
+        self.profiles.put(self.profile)
+        if self.profile_sel.findText(name) < 0:
+            self.profile_sel.addItem(name)
+        self.target_plot.update_sys_info(f" Profile {name} saved")
+
+    # The plot widget is never shown on its own, so forward the close to stop acquisition
+    def closeEvent(self, close_event):
+        self.target_plot.closeEvent(close_event)
 
-    data_acquired = pyqtSignal()
 
-    def __init__(self, target_gui):
+class PlotData(GraphicsLayoutWidget):
+
+    def __init__(self, target_gui, port=transports.DEFAULT_PORT, fps=render_scheduler.DEFAULT_FPS, record_path=None,
+                 use_process=False, throttle_url=None, hud=False, stats_path=None, filter_mode=None,
+                 smoothing=orientation_filter.DEFAULT_SMOOTHING, use_gl=False, baudrate=transports.DEFAULT_BAUDRATE,
+                 window=FOLLOW_WINDOW, serve=None, subscribe=None, engine=None):
         super().__init__()
+        self.port = port
+        self.baudrate = baudrate
+        self.window = window  # Seconds shown while following the newest data
 
-        # Create a plot object
-        self.plot = pg.PlotWidget()
+        # Create a plot object, on a GL viewport when the persistent vertex buffer path is used
+        self.use_gl = use_gl and gl_render.gl_available()
+        self.plot = pg.PlotWidget()  # Extra keywords would go to PlotItem.plot(), not to the viewport
+        if self.use_gl:
+            self.plot.useOpenGL(True)
 
         # Options for the plot widget
         # self.plot.setAutoVisible(y=1.0)
@@ -89,43 +193,184 @@ class PlotData(GraphicsLayoutWidget):
         # Connect to main window
         self.target_gui = target_gui
 
-        # Connection to serial port
-        self.ser = self.serial_connect()
-        self.data_acquired.connect(self.update_data)
+        # Speed commands go straight from the acquisition path to the car controller
+        try:
+            self.throttle = throttle_output.ThrottleOutput(throttle_output.open_sink(throttle_url))
+        except OSError:
+            print("Throttle output connection Failed")
+            self.throttle = throttle_output.ThrottleOutput()
+        self._perf_offset = time.perf_counter() - time.time()  # Epoch -> perf_counter stamps
+
+        # Hot-path instrumentation, always on. Read/parse are only timed when decoding happens here
+        self.stats = perf_stats.PerfStats(("ingested", "rendered", "corrupt", "dropped"),
+                                          ("read", "parse", "filter", "speed", "store", "render"))
+
+        # Optional smoothing/fusion between the parser and everything downstream (store, speed, plots)
+        self.orientation = None
+        if filter_mode is not None:
+            self.orientation = orientation_filter.OrientationFilter(filter_mode, smoothing)
+
+        # Connection to serial port, either from here or from a separate acquisition process
+        self.ser = None
+        self.recorder = None
+        self.acquisition = None
+        self.pipeline = None
+        self.client = None
+        if subscribe is not None:
+            # Thin client: batches arrive decoded and with their speeds from a stream server
+            self.threadkill = Event()
+            self.client = self.stream_connect(subscribe)
+        elif use_process:
+            self.threadkill = multiprocessing.Event()
+            self.acquisition = acquisition_process.AcquisitionProcess(port, self.threadkill, baudrate,
+                                                                      record_path=record_path)
+            self.stats.add_gauge("ring_overruns", lambda: self.acquisition.ring.overruns)
+        else:
+            self.threadkill = Event()
+            self.ser = self.serial_connect(port, baudrate)
+
+            # asyncio ingestion on its own loop thread, fanning decoded batches out to bounded queues
+            self.pipeline = async_ingest.IngestPipeline(self.ser, stats=self.stats)
+            self.parser = self.pipeline.parser
+            self.pipeline.add_consumer(self._consume_batch, name="plot", inline=True)
+
+            # Optional session recording of every valid frame
+            if record_path is not None and self.ser is not None:
+                self.recorder = session_recorder.SessionRecorder(record_path, start_time=time.time())
+                self.pipeline.add_consumer(self._record_batch, name="recorder")
+
+        # Optional publishing of every batch to remote dashboards, a thin client can relay too
+        self.server = None
+        if serve is not None:
+            try:
+                self.server = net_stream.StreamServer(*net_stream.parse_address(serve)).start()
+                self.stats.add_gauge("stream_clients", lambda: len(self.server.clients))
+            except OSError as e:
+                print(f"Stream server failed: {e}")
 
         # Attributes for storage of important properties and objects
-        self.data = {}  # Data to be updated
         self.plots = {}  # Collection of the individual plot objects
         self.new_frame = (0, 0, 0)
+        self.t0 = time.time()
 
         # Small variables for calibration
         self.min_pos = (0, 0, 0)
         self.max_pos = (0, 0, 0)
+        self.calibration = streaming_stats.CalibrationCapture()  # Start/stop capture of the controller's travel
+        self.laps = session_analytics.LiveLapTracker()  # Lap times and lifts of the live stream
 
         # Attribute related to speed calculation
         self.speed = 0
-        self.speed_eqn = lambda a, b, c: 0
+        # Maps (N, 3) angle batches to speeds: a stored profile's, else 0 until calibrated
+        self.speed_eqn = speed_engine.SpeedEngine() if engine is None else engine
 
         # Creating the final window
         self._setup_plot()
 
+        # Redraws happen on the GUI thread at a fixed rate, however fast data comes in
+        self.render_scheduler = render_scheduler.RenderScheduler(self.history, self.update_data, fps=fps, parent=self,
+                                                                 stats=self.stats)
+        self.render_scheduler.start()
+
+        # Periodic stats snapshot for the optional HUD and the optional JSON/CSV export
+        self.hud = None
+        if hud:
+            self.hud = pg.TextItem(anchor=(0, 0), color='w', fill=(0, 0, 0, 150))
+            self.hud.setParentItem(self.plot.getViewBox())  # Pinned to the view, not to data coordinates
+            self.hud.setPos(5, 5)
+        self.stats_exporter = perf_stats.StatsExporter(stats_path) if stats_path is not None else None
+        self.stats_timer = QtCore.QTimer(self)
+        self.stats_timer.timeout.connect(self.update_stats)
+        if self.hud is not None or self.stats_exporter is not None:
+            self.stats_timer.start(int(perf_stats.DEFAULT_INTERVAL * 1000))
+
         # Initialising the update threads
-        self.threadkill = Event()
-        self.thread = Thread(target=self.generate_data, args=(self.data_acquired.emit, self.threadkill))
-        self.thread.start()
+        self.thread = Thread(target=self.generate_data if self.client is None else self.receive_data,
+                             args=(self.threadkill,))
+        if subscribe is not None:
+            connected = self.client is not None
+        else:
+            connected = self.acquisition.start() if self.acquisition is not None else self.ser is not None
+        if connected and self.pipeline is None:
+            self.thread.start()
+        elif connected:
+            self.pipeline.start_in_thread()
+        else:
+            self.update_sys_info(" Connection Failed")
+            if self.acquisition is not None:
+                self.acquisition.stop()
 
     # Kill our data acquisition thread when shutting down
     def closeEvent(self, close_event):
         self.threadkill.set()
-
-    # Slot to receive acquired data and update plot
+        if self.pipeline is not None:
+            self.pipeline.stop()
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+        self.throttle.close()
+        if self.server is not None:
+            self.server.stop()
+        self.stats_timer.stop()
+        if self.stats_exporter is not None:
+            self.stats_exporter.close()
+            self.stats_exporter = None
+
+    # Slot called by the stats timer
+    @pyqtSlot()
+    def update_stats(self):
+        row = self.stats.snapshot()
+        if self.hud is not None:
+            self.hud.setText(perf_stats.format_hud(row))
+        if self.stats_exporter is not None:
+            self.stats_exporter.write(row)
+
+    # Slot called by the render scheduler to update the plot
     @pyqtSlot()
     def update_data(self):
-        self.plots["roll"].setData(self.data["roll_data"])
-        self.plots["pitch"].setData(self.data["pitch_data"])
-        self.plots["yaw"].setData(self.data["yaw_data"])
-
-        self.target_gui.speed_lbl.setText(f"Current speed: {self.speed} %")
+        latest_time = self.history.last_time
+        if self.following:
+            self.plot.setXRange(latest_time - self.window, latest_time, padding=0)
+
+        if self.gl_chart is not None:
+            # Following: the GL buffers draw the window, uploading only new samples. Zoomed or panned
+            # away, or following a window longer than the buffers: the pyramid curves below take over
+            self.gl_chart.sync()
+            live = self.following and self.window * LIVE_RATE <= self.live_store.capacity
+            self.gl_chart.setVisible(live)
+            if live:
+                if self._curves_drawn:
+                    for name in CURVES:
+                        self.plots[name].setData([], [])
+                    self._curves_drawn = False
+                self._update_labels()
+                return
+            self._curves_drawn = True
+
+        # Only about two points per pixel of the visible range are ever pushed to the curves
+        (x_min, x_max), _ = self.plot.viewRange()
+        x, y = self.history.query(x_min, x_max, self.plot.getViewBox().width())
+        for i, name in enumerate(CURVES):
+            self.plots[name].setData(x, y[:, i])
+        self._update_labels()
+
+    def _update_labels(self):
+        latency = self.throttle.latency.summary()["emitted"]
+        last_lap = self.laps.last_lap
+        lap_text = "" if last_lap is None else f", last lap {last_lap['time']:.2f} s"
+        self.target_gui.speed_lbl.setText(
+            f"Current speed: {self.speed} % (latency p50 {latency['p50_ms']:.2f} ms, p99 {latency['p99_ms']:.2f} ms"
+            f"{lap_text})")
+
+    # Panning/zooming by hand stops following the newest data, a double click resumes it
+    def _range_changed_manually(self):
+        self.following = False
+        self.update_data()
+
+    def _mouse_clicked(self, event):
+        if event.double():
+            self.following = True
+            self.update_data()
 
     def _setup_plot(self):
         """Function called to create all the relevant data structures"""
@@ -133,7 +378,7 @@ class PlotData(GraphicsLayoutWidget):
         # Creating and setting up the ROOT of the window
         # self.plot = self.addPlot(title=f"Orientation")  # Root object of the GUI
         self.plot.setYRange(-180, 180)
-        self.plot.setXRange(0, 100)
+        self.plot.setXRange(0, self.window)
         self.plot.showGrid(x=True, y=True, alpha=0.5)
         x_axis = self.plot.getAxis("bottom")
         y_axis = self.plot.getAxis("left")
@@ -152,134 +397,227 @@ class PlotData(GraphicsLayoutWidget):
         self.plots["yaw"] = draw_yaw
         self.plots["speed"] = draw_speed
 
-        self.data["roll_data"] = deque([0]*100)
-        self.data["pitch_data"] = deque([0]*100)
-        self.data["yaw_data"] = deque([0]*100)
-        self.data["speed"] = deque([0]*100)
+        self.history = lod_pyramid.MinMaxPyramid(len(CURVES))  # Whole session, for zooming out
+
+        # Recent samples drawn through GL vertex buffers, only while following
+        self.live_store = None
+        self.gl_chart = None
+        self._curves_drawn = False
+        if self.use_gl:
+            self.live_store = sample_store.SampleStore(int(max(self.window, FOLLOW_WINDOW) * LIVE_RATE))
+            self.gl_chart = gl_render.GLStripChart(self.live_store, (ROLL, PITCH, YAW, SPEED), ('c', 'y', 'r', 'g'))
+            self.plot.addItem(self.gl_chart)
+
+        self.following = True
+        self.plot.getViewBox().sigRangeChangedManually.connect(self._range_changed_manually)
+        self.plot.scene().sigMouseClicked.connect(self._mouse_clicked)
 
     def reset(self):
         self.update_thread.reset_trigger.set()  # TODO correct the threading part here
         self.update_sys_info("System Info: Reset Initiated")
 
     def start_cal(self):
-        """Called when calibration should happen. Simply starts a parallel thread that dynamically creates
-        a new function"""
+        """Start capturing the controller's travel, the user then moves it from rest to full throttle"""
 
         # self.reset()
-        r_start = self.data["roll_data"][-1]
-        p_start = self.data["pitch_data"][-1]
-        y_start = self.data["yaw_data"][-1]
-        self.min_pos = (r_start, p_start, y_start)
-
-        self.target_gui.data_tbl.setItem(0, 1, QtWidgets.QTableWidgetItem(f"{r_start}"))
-        self.target_gui.data_tbl.setItem(1, 1, QtWidgets.QTableWidgetItem(f"{p_start}"))
-        self.target_gui.data_tbl.setItem(2, 1, QtWidgets.QTableWidgetItem(f"{y_start}"))
+        self.calibration.start()
+        self.update_sys_info(" Calibrating, move the controller to full throttle")
 
     def end_cal(self):
-        r_end = self.data["roll_data"][-1]
-        p_end = self.data["pitch_data"][-1]
-        y_end = self.data["yaw_data"][-1]
-        self.max_pos = (r_end, p_end, y_end)
-
-        self.target_gui.data_tbl.setItem(0, 2, QtWidgets.QTableWidgetItem(f"{r_end}"))
-        self.target_gui.data_tbl.setItem(1, 2, QtWidgets.QTableWidgetItem(f"{p_end}"))
-        self.target_gui.data_tbl.setItem(2, 2, QtWidgets.QTableWidgetItem(f"{y_end}"))
-
+        """Stop the capture and map the extrema of the captured sweep to 0-100 %"""
+        stats = self.calibration.stop()
+        if not stats.count:
+            self.update_sys_info(" No data received during calibration")
+            return
+        self.min_pos, self.max_pos = streaming_stats.travel(stats)
+
+        for row in range(3):
+            self.target_gui.data_tbl.setItem(row, 1, QtWidgets.QTableWidgetItem(f"{self.min_pos[row]}"))
+            self.target_gui.data_tbl.setItem(row, 2, QtWidgets.QTableWidgetItem(f"{self.max_pos[row]}"))
+
+        self.update_sys_info(" Calibrated")
         self.speed_eqn = self._gen_eqn()
+        self.target_gui.calibrated()
 
     def _gen_eqn(self):
-        # TODO Use case syntax instead of shitty if/elif
-        # Getting th right equation for the right choice of axis
-        if self.target_gui.axis_sel.currentIndex() == 0:  # If axis selected is x-axis (roll)
-            r_weight = 1
-            p_weight = 0
-            y_weight = 0
-
-        elif self.target_gui.axis_sel.currentIndex() == 1:  # If axis selected is y-axis (pitch)
-            r_weight = 0
-            p_weight = 1
-            y_weight = 0
+        """Precompute the speed mapping for the selected axis, once per calibration"""
+        profile = self.target_gui.profile
+        response = {} if profile is None else dict(dead_zone=profile.dead_zone, expo=profile.expo, lut=profile.lut)
+        engine = speed_engine.SpeedEngine.from_axis(self.min_pos, self.max_pos, self.target_gui.axis_sel.currentIndex(),
+                                                    **response)
+        if not engine.calibrated:
+            self.update_sys_info(" Calibration range is empty, move the controller further")
+        return engine
+
+    def apply_profile(self, profile):
+        """Switch window, axis and calibration while acquiring. The speed mapping is replaced in one
+        assignment, so the acquisition thread uses either the old or the new one for a whole batch"""
+        self.speed_eqn = profile.engine()
+        self.min_pos, self.max_pos = profile.min_pos, profile.max_pos
+        self.window = profile.window
+        self.target_gui.axis_sel.setCurrentIndex(profile.axis)
+        for row in range(3):
+            self.target_gui.data_tbl.setItem(row, 1, QtWidgets.QTableWidgetItem(f"{self.min_pos[row]}"))
+            self.target_gui.data_tbl.setItem(row, 2, QtWidgets.QTableWidgetItem(f"{self.max_pos[row]}"))
+
+        message = f" Profile {profile.name}" + ("" if profile.calibrated else ", not calibrated")
+        if (profile.port, profile.baudrate) != (self.port, self.baudrate):
+            message += f", {profile.port} at {profile.baudrate} baud applies on restart"
+        self.update_sys_info(message)
+
+    def current_profile(self, name, base=None):
+        """Profile of the current settings and calibration, keeping the response curve of `base`"""
+        profile = profile_store.Profile(name) if base is None else copy.copy(base)
+        profile.name = name
+        profile.port, profile.baudrate, profile.window = self.port, self.baudrate, self.window
+        profile.axis = self.target_gui.axis_sel.currentIndex()
+        profile.min_pos = tuple(float(value) for value in self.min_pos)
+        profile.max_pos = tuple(float(value) for value in self.max_pos)
+        return profile
 
-        elif self.target_gui.axis_sel.currentIndex() == 2:  # If axis selected is z-axis (yaw)
-            r_weight = 0
-            p_weight = 0
-            y_weight = 1
-
-        def speed_eqn(r, p, y):
-            r_per = ((r-self.min_pos[0])/(self.max_pos[0]-self.min_pos[0]))*100
-            p_per = ((p-self.min_pos[1])/(self.max_pos[1]-self.min_pos[1]))*100
-            y_per = ((y-self.min_pos[2])/(self.max_pos[2]-self.min_pos[2]))*100
-
-            speed = r_per*r_weight + p_per*p_weight + y_per*y_weight
+    def update_sys_info(self, message):
+        self.target_gui.sys_info_lbl.setText(f"System Info:{message}")
 
-            return speed
+    def set_smoothing(self, smoothing):
+        """Latency vs. smoothness of the orientation filter, 0-1. Returns the resulting delay in seconds"""
+        if self.orientation is None:
+            return 0.
+        self.orientation.smoothing = smoothing
+        return self.orientation.delay
+
+    def _filter(self, time_point, frames):
+        with self.stats.timed("filter"):
+            return self.orientation(time_point, frames)
+
+    def _add_samples(self, times, angles, stamps, speeds=None):
+        """Compute speeds, send the newest to the controller, then store a decoded (N, 3) batch.
+        times are host epoch seconds, stamps the perf_counter times of the stages so far. A thin client
+        passes the server's speeds instead: they are neither recomputed nor sent to the controller"""
+        if speeds is None:
+            start = time.perf_counter()
+            speeds = self.speed_eqn(angles)
+            stamps["speed"] = time.perf_counter()
+            self.throttle.emit(speeds[-1], stamps)
+            self.stats.add_time("speed", stamps["speed"] - start)
+        if self.server is not None:
+            self.server.publish(times, angles, speeds)
+
+        with self.stats.timed("store"):
+            time_points = times - self.t0
+            self.history.extend(time_points, np.column_stack((angles, speeds)))
+            if self.live_store is not None:
+                self.live_store.extend(time_points, angles, speeds)
+            self.calibration.extend(angles)
+            self.laps.extend(time_points, angles, speeds)
+
+        self.new_frame = tuple(angles[-1])
+        self.speed = speeds[-1]
+
+    # Pipeline consumers, called on the ingestion loop thread
+    def _consume_batch(self, batch):
+        angles = batch.angles if self.orientation is None else self._filter(batch.time, batch.frames)
+        if len(angles):
+            self._add_samples(batch.time, angles, dict(batch.stamps))
+
+    def _record_batch(self, batch):
+        self.recorder.write(batch.time, batch.raw_frames)
+
+    def generate_data(self, threadkill):
+        """Consumer thread of the acquisition process"""
+        while not threadkill.is_set():
 
-        return speed_eqn
+            times, angles = self.acquisition.read_batch()
+            if not len(angles):
+                continue
+            if self.orientation is not None:  # Only angles cross the process boundary: no fusion
+                angles = self._filter(times[-1], {"angle": angles})
+            # Decoding happened in the other process, only its arrival time is known here
+            self.stats.count("ingested", len(angles))
+            self._add_samples(times, angles, {"arrival": times[-1] + self._perf_offset})
 
-    def update_sys_info(self, message):
-        self.target_gui.sys_info_lbl.setText(f"System Info:{message}")
+        self.acquisition.stop()
 
-    def generate_data(self, callback, threadkill):
+    def receive_data(self, threadkill):
+        """Thread of the thin client"""
+        first = True
         while not threadkill.is_set():
+            try:
+                batch = self.client.read()
+            except (OSError, ValueError) as e:
+                print(f"Stream lost: {e}")
+                break
+            if batch is None:
+                continue
+            times, angles, speeds = batch
+            if first:  # Server times on this host's clock, whatever the offset between the two
+                self.t0 += times[-1] - time.time()
+                first = False
+            self.stats.count("ingested", len(angles))
+            self._add_samples(times, angles, {"arrival": time.perf_counter()}, speeds)
+
+        self.client.close()
 
-            buf = bytearray()
-            for i in range(11):
-                buf.extend(self.ser.read())
-
-            if str(buf.hex()[0:3]) != "555":
-                self.ser.reset_input_buffer()
-                # print(f"{str(buf[0:3].hex())} -> Corrupt Data. Reset...")
-
-            elif buf.hex()[0:4] == "5553":
-                hex_buf = buf.hex()
-                rollL = int(hex_buf[4:6], 16)
-                rollH = int(hex_buf[6:8], 16)
-                pitchL = int(hex_buf[8:10], 16)
-                pitchH = int(hex_buf[10:12], 16)
-                yawL = int(hex_buf[12:14], 16)
-                yawH = int(hex_buf[14:16], 16)
-
-                roll = ((((rollH << 8) | rollL)/32768)*180)
-                if roll > 180:
-                    roll -= 360
-                pitch = ((((pitchH << 8) | pitchL)/32768)*180)
-                if pitch > 180:
-                    pitch -= 360
-                yaw = ((((yawH << 8) | yawL)/32768)*180)
-                if yaw > 180:
-                    yaw -= 360
-
-                self.ser.reset_input_buffer()
-                self.new_frame = (roll, pitch, yaw)
-
-                self.data["roll_data"].popleft()
-                self.data["roll_data"].append(self.new_frame[0])
-                self.data["pitch_data"].popleft()
-                self.data["pitch_data"].append(self.new_frame[1])
-                self.data["yaw_data"].popleft()
-                self.data["yaw_data"].append(self.new_frame[2])
-
-                self.speed = round(self.speed_eqn(self.new_frame[0], self.new_frame[1], self.new_frame[2]), 3)
-                clamp = lambda n: max(min(100, n), 0)
-                self.speed = clamp(self.speed)
-                callback()
-                time.sleep(0.001)
+    @staticmethod
+    def stream_connect(address):
+        try:
+            client = net_stream.StreamClient(*net_stream.parse_address(address, "localhost"))
+        except OSError:
+            print("Connection Failed")
+            client = None
+        return client
 
     @staticmethod
-    def serial_connect():
+    def serial_connect(port=transports.DEFAULT_PORT, baudrate=transports.DEFAULT_BAUDRATE):
         try:
-            ser = serial.Serial(port="COM5", baudrate=115200)
+            ser = transports.open_transport(port, baudrate)
         except serial.serialutil.SerialException:
             print("Connection Failed")
             ser = None
-        ser.reset_input_buffer()
         return ser
 
 
 if __name__ == '__main__':
     import sys
-    app = QtWidgets.QApplication(sys.argv)
-    window = MainWindow()
+    import argparse
+    arg_parser = argparse.ArgumentParser(description="Scalextric Python GUI")
+    arg_parser.add_argument("port", nargs="?",
+                            help="serial port or transport URL, e.g. COM5 or synthetic://?rate=500 (default: the "
+                                 "profile's port, else COM5)")
+    arg_parser.add_argument("--profile", metavar="NAME", help="settings and calibration profile to start with "
+                                                              "(default: the last used one for this port)")
+    arg_parser.add_argument("--profiles", metavar="PATH", default=profile_store.DEFAULT_PATH, help="profile file")
+    arg_parser.add_argument("--record", metavar="PATH", help="record the session to a binary file")
+    arg_parser.add_argument("--process", action="store_true", help="read and decode in a separate process")
+    arg_parser.add_argument("--throttle", metavar="URL",
+                            help="throttle output, e.g. udp://127.0.0.1:9000, unix:///tmp/throttle or COM6")
+    arg_parser.add_argument("--filter", choices=(orientation_filter.LOWPASS, orientation_filter.COMPLEMENTARY),
+                            help="smooth the angles, or fuse accel and gyro packets for roll and pitch")
+    arg_parser.add_argument("--smoothing", type=float, default=orientation_filter.DEFAULT_SMOOTHING,
+                            help="0 (no delay) to 1 (smoothest), adjustable live in the window")
+    arg_parser.add_argument("--serve", metavar="[HOST:]PORT",
+                            help=f"publish every batch to remote dashboards, e.g. {net_stream.DEFAULT_PORT}")
+    arg_parser.add_argument("--subscribe", metavar="HOST:PORT",
+                            help="thin client: show what a --serve instance publishes instead of reading a port")
+    arg_parser.add_argument("--gl", action="store_true", help="draw through OpenGL vertex buffers when available")
+    arg_parser.add_argument("--hud", action="store_true", help="show live performance stats over the plot")
+    arg_parser.add_argument("--stats", metavar="PATH", help="export performance stats every second (.csv or JSON lines)")
+    args, qt_args = arg_parser.parse_known_args()
+
+    try:
+        profiles = profile_store.ProfileStore(args.profiles)
+    except (OSError, ValueError) as e:
+        print(f"Profiles unavailable: {e}")
+        profiles = None
+    profile = None if profiles is None else profiles.find(args.profile, args.port)
+    if args.profile is not None and profile is None:
+        print(f"No profile named {args.profile}")
+    port = args.port or (transports.DEFAULT_PORT if profile is None else profile.port)
+
+    app = QtWidgets.QApplication(sys.argv[:1] + qt_args)
+    window = MainWindow(port, record_path=args.record, use_process=args.process, throttle_url=args.throttle,
+                        hud=args.hud, stats_path=args.stats, filter_mode=args.filter, smoothing=args.smoothing,
+                        use_gl=args.gl, profiles=profiles, profile=profile, serve=args.serve,
+                        subscribe=args.subscribe)
     window.show()
     if (sys.flags.interactive != 1) or not hasattr(QtCore, 'PYQT_VERSION'):
         sys.exit(app.exec_())
\ No newline at end of file
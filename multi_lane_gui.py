@@ -0,0 +1,131 @@
+from PyQt5 import QtWidgets
+from PyQt5.QtCore import pyqtSlot
+import pyqtgraph as pg
+import gl_render
+import render_scheduler
+import session_manager
+import transports
+from sample_store import TIME, ROLL, PITCH, YAW, SPEED
+
+CURVES = {"roll": (ROLL, 'c'), "pitch": (PITCH, 'y'), "yaw": (YAW, 'r'), "speed": (SPEED, 'g')}
+
+
+class LaneControls(QtWidgets.QWidget):
+    """Calibration buttons, axis choice and speed readout of one lane"""
+
+    def __init__(self, lane):
+        super(LaneControls, self).__init__()
+        self.lane = lane
+
+        self.speed_lbl = QtWidgets.QLabel("Current Speed: 0 %")
+        self.status_lbl = QtWidgets.QLabel("")  # Calibration messages, redraws only touch speed_lbl
+
+        self.axis_sel = QtWidgets.QComboBox()
+        self.axis_sel.addItem("Roll: x-axis")
+        self.axis_sel.addItem("Pitch: y-axis")
+        self.axis_sel.addItem("Yaw: z-axis")
+
+        cal_min_btn = QtWidgets.QPushButton("Start Calibration")
+        cal_min_btn.clicked.connect(self.lane.start_cal)
+        cal_max_btn = QtWidgets.QPushButton("End Calibration")
+        cal_max_btn.clicked.connect(self._end_cal)
+
+        layout = QtWidgets.QVBoxLayout()
+        layout.addWidget(QtWidgets.QLabel(lane.name))
+        layout.addWidget(self.axis_sel)
+        layout.addWidget(cal_min_btn)
+        layout.addWidget(cal_max_btn)
+        layout.addWidget(self.speed_lbl)
+        layout.addWidget(self.status_lbl)
+        layout.addStretch()
+        self.setLayout(layout)
+
+    @pyqtSlot()
+    def _end_cal(self):
+        if self.lane.end_cal(self.axis_sel.currentIndex()):
+            self.status_lbl.setText("")
+        else:
+            self.status_lbl.setText("Calibration range is empty")
+
+
+class MultiLaneWindow(QtWidgets.QWidget):
+    """One plot and one set of controls per lane, all redrawn from a single shared render tick"""
+
+    def __init__(self, ports, fps=render_scheduler.DEFAULT_FPS, use_gl=False):
+        super(MultiLaneWindow, self).__init__()
+        self.setWindowTitle("Scalextric Python GUI")
+        self.use_gl = use_gl and gl_render.gl_available()  # Otherwise the QPainter curves below
+
+        self.manager = session_manager.SessionManager(ports)
+        self.plots = []  # One dict of curves per lane, or one GLStripChart per lane
+        self.controls = []
+        self._drawn_counts = [-1] * len(self.manager.lanes)
+
+        layout = QtWidgets.QGridLayout()
+        for row, lane in enumerate(self.manager.lanes):
+            plot = pg.PlotWidget(title=lane.name)
+            if self.use_gl:
+                plot.useOpenGL(True)
+            plot.setYRange(-180, 180)
+            plot.showGrid(x=True, y=True, alpha=0.5)
+            plot.setDownsampling(auto=True, mode="peak")  # Keeps lanes cheap however long the window
+            plot.setClipToView(True)
+            plot.getAxis("bottom").setLabel(text="Time (s)")
+            plot.getAxis("left").setLabel(text="Angle (°)")
+            if self.use_gl:
+                chart = gl_render.GLStripChart(lane.store, [column for column, _ in CURVES.values()],
+                                               [pen for _, pen in CURVES.values()])
+                plot.addItem(chart)
+                self.plots.append(chart)
+            else:
+                self.plots.append({name: plot.plot(pen=pen) for name, (_, pen) in CURVES.items()})
+
+            controls = LaneControls(lane)
+            self.controls.append(controls)
+            layout.addWidget(controls, row, 0)
+            layout.addWidget(plot, row, 1)
+        self.setLayout(layout)
+
+        connected = self.manager.start()
+        for lane, controls in zip(self.manager.lanes, self.controls):
+            if lane not in connected:
+                controls.speed_lbl.setText("Connection Failed")
+
+        self.render_scheduler = render_scheduler.RenderScheduler(self.manager, self.redraw, fps=fps, parent=self)
+        self.render_scheduler.start()
+
+    @pyqtSlot()
+    def redraw(self):
+        for i, (lane, curves, controls) in enumerate(zip(self.manager.lanes, self.plots, self.controls)):
+            # Lanes without new samples since the last tick are left alone
+            if lane.store.count == self._drawn_counts[i]:
+                continue
+            self._drawn_counts[i] = lane.store.count
+            controls.speed_lbl.setText(f"Current speed: {lane.speed} %")
+
+            if self.use_gl:
+                curves.sync()
+                continue
+            # Copied, the lane's thread keeps overwriting the oldest samples while the curves hold them
+            time_data, *columns = lane.store.snapshot([TIME] + [column for column, _ in CURVES.values()])
+            for name, values in zip(CURVES, columns):
+                curves[name].setData(time_data, values)
+
+    def closeEvent(self, close_event):
+        self.render_scheduler.stop()
+        self.manager.stop()
+
+
+if __name__ == '__main__':
+    import sys
+    import argparse
+    arg_parser = argparse.ArgumentParser(description="Scalextric Python GUI, one plot per lane")
+    arg_parser.add_argument("ports", nargs="*", default=[transports.DEFAULT_PORT],
+                            help="one serial port or transport URL per lane")
+    arg_parser.add_argument("--gl", action="store_true", help="draw through OpenGL vertex buffers when available")
+    args, qt_args = arg_parser.parse_known_args()
+
+    app = QtWidgets.QApplication(sys.argv[:1] + qt_args)
+    window = MultiLaneWindow(args.ports, use_gl=args.gl)
+    window.show()
+    sys.exit(app.exec_())
@@ -0,0 +1,227 @@
+"""Publish decoded batches over TCP so that any number of remote dashboards can watch one controller.
+
+Every batch is encoded once, then queued to each client through an async_ingest.Consumer with the
+DROP_OLDEST policy: a slow or stalled client loses its oldest batches, it never blocks ingestion or
+the other clients. The server runs on its own asyncio loop thread, publish() only hands it bytes.
+
+Wire format, little endian, one message per batch and no other framing:
+    header   "WT" magic, uint16 sample count N, float64 epoch time of the last sample,
+             float32 seconds between samples (0 when the whole batch shares one time)
+    samples  N x (int16 roll, pitch, yaw at the sensor's own 180/32768 ° resolution, uint16 speed)
+8 bytes per sample: a fifth of float64 (time, angles, speed) rows, and less than the 11-byte angle frame.
+
+    python net_stream.py localhost:8765          # print what a server publishes
+"""
+import asyncio
+import socket
+import struct
+import threading
+import numpy as np
+import async_ingest
+from frame_decoder import ANGLE_SCALE
+
+MAGIC = b"WT"
+HEADER = struct.Struct("<2sHdf")
+SAMPLE = np.dtype([("angles", "<i2", 3), ("speed", "<u2")])
+SPEED_SCALE = 100 / 65535  # uint16 -> %
+MAX_SAMPLES = 65535  # Per message, larger batches are split
+DEFAULT_HOST = "0.0.0.0"
+DEFAULT_PORT = 8765
+DEFAULT_QUEUE_SIZE = 256  # Batches per client, about a second at 1 ms reads
+CONNECT_TIMEOUT = 2.
+READ_TIMEOUT = 0.1  # Seconds, bounds how late a client notices it was asked to stop
+
+
+def parse_address(address, default_host=DEFAULT_HOST):
+    """(host, port) from "host:port", ":port" or "port" """
+    host, _, port = str(address).rpartition(":")
+    return host or default_host, int(port)
+
+
+def encode(times, angles, speeds):
+    """Messages for a batch: times is one epoch time for the batch or (N,) per-sample times"""
+    angles = np.asarray(angles, dtype=float)
+    times = np.broadcast_to(times, len(angles))
+    messages = []
+    for start in range(0, len(angles), MAX_SAMPLES):
+        stop = min(start + MAX_SAMPLES, len(angles))
+        count = stop - start
+        period = (times[stop - 1] - times[start]) / (count - 1) if count > 1 else 0.
+        samples = np.empty(count, SAMPLE)
+        samples["angles"] = np.clip(np.round(angles[start:stop] / ANGLE_SCALE), -32768, 32767)
+        samples["speed"] = np.round(np.clip(np.asarray(speeds[start:stop], dtype=float), 0, 100) / SPEED_SCALE)
+        messages.append(HEADER.pack(MAGIC, count, times[stop - 1], period) + samples.tobytes())
+    return b"".join(messages)
+
+
+def decode(header, payload):
+    """(times (N,), angles (N, 3), speeds (N,)) of one message"""
+    magic, count, last_time, period = HEADER.unpack(header)
+    if magic != MAGIC:
+        raise ValueError("Not a stream message, out of sync")
+    samples = np.frombuffer(payload, SAMPLE, count)
+    times = last_time - period * np.arange(count - 1, -1, -1)
+    return times, samples["angles"] * ANGLE_SCALE, samples["speed"] * SPEED_SCALE
+
+
+class StreamServer(object):
+    """TCP publisher of decoded batches, one bounded queue per connected client.
+
+    publish() can be called from any thread (the acquisition thread, the ingestion loop): it encodes
+    the batch there and schedules the fan-out on the server's loop, nothing in it waits on a socket."""
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, queue_size=DEFAULT_QUEUE_SIZE):
+        self.host = host
+        self.port = port
+        self.queue_size = queue_size
+        self.clients = []  # async_ingest.Consumer per connection
+        self.dropped = 0  # Batches dropped by clients that already left
+        self._writers = set()
+        self.loop = None
+        self.thread = None
+        self._server = None
+        self._ready = threading.Event()
+        self._error = None
+
+    @property
+    def address(self):
+        """(host, port) actually listened on, port 0 resolved"""
+        return self._server.sockets[0].getsockname()[:2]
+
+    def start(self):
+        """Start listening on a loop thread. Raises OSError when the address is unavailable"""
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._run_loop, daemon=True)
+        self.thread.start()
+        self._ready.wait()
+        if self._error is not None:
+            self.thread.join()
+            raise self._error
+        return self
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        try:
+            self._server = self.loop.run_until_complete(asyncio.start_server(self._serve, self.host, self.port))
+        except OSError as e:
+            self._error = e
+            self._ready.set()
+            self.loop.close()
+            return
+        self._ready.set()
+        try:
+            self.loop.run_forever()
+        finally:
+            # Closing the connections ends their handlers, which then clean up after themselves
+            self._server.close()
+            for writer in self._writers:
+                writer.close()
+            self.loop.run_until_complete(asyncio.gather(*asyncio.all_tasks(self.loop), return_exceptions=True))
+            self.loop.close()
+
+    def stop(self):
+        if self.thread is not None and self.thread.is_alive():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join()
+
+    async def _serve(self, reader, writer):
+        writer.get_extra_info("socket").setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        async def send(message):
+            writer.write(message)
+            await writer.drain()  # Waits on this client only, its queue fills and drops meanwhile
+
+        peer = writer.get_extra_info("peername")
+        client = async_ingest.Consumer(send, self.queue_size, async_ingest.DROP_OLDEST, name=f"{peer[0]}:{peer[1]}")
+        client.queue = asyncio.Queue(self.queue_size)
+        self.clients.append(client)
+        self._writers.add(writer)
+        # Clients never send anything: reading only tells when they hang up
+        tasks = (asyncio.ensure_future(client.run()), asyncio.ensure_future(reader.read()))
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)  # A write to a closed socket ends it too
+            self.clients.remove(client)
+            self.dropped += client.dropped
+            self._writers.discard(writer)
+            writer.close()
+
+    def publish(self, times, angles, speeds):
+        """Send a batch to every client: times is the batch's epoch time or (N,) sample times"""
+        if not self.clients or not len(angles):
+            return
+        message = encode(times, angles, speeds)
+        self.loop.call_soon_threadsafe(self._fan_out, message)
+
+    def _fan_out(self, message):
+        for client in self.clients:
+            if client.queue.full():
+                client.dropped += 1
+                client.queue.get_nowait()
+            client.queue.put_nowait(message)
+
+    def client_stats(self):
+        """{client: (queued batches, dropped batches)}"""
+        return {client.name: (client.queue.qsize(), client.dropped) for client in self.clients}
+
+
+class StreamClient(object):
+    """Blocking subscriber of a StreamServer, for the thin GUI and scripts"""
+
+    def __init__(self, host, port, timeout=READ_TIMEOUT):
+        self.sock = socket.create_connection((host, port), CONNECT_TIMEOUT)
+        self.sock.settimeout(timeout)
+        self._buffer = bytearray()
+        self.received = 0  # Samples
+
+    def _fill(self, size):
+        """Whether `size` bytes are buffered, reading what arrives within the timeout.
+        Raises ConnectionError when the server hung up"""
+        while len(self._buffer) < size:
+            try:
+                chunk = self.sock.recv(max(size - len(self._buffer), 1 << 16))
+            except socket.timeout:
+                return False
+            if not chunk:
+                raise ConnectionError("Stream server closed the connection")
+            self._buffer += chunk
+        return True
+
+    def read(self):
+        """The next batch (times, angles, speeds), None when nothing complete arrived within the timeout"""
+        if not self._fill(HEADER.size):
+            return None
+        count = HEADER.unpack_from(self._buffer)[1]
+        size = HEADER.size + count * SAMPLE.itemsize
+        if not self._fill(size):
+            return None
+        message = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        batch = decode(message[:HEADER.size], message[HEADER.size:])
+        self.received += count
+        return batch
+
+    def close(self):
+        self.sock.close()
+
+
+if __name__ == '__main__':
+    import argparse
+    arg_parser = argparse.ArgumentParser(description="Print the batches a stream server publishes")
+    arg_parser.add_argument("address", nargs="?", default=f"localhost:{DEFAULT_PORT}", help="host:port")
+    args = arg_parser.parse_args()
+
+    stream = StreamClient(*parse_address(args.address, "localhost"))
+    try:
+        while True:
+            batch = stream.read()
+            if batch is not None:
+                for row in np.column_stack(batch):
+                    print(" ".join(f"{value:.6f}" for value in row))
+    except (KeyboardInterrupt, ConnectionError):
+        pass
+    finally:
+        stream.close()
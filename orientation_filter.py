@@ -0,0 +1,211 @@
+"""Optional smoothing and sensor fusion stage between the frame parser and the sample store.
+
+Both filters are first-order recurrences y[n] = (1 - a[n]) y[n-1] + a[n] x[n]. Instead of a Python loop
+per sample, a batch is solved in closed form with cumulative products and sums, so the cost is a
+handful of NumPy calls per batch and a constant amount of work per sample."""
+import numpy as np
+
+MAX_LOG_DECAY = 500.  # Largest -log of the decay products in first_order, exp(500) is far from overflow
+DEFAULT_PERIOD = 1 / 200  # Sample period assumed until two batches have been seen
+
+# Latency vs. smoothness: smoothing 0 passes angles through, 1 is the heaviest filtering
+MAX_CUTOFF = 30.  # Hz, One-Euro cutoff at rest for smoothing -> 0
+MIN_CUTOFF = 0.3  # Hz, One-Euro cutoff at rest for smoothing = 1
+DEFAULT_SMOOTHING = 0.5
+DEFAULT_BETA = 0.05  # Cutoff increase per °/s of movement, keeps fast moves responsive
+DERIVATIVE_CUTOFF = 1.  # Hz, smoothing of the speed estimate driving the adaptive cutoff
+FUSION_TIME_CONSTANT = 0.5  # Seconds, below it the gyro is trusted, above it the accelerometer
+
+LOWPASS = "lowpass"
+COMPLEMENTARY = "complementary"
+
+
+def first_order(x, alpha, y0):
+    """y[n] = (1 - alpha[n]) y[n-1] + alpha[n] x[n] for (N, C) inputs and gains, starting from y0 (C,).
+
+    With P[n] = prod_(k<=n) (1 - alpha[k]), y[n] = P[n] (y0 + sum_(j<=n) alpha[j] x[j] / P[j]): one
+    cumulative product and one cumulative sum. P is restarted whenever it would drop below
+    exp(-MAX_LOG_DECAY), so 1 / P can't overflow however long the batch or strong the gains."""
+    x = np.asarray(x, dtype=float)
+    gain = np.clip(alpha, 0, 1 - 1e-12)
+    log_keep = np.cumsum(np.log1p(-gain), axis=0)
+    y = np.empty_like(x)
+    start = 0
+    while start < len(x):
+        base = log_keep[start - 1] if start else 0.
+        # log_keep only decreases, so the rows still in range are a prefix
+        run = max(np.count_nonzero(np.all(log_keep[start:] - base > -MAX_LOG_DECAY, axis=1)), 1)
+        stop = start + run
+        keep = np.exp(log_keep[start:stop] - base)
+        y[start:stop] = keep * (y0 + np.cumsum(gain[start:stop] * x[start:stop] / keep, axis=0))
+        y0 = y[stop - 1]
+        start = stop
+    return y
+
+
+def wrap_angle(angles):
+    """Angles in degrees brought back to (-180, 180]"""
+    return angles - 360 * np.ceil((angles - 180) / 360)
+
+
+def unwrap_from(reference, angles):
+    """(N, C) angles in degrees made continuous, starting from the (C,) reference: no ±180° jumps"""
+    return np.unwrap(np.vstack((reference, angles)), period=360, axis=0)[1:]
+
+
+def smoothing_gain(cutoff, period):
+    """Gain of a first-order low-pass at `cutoff` Hz for samples `period` seconds apart"""
+    tau = 1 / (2 * np.pi * cutoff)
+    return 1 / (1 + tau / period)
+
+
+def tilt_angles(accel):
+    """Roll and pitch (°) of an (N, 3) accelerometer batch in g, from the gravity direction"""
+    ax, ay, az = accel.T
+    return np.degrees(np.column_stack((np.arctan2(ay, az), np.arctan2(-ax, np.hypot(ay, az)))))
+
+
+class OneEuroFilter(object):
+    """One-Euro filter (Casiez et al.): a low-pass whose cutoff rises with the speed of the signal.
+
+    At rest the cutoff is min_cutoff and jitter is removed, while moving it opens up by beta per unit/s
+    so that lag stays small. The speed estimate and the cutoff are per sample and per channel."""
+
+    def __init__(self, min_cutoff=1., beta=DEFAULT_BETA, d_cutoff=DERIVATIVE_CUTOFF, channels=3):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.channels = channels
+        self.reset()
+
+    def reset(self):
+        self.value = None  # Last filtered sample
+        self._raw = None  # Last raw sample
+        self._speed = np.zeros(self.channels)
+
+    def __call__(self, values, period):
+        """Filter an (N, channels) batch of samples `period` seconds apart"""
+        values = np.asarray(values, dtype=float)
+        if not len(values):
+            return values
+        if self.value is None:
+            self.value = self._raw = values[0]
+        # Filtered on the unwrapped angles: crossing ±180° is a small step, not a 360° one
+        values = unwrap_from(self._raw, values)
+        previous = np.vstack((self._raw, values[:-1]))
+        raw_speed = (values - previous) / period
+        speed = first_order(raw_speed, np.full_like(values, smoothing_gain(self.d_cutoff, period)), self._speed)
+
+        cutoff = self.min_cutoff + self.beta * np.abs(speed)
+        start = values[0] + wrap_angle(self.value - values[0])  # Last output, on the same turn as the input
+        filtered = wrap_angle(first_order(values, smoothing_gain(cutoff, period), start))
+
+        self._raw, self._speed, self.value = wrap_angle(values[-1]), speed[-1], filtered[-1]
+        return filtered
+
+
+class ComplementaryFilter(object):
+    """Roll and pitch fused from the gyro (0x52, short term) and the accelerometer (0x51, long term).
+
+    angle = k (angle + gyro dt) + (1 - k) accel_angle, with k from the time constant: the gyro's
+    integration drift and the accelerometer's vibration noise each only pass on their own side of it."""
+
+    def __init__(self, time_constant=FUSION_TIME_CONSTANT):
+        self.time_constant = time_constant
+        self.reset()
+
+    def reset(self):
+        self.value = None  # Last (roll, pitch)
+
+    def __call__(self, accel, gyro, period):
+        """(N, 2) roll/pitch from paired (N, 3) accel and gyro batches"""
+        tilt = tilt_angles(accel)
+        if self.value is None:
+            self.value = tilt[0]
+        tilt = unwrap_from(self.value, tilt)  # Roll through ±180° stays continuous
+        keep = self.time_constant / (self.time_constant + period)
+        # Same recurrence as the low-pass, with gain 1 - k on the input k gyro dt / (1 - k) + accel angle
+        fused = first_order(keep * gyro[:, :2] * period / (1 - keep) + tilt, np.full_like(tilt, 1 - keep), self.value)
+        fused = wrap_angle(fused)
+        self.value = fused[-1]
+        return fused
+
+
+class OrientationFilter(object):
+    """The stage applied to each parsed batch before the sample store and the speed engine.
+
+    mode LOWPASS smooths the device's own angles, COMPLEMENTARY replaces roll and pitch with the
+    accel/gyro fusion (yaw has no gravity reference and stays the device's). `smoothing` in 0-1 is the
+    latency vs. smoothness knob and can be changed live: 0 passes the angles through untouched."""
+
+    def __init__(self, mode=LOWPASS, smoothing=DEFAULT_SMOOTHING, beta=DEFAULT_BETA,
+                 time_constant=FUSION_TIME_CONSTANT):
+        if mode not in (LOWPASS, COMPLEMENTARY):
+            raise ValueError(f"Unknown filter mode {mode}")
+        self.mode = mode
+        self.one_euro = OneEuroFilter(beta=beta)
+        self.fusion = ComplementaryFilter(time_constant)
+        self.smoothing = smoothing
+        self._last_time = None
+        self._accel = np.empty((0, 3))  # Unpaired accel/gyro samples, waiting for their partner
+        self._gyro = np.empty((0, 3))
+        self._fused = np.empty((0, 2))  # Fused roll/pitch not yet matched with angle samples
+
+    @property
+    def smoothing(self):
+        return self._smoothing
+
+    @smoothing.setter
+    def smoothing(self, value):
+        self._smoothing = min(max(value, 0.), 1.)
+        self.one_euro.min_cutoff = MAX_CUTOFF * (MIN_CUTOFF / MAX_CUTOFF) ** self._smoothing
+
+    @property
+    def delay(self):
+        """Group delay at rest in seconds, what the smoothing costs in latency"""
+        return 1 / (2 * np.pi * self.one_euro.min_cutoff) if self._smoothing else 0.
+
+    def reset(self):
+        self.one_euro.reset()
+        self.fusion.reset()
+        self._last_time = None
+        self._accel, self._gyro, self._fused = self._accel[:0], self._gyro[:0], self._fused[:0]
+
+    def __call__(self, time_point, frames):
+        """Filtered (N, 3) angles of one parsed batch (a FrameParser dict) received at time_point"""
+        angles = np.array(frames["angle"], dtype=float)
+        elapsed = None if self._last_time is None else time_point - self._last_time
+        self._last_time = time_point
+
+        if self.mode == COMPLEMENTARY and "accel" in frames:
+            self._fuse(frames["accel"], frames["gyro"], elapsed)
+            if len(angles) and len(self._fused):
+                angles[:, :2] = _resample(self._fused, len(angles))
+                self._fused = self._fused[:0]
+            elif len(angles) and self.fusion.value is not None:
+                angles[:, :2] = self.fusion.value
+
+        if not len(angles) or not self._smoothing:
+            return angles
+        period = elapsed / len(angles) if elapsed else DEFAULT_PERIOD
+        return self.one_euro(angles, period)
+
+    def _fuse(self, accel, gyro, elapsed):
+        self._accel = np.vstack((self._accel, accel))
+        self._gyro = np.vstack((self._gyro, gyro))
+        n = min(len(self._accel), len(self._gyro))
+        if not n:
+            return
+        period = elapsed / n if elapsed else DEFAULT_PERIOD
+        fused = self.fusion(self._accel[:n], self._gyro[:n], period)
+        self._fused = np.vstack((self._fused, fused))
+        self._accel, self._gyro = self._accel[n:], self._gyro[n:]
+
+
+def _resample(values, n):
+    """(M, C) values stretched or squeezed onto n evenly spaced samples of the same interval"""
+    if len(values) == n:
+        return values
+    source = np.linspace(0, 1, len(values))
+    target = np.linspace(0, 1, n)
+    return np.column_stack([np.interp(target, source, column) for column in values.T])
@@ -0,0 +1,130 @@
+import csv
+import json
+import os
+import time
+
+DEFAULT_INTERVAL = 1.0  # Seconds between HUD refreshes / exported rows
+
+
+class _Timed(object):
+    """Context manager adding the duration of its block to one PerfStats timer"""
+
+    __slots__ = ("stats", "name", "start")
+
+    def __init__(self, stats, name):
+        self.stats = stats
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stats.add_time(self.name, time.perf_counter() - self.start)
+
+
+class PerfStats(object):
+    """Low-overhead counters, stage timers and gauges for the acquisition and render paths.
+
+    Counters and timers are plain integer/float updates, one or two per batch rather than per sample,
+    so instrumentation stays on all the time. They are written from the acquisition thread and read
+    from the GUI thread without a lock: a snapshot may be off by one batch, never corrupt. Gauges are
+    callables sampled only when a snapshot is taken (serial buffer fill, queue depth, ...).
+
+    snapshot() returns one flat dict per interval, ready for the HUD or a CSV row: totals, per-second
+    rates since the previous snapshot, and mean/max milliseconds per timed stage."""
+
+    def __init__(self, counters=(), timers=()):
+        # Declaring names up front keeps the exported columns stable from the first row on
+        self.counters = dict.fromkeys(counters, 0)
+        self.timers = {name: [0, 0., 0.] for name in timers}  # count, total seconds, max seconds
+        self.gauges = {}
+        self._last_counters = dict(self.counters)
+        self._last_time = time.perf_counter()
+        self.t0 = self._last_time
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def add_time(self, name, seconds):
+        timer = self.timers.get(name)
+        if timer is None:
+            timer = self.timers[name] = [0, 0., 0.]
+        timer[0] += 1
+        timer[1] += seconds
+        if seconds > timer[2]:
+            timer[2] = seconds
+
+    def timed(self, name):
+        """with stats.timed("parse"): ..."""
+        return _Timed(self, name)
+
+    def add_gauge(self, name, read):
+        """read() is called at every snapshot and must return a number"""
+        self.gauges[name] = read
+
+    def snapshot(self):
+        """Rates since the previous snapshot, then resets the per-interval timers"""
+        now = time.perf_counter()
+        elapsed = max(now - self._last_time, 1e-9)
+        counters = dict(self.counters)
+
+        row = {"time": round(time.time(), 3), "uptime": round(now - self.t0, 3)}
+        for name, total in counters.items():
+            row[name] = total
+            row[f"{name}_per_s"] = round((total - self._last_counters.get(name, 0)) / elapsed, 1)
+        for name, timer in self.timers.items():
+            n, total, worst = timer
+            row[f"{name}_mean_ms"] = round(total / n * 1e3, 4) if n else 0.
+            row[f"{name}_max_ms"] = round(worst * 1e3, 4)
+            timer[:] = [0, 0., 0.]
+        for name, read in self.gauges.items():
+            try:
+                row[name] = read()
+            except (AttributeError, OSError, ValueError):  # Source already closed
+                row[name] = None
+
+        self._last_counters = counters
+        self._last_time = now
+        return row
+
+
+def format_hud(row):
+    """Compact multi-line text of a snapshot, for an on-plot overlay or a label"""
+    lines = []
+    rates = [f"{key[:-6]} {row[key]:.0f}/s ({row[key[:-6]]})" for key in row if key.endswith("_per_s")]
+    if rates:
+        lines.append("  ".join(rates))
+    stages = [f"{key[:-8]} {row[key]:.3f}/{row[key[:-8] + '_max_ms']:.3f}"
+              for key in row if key.endswith("_mean_ms")]
+    if stages:
+        lines.append("ms mean/max: " + "  ".join(stages))
+    gauges = [f"{key} {value}" for key, value in row.items()
+              if key not in ("time", "uptime") and not key.endswith(("_per_s", "_ms")) and f"{key}_per_s" not in row]
+    if gauges:
+        lines.append("  ".join(gauges))
+    return "\n".join(lines)
+
+
+class StatsExporter(object):
+    """Appends snapshots to a .csv file, or to JSON lines for any other extension"""
+
+    def __init__(self, path):
+        self.path = path
+        self.csv = os.path.splitext(path)[1].lower() == ".csv"
+        self._file = open(path, "w", newline="")
+        self._writer = None
+
+    def write(self, row):
+        if self.csv:
+            if self._writer is None:
+                # Columns appearing after the first row are ignored, declare them in PerfStats instead
+                self._writer = csv.DictWriter(self._file, fieldnames=list(row), extrasaction="ignore")
+                self._writer.writeheader()
+            self._writer.writerow(row)
+        else:
+            self._file.write(json.dumps(row) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
@@ -1,18 +1,36 @@
 import numpy as np
-import threading
 import time
 import pyqtgraph as pg
-from PyQt5 import QtWidgets
+from PyQt5 import QtWidgets, QtCore
 from PyQt5.QtCore import pyqtSlot
+import sample_store
+import render_scheduler
+import perf_stats
+import streaming_stats
+import gl_render
+from sample_store import TIME, ROLL, PITCH, YAW
+
+HISTORY_CAPACITY = 30 * 1000  # One 30 s window at up to 1 kHz
+CALIBRATION_TIME = 5  # Seconds of movement captured by the Calibrate button
 
 
 class AnglePlots(pg.GraphicsLayoutWidget):
     """Class that represents the plot object"""
 
-    def __init__(self):
+    def __init__(self, fps=render_scheduler.DEFAULT_FPS, hud=False, use_gl=False):
         super(AnglePlots, self).__init__()
 
-        self.data = {}  # Data to be updated
+        # Curves drawn from persistent GL vertex buffers when asked for and a GL context is available
+        self.gl_chart = None
+        self.use_gl = use_gl and gl_render.gl_available()
+        if self.use_gl:
+            self.useOpenGL(True)
+
+        # Filled by the acquisition thread (read, parse, ingested) and the render scheduler
+        self.stats = perf_stats.PerfStats(("ingested", "rendered", "corrupt", "dropped"),
+                                          ("read", "parse", "store", "render"))
+        self.hud = hud
+
         self.plots = {}  # Collection of the individual plot objects
 
         self.period = 1  # Variable used for resetting the time window
@@ -23,6 +41,7 @@ class AnglePlots(pg.GraphicsLayoutWidget):
         self.pitch_offset = 0  # ^
         self.yaw_offset = 0  # ^
 
+        self.calibration = streaming_stats.CalibrationCapture()  # Fed by update(), no rescans of the store
         self.calibr_coef = {  # ??
             "min_roll": 0,
             "max_roll": 1,
@@ -36,6 +55,16 @@ class AnglePlots(pg.GraphicsLayoutWidget):
         self._setup_plot()
         self._setup_gui()
 
+        # Plots are redrawn from the GUI thread at a fixed rate, never from the acquisition thread
+        self.render_scheduler = render_scheduler.RenderScheduler(self.store, self.redraw, fps=fps, parent=self,
+                                                                 stats=self.stats)
+        self.render_scheduler.start()
+
+        self.stats_timer = QtCore.QTimer(self)
+        self.stats_timer.timeout.connect(self.update_stats)
+        if self.hud:
+            self.stats_timer.start(int(perf_stats.DEFAULT_INTERVAL * 1000))
+
     def _setup_plot(self):
         """"""
         self.analog_plot = self.addPlot(title=f"Orientation")
@@ -48,6 +77,13 @@ class AnglePlots(pg.GraphicsLayoutWidget):
         x_axis.setLabel(text="Time (s)")
         y_axis.setLabel(text="Angle (°)")
 
+        self.store = sample_store.SampleStore(HISTORY_CAPACITY)  # Data to be updated
+
+        if self.use_gl:
+            self.gl_chart = gl_render.GLStripChart(self.store, (ROLL, PITCH, YAW), ('c', 'y', 'r'))
+            self.analog_plot.addItem(self.gl_chart)
+            return
+
         draw_roll = self.analog_plot.plot(pen='c')
         draw_pitch = self.analog_plot.plot(pen='y')
         draw_yaw = self.analog_plot.plot(pen='r')
@@ -61,11 +97,6 @@ class AnglePlots(pg.GraphicsLayoutWidget):
         # self.legend.setParentItem(self.analog_plot.graphicsItem())
         # self.legend.addItem(self.analog_plot, 'HHH')
 
-        self.data["roll_data"] = np.array([], dtype=float)
-        self.data["pitch_data"] = np.array([], dtype=float)
-        self.data["yaw_data"] = np.array([], dtype=float)
-        self.data["time"] = np.array([], dtype=float)
-
     def _setup_gui(self):
         # General Window Features
         self.setWindowTitle('Graph')
@@ -87,48 +118,68 @@ class AnglePlots(pg.GraphicsLayoutWidget):
         self.analog_plot.addItem(self.speed_lbl)
 
         self.rnd_info = pg.TextItem(text='HI THERE', anchor=(0, 1), border='y')
-        self.analog_plot.addItem(self.rnd_info)
+        if self.hud:
+            # Performance overlay, pinned to the top left corner of the view whatever the axis ranges
+            self.rnd_info.setAnchor((0, 0))
+            self.rnd_info.setParentItem(self.analog_plot.getViewBox())
+            self.rnd_info.setPos(5, 5)
+        else:
+            self.analog_plot.addItem(self.rnd_info)
 
         self.show()
 
     @pyqtSlot()
     def _start_cal(self):
         self._reset()
-        starting_index = self.data["roll_data"].size - 1
-        calibration_rec_thread = CalibrationThread(plot=self, starting_index=starting_index)
-        calibration_rec_thread.start()
-
-    def end_recording(self, starting_index):
-        last_index = self.data["roll_data"].size - 1
+        self.calibration.start()
+        QtCore.QTimer.singleShot(CALIBRATION_TIME * 1000, self.end_recording)
 
-        self.calibr_coef["min_roll"] = np.amin(self.data["roll_data"][starting_index:last_index])
-        self.calibr_coef["max_roll"] = np.amax(self.data["roll_data"][starting_index:last_index])
-        self.calibr_coef["min_pitch"] = np.amin(self.data["pitch_data"][starting_index:last_index])
-        self.calibr_coef["max_pitch"] = np.amax(self.data["pitch_data"][starting_index:last_index])
-        self.calibr_coef["min_yaw"] = np.amin(self.data["yaw_data"][starting_index:last_index])
-        self.calibr_coef["max_yaw"] = np.amax(self.data["yaw_data"][starting_index:last_index])
+    @pyqtSlot()
+    def end_recording(self):
+        stats = self.calibration.stop()
+        if not stats.count:  # Nothing arrived, keep the previous calibration
+            return
+        self.calibr_coef["min_roll"], self.calibr_coef["min_pitch"], self.calibr_coef["min_yaw"] = stats.min
+        self.calibr_coef["max_roll"], self.calibr_coef["max_pitch"], self.calibr_coef["max_yaw"] = stats.max
 
         # print(self.calibr_coef)
 
     @pyqtSlot()
     def _reset(self):
-        self.roll_offset = self.data["roll_data"][-1]+self.roll_offset
-        self.pitch_offset = self.data["pitch_data"][-1]+self.pitch_offset
-        self.yaw_offset = self.data["yaw_data"][-1]+self.yaw_offset
+        latest = self.store.latest()
+        self.roll_offset = latest[ROLL]+self.roll_offset
+        self.pitch_offset = latest[PITCH]+self.pitch_offset
+        self.yaw_offset = latest[YAW]+self.yaw_offset
 
-    def update(self, time_point, data):
-        new_roll_point = data[0]-self.roll_offset
-        new_pitch_point = data[1]-self.pitch_offset
-        new_yaw_point = data[2]-self.yaw_offset % 180 + 90
+    @pyqtSlot()
+    def update_stats(self):
+        self.rnd_info.setText(perf_stats.format_hud(self.stats.snapshot()))
+
+    @pyqtSlot()
+    def redraw(self):
+        if self.gl_chart is not None:  # Only the new samples are uploaded
+            self.gl_chart.sync()
+            return
+        # A copy: pyqtgraph keeps the arrays until it paints, while acquisition keeps writing the store
+        new_time, roll, pitch, yaw = self.store.snapshot((TIME, ROLL, PITCH, YAW))
 
-        new_roll = np.append(self.data["roll_data"], new_roll_point)
-        new_pitch = np.append(self.data["pitch_data"], new_pitch_point)
-        new_yaw = np.append(self.data["yaw_data"], new_yaw_point)
-        new_time = np.append(self.data["time"], time_point-(30*(self.period-1)))
+        self.plots["roll"].setData(new_time, roll)
+        self.plots["pitch"].setData(new_time, pitch)
+        self.plots["yaw"].setData(new_time, yaw)
 
-        self.plots["roll"].setData(new_time, new_roll)
-        self.plots["pitch"].setData(new_time, new_pitch)
-        self.plots["yaw"].setData(new_time, new_yaw)
+    def update(self, time_point, data):
+        """Called from the acquisition thread with one (roll, pitch, yaw) sample or an (N, 3) batch.
+        Only writes to the store, redraw() is driven by the render scheduler"""
+        data = np.atleast_2d(data)
+        start = time.perf_counter()
+        new_roll_point = data[:, 0]-self.roll_offset
+        new_pitch_point = data[:, 1]-self.pitch_offset
+        new_yaw_point = data[:, 2]-self.yaw_offset % 180 + 90
+
+        new_points = np.column_stack((new_roll_point, new_pitch_point, new_yaw_point))
+        self.store.extend(time_point-(30*(self.period-1)), new_points)
+        self.calibration.extend(new_points)
+        self.stats.add_time("store", time.perf_counter() - start)
 
         r_max = self.calibr_coef["max_roll"]
         r_min = self.calibr_coef["min_roll"]
@@ -146,25 +197,6 @@ class AnglePlots(pg.GraphicsLayoutWidget):
             # self.speed = (roll_coeff + pitch_coeff + yaw_coeff)/300
             # self.speed_lbl.setText(f"Speed: {self.speed*100}%")
 
-        if new_time[-1] > 30:
-            self.data["roll_data"] = np.array([], dtype=float)
-            self.data["pitch_data"] = np.array([], dtype=float)
-            self.data["yaw_data"] = np.array([], dtype=float)
-            self.data["time"] = np.array([], dtype=float)
+        if self.store.latest()[TIME] > 30:
+            self.store.clear()
             self.period += 1
-        else:
-            self.data["roll_data"] = new_roll
-            self.data["pitch_data"] = new_pitch
-            self.data["yaw_data"] = new_yaw
-            self.data["time"] = new_time
-
-
-class CalibrationThread(threading.Thread):
-    def __init__(self, plot, starting_index):
-        super(CalibrationThread, self).__init__()
-        self.target = plot
-        self.starting_index = starting_index
-
-    def run(self):
-        time.sleep(5)
-        self.target.end_recording(self.starting_index)
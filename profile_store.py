@@ -0,0 +1,146 @@
+"""Persistent connection and calibration profiles, one per device or driver.
+
+A profile holds what used to be re-entered after every restart: the port and baud rate, the followed
+window length, the axis driving the speed and the calibration with its response curve. Profiles live
+in one JSON file, written atomically, so a crash mid-save can't lose the others.
+
+Building the SpeedEngine of a stored profile is a handful of NumPy operations: loading one at startup
+gives a calibrated throttle from the very first batch, and switching profiles while acquiring is a
+single attribute swap seen by the next batch."""
+import json
+import os
+import speed_engine
+import transports
+
+DEFAULT_PATH = os.path.join(os.path.expanduser("~"), ".scalextric_profiles.json")
+DEFAULT_WINDOW = 10  # Seconds shown while following the newest data
+AXES = ("roll", "pitch", "yaw")
+FIELDS = ("port", "baudrate", "window", "axis", "min_pos", "max_pos", "dead_zone", "expo", "lut")
+
+
+class Profile(object):
+    """Settings and calibration of one device or driver, `name` is the key in the store"""
+
+    def __init__(self, name, port=transports.DEFAULT_PORT, baudrate=transports.DEFAULT_BAUDRATE,
+                 window=DEFAULT_WINDOW, axis=0, min_pos=(0, 0, 0), max_pos=(0, 0, 0), dead_zone=(0., 100.),
+                 expo=0., lut=None):
+        self.name = name
+        self.port = port
+        self.baudrate = baudrate
+        self.window = window
+        self.axis = axis  # 0 roll, 1 pitch, 2 yaw
+        self.min_pos = tuple(float(value) for value in min_pos)
+        self.max_pos = tuple(float(value) for value in max_pos)
+        self.dead_zone = tuple(dead_zone)
+        self.expo = expo
+        self.lut = lut  # Optional (x, y) lists of a user response curve
+
+    @property
+    def calibrated(self):
+        return self.min_pos != self.max_pos
+
+    def engine(self):
+        """The precomputed speed mapping of this profile, 0 everywhere when it isn't calibrated"""
+        return speed_engine.SpeedEngine.from_axis(self.min_pos, self.max_pos, self.axis, dead_zone=self.dead_zone,
+                                                  expo=self.expo, lut=self.lut)
+
+    def to_dict(self):
+        return {
+            "port": self.port,
+            "baudrate": self.baudrate,
+            "window": self.window,
+            "axis": AXES[self.axis],
+            "min_pos": list(self.min_pos),
+            "max_pos": list(self.max_pos),
+            "dead_zone": list(self.dead_zone),
+            "expo": self.expo,
+            "lut": self.lut,
+        }
+
+    @classmethod
+    def from_dict(cls, name, data):
+        """Profile from its stored fields. Raises ValueError on unknown fields (a typo, or a file written
+        by a newer version) and on values of the wrong type, never anything else"""
+        data = dict(data)
+        unknown = set(data) - set(FIELDS)
+        if unknown:
+            raise ValueError(f"Profile {name} has unknown fields: {', '.join(sorted(unknown))}")
+        try:
+            if "axis" in data:
+                data["axis"] = AXES.index(data["axis"])
+            return cls(name, **data)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Profile {name} is invalid: {e}")
+
+
+class ProfileStore(object):
+    """All profiles of one file, plus which one was used last.
+
+    Every change is saved right away: the file is the only state, so several tools (the GUI, capture.py)
+    can share it. A missing file is an empty store, a corrupt one raises ValueError instead of being
+    silently overwritten."""
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self.profiles = {}
+        self.active = None  # Name of the profile used last
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            data = {}
+        except ValueError as e:
+            raise ValueError(f"Profile file {self.path} is corrupt: {e}")
+        self.profiles = {name: Profile.from_dict(name, fields) for name, fields in data.get("profiles", {}).items()}
+        self.active = data.get("active") if data.get("active") in self.profiles else None
+
+    def save(self):
+        data = {
+            "active": self.active,
+            "profiles": {name: profile.to_dict() for name, profile in sorted(self.profiles.items())},
+        }
+        # Written next to the target then renamed over it, readers never see a half-written file
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(data, f, indent=2)
+        os.replace(temp_path, self.path)
+
+    def names(self):
+        return sorted(self.profiles)
+
+    def get(self, name):
+        """The profile called `name`, KeyError when there is none"""
+        return self.profiles[name]
+
+    def find(self, name=None, port=None):
+        """Profile to start with: `name` if given, else the last used one if it is for `port` (or no
+        port was given), else the first one for `port`. None when nothing matches"""
+        if name is not None:
+            return self.profiles.get(name)
+        last = self.profiles.get(self.active)
+        if last is not None and port in (None, last.port):
+            return last
+        return next((self.profiles[key] for key in self.names() if self.profiles[key].port == port), None)
+
+    def put(self, profile, activate=True):
+        """Add or replace a profile and save"""
+        self.profiles[profile.name] = profile
+        if activate:
+            self.active = profile.name
+        self.save()
+
+    def select(self, name):
+        """Make `name` the profile used at the next start. Returns it"""
+        profile = self.profiles[name]
+        self.active = name
+        self.save()
+        return profile
+
+    def remove(self, name):
+        del self.profiles[name]
+        if self.active == name:
+            self.active = None
+        self.save()
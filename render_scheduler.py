@@ -0,0 +1,55 @@
+import time
+from PyQt5 import QtCore
+
+DEFAULT_FPS = 30
+
+
+class RenderScheduler(QtCore.QObject):
+    """Redraws the plots from the GUI thread at a fixed frame rate.
+
+    Acquisition threads only write into the sample store. On every tick the scheduler checks whether
+    the store received new samples since the last redraw: any number of them are coalesced into a single
+    redraw, and the tick is skipped when nothing changed. GUI cost no longer scales with the input rate.
+    `store` is anything counting the samples it received in `count` (SampleStore, MinMaxPyramid).
+
+    With a perf_stats.PerfStats, rendered frames are counted as 'rendered' and redraws timed as 'render'."""
+
+    def __init__(self, store, redraw, fps=DEFAULT_FPS, parent=None, stats=None):
+        super(RenderScheduler, self).__init__(parent)
+        self.store = store
+        self.redraw = redraw  # Callable run on the GUI thread
+        self.stats = stats
+        self._drawn_count = -1  # store.count at the last redraw
+
+        # Counters
+        self.frames_rendered = 0
+        self.frames_skipped = 0
+
+        self.timer = QtCore.QTimer(self)
+        self.timer.setTimerType(QtCore.Qt.PreciseTimer)
+        self.timer.timeout.connect(self._tick)
+        self.set_fps(fps)
+
+    def set_fps(self, fps):
+        self.fps = fps
+        self.timer.setInterval(int(round(1000 / fps)))
+
+    def start(self):
+        self.timer.start()
+
+    def stop(self):
+        self.timer.stop()
+
+    @QtCore.pyqtSlot()
+    def _tick(self):
+        count = self.store.count
+        if count == self._drawn_count:
+            self.frames_skipped += 1
+            return
+        self._drawn_count = count
+        start = time.perf_counter()
+        self.redraw()
+        self.frames_rendered += 1
+        if self.stats is not None:
+            self.stats.add_time("render", time.perf_counter() - start)
+            self.stats.count("rendered")
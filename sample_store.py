@@ -0,0 +1,89 @@
+import threading
+import numpy as np
+
+# Column layout of the store
+COLUMNS = ("time", "roll", "pitch", "yaw", "speed")
+TIME, ROLL, PITCH, YAW, SPEED = range(len(COLUMNS))
+
+
+class SampleStore(object):
+    """Fixed-capacity circular buffer of (time, roll, pitch, yaw, speed) samples.
+
+    Every sample is written twice, at i and i + capacity, so the most recent samples always form one
+    contiguous slice, appends are O(1) and memory never grows past the capacity. Meant for a single
+    writer thread: column() views are only safe on that thread, other threads (the GUI) take copies
+    with snapshot(), or hold `lock` around their reads, since the writer overwrites the oldest rows."""
+
+    def __init__(self, capacity):
+        self.capacity = int(capacity)
+        self._data = np.zeros((len(COLUMNS), 2 * self.capacity))
+        self._head = 0  # Next write position in [0, capacity)
+        self._length = 0  # Number of valid samples
+        self.count = 0  # Samples appended since creation, never wraps
+        self.lock = threading.Lock()  # Held by writers, and by readers on other threads
+
+    def __len__(self):
+        return self._length
+
+    def append(self, time_point, roll, pitch, yaw, speed=0.):
+        with self.lock:
+            self._append(time_point, roll, pitch, yaw, speed)
+
+    def _append(self, time_point, roll, pitch, yaw, speed):
+        self._data[:, self._head] = time_point, roll, pitch, yaw, speed
+        self._data[:, self._head + self.capacity] = self._data[:, self._head]
+        self._head = (self._head + 1) % self.capacity
+        self._length = min(self._length + 1, self.capacity)
+        self.count += 1
+
+    def extend(self, times, angles, speeds=0.):
+        """Append a batch. times and speeds are scalars or (N,) arrays, angles is an (N, 3) array"""
+        angles = np.asarray(angles, dtype=float).reshape(-1, 3)
+        n = len(angles)
+        if n == 0:
+            return
+
+        block = np.empty((len(COLUMNS), n))
+        block[TIME] = times
+        block[ROLL:YAW + 1] = angles.T
+        block[SPEED] = speeds
+        if n > self.capacity:  # Only the newest samples would survive anyway
+            block = block[:, -self.capacity:]
+            n = self.capacity
+
+        # Write in at most two segments, each one to both halves
+        with self.lock:
+            first = min(n, self.capacity - self._head)
+            for offset in (0, self.capacity):
+                self._data[:, offset + self._head:offset + self._head + first] = block[:, :first]
+                self._data[:, offset:offset + n - first] = block[:, first:]
+            self._head = (self._head + n) % self.capacity
+            self._length = min(self._length + n, self.capacity)
+            self.count += len(angles)
+
+    def column(self, index, n=None):
+        """Zero-copy view of the last n samples (all by default) of one column, oldest first.
+        Only for the writer thread or under `lock`: the writer reuses this memory"""
+        n = self._length if n is None else max(0, min(n, self._length))
+        end = self._head + self.capacity
+        return self._data[index, end - n:end]
+
+    def snapshot(self, columns, n=None):
+        """(len(columns), n) copy of the last n samples (all by default) of the columns, oldest first.
+        Safe to hand to the GUI while the writer keeps appending"""
+        with self.lock:
+            n = self._length if n is None else max(0, min(n, self._length))
+            end = self._head + self.capacity
+            return self._data[list(columns), end - n:end]  # Fancy indexing copies
+
+    def latest(self):
+        """The most recent (time, roll, pitch, yaw, speed) sample, zeros while empty"""
+        with self.lock:
+            if not self._length:
+                return np.zeros(len(COLUMNS))
+            return self._data[:, self._head + self.capacity - 1].copy()
+
+    def clear(self):
+        with self.lock:
+            self._head = 0
+            self._length = 0
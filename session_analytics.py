@@ -0,0 +1,372 @@
+"""Lap and segment detection with per-lap statistics, over recordings or the live stream.
+
+Recordings are decoded chunk by chunk from the memory map and every detector is a handful of NumPy
+passes over the whole session (threshold crossings, accumulated maxima, one FFT autocorrelation), so
+an hour at 1 kHz is analysed in seconds. Those passes need the session at once, but only as time, yaw
+and speed: 24 bytes per angle sample held, about 90 MB for that hour, the rest of each chunk is dropped. Results are cached as JSON next to the recording and reused
+as long as the recording and the analysis parameters are unchanged.
+
+    python session_analytics.py race.rec --min -30 0 0 --max 30 0 0 --axis roll
+"""
+import hashlib
+import json
+import os
+import numpy as np
+import session_recorder
+import speed_engine
+import streaming_stats
+
+CHUNK_RECORDS = 1 << 20  # Records decoded at once from the memory map
+ESTIMATE_PERCENTILES = (1, 99)  # Axis range standing in for a calibration when there is none
+CACHE_SUFFIX = ".analysis.json"
+
+# Detection parameters
+RESAMPLE_RATE = 100.  # Hz, uniform grid for the lap period estimate
+MIN_LAP, MAX_LAP = 2., 120.  # Seconds, range of plausible lap times
+MIN_CORRELATION = 0.3  # Autocorrelation needed to call the throttle pattern periodic
+LAP_TOLERANCE = 0.2  # Each lap boundary is searched within +-20 % of the lap period
+MIN_TURNS = 2  # Full yaw turns needed before yaw is used to split laps
+LIFT_BELOW, LIFT_ABOVE = 20., 40.  # Speed %, hysteresis of a lift (corner): starts below, ends above
+FULL_THROTTLE = 95.  # Speed %
+LIVE_CHUNK = 256  # Samples the live tracker gathers before running its NumPy passes
+LIVE_DELAY = 0.1  # Seconds, longest the live tracker holds samples back at low rates
+YAW = "yaw"
+SPEED = "speed"
+AUTO = "auto"
+
+
+# Signals
+def angle_chunks(reader):
+    """(times, (N, 3) angles) of a SessionReader, CHUNK_RECORDS records at a time"""
+    for start in range(0, len(reader), CHUNK_RECORDS):
+        yield reader.packets("angle", start, start + CHUNK_RECORDS)
+
+
+def load_signals(reader, engine=None, axis=0):
+    """(times, yaw, speeds) of a SessionReader. Speeds are computed chunk by chunk, the full (N, 3)
+    angles of the session never exist at once.
+
+    Without a calibrated engine the throttle is estimated from the range the axis covered during the
+    session (1st to 99th percentile), which is what a calibration would typically capture: a first pass
+    then gathers that axis alone."""
+    if engine is None or not engine.calibrated:
+        column = [angles[:, axis].copy() for _, angles in angle_chunks(reader)]
+        column = np.concatenate(column) if column else np.empty(0)
+        if not len(column):
+            return np.empty(0), np.empty(0), np.empty(0)
+        low, high = np.percentile(column, ESTIMATE_PERCENTILES)
+        del column
+        engine = speed_engine.SpeedEngine.from_axis(np.full(3, low), np.full(3, high), axis)
+
+    times, yaw, speeds = [], [], []
+    for chunk_times, chunk_angles in angle_chunks(reader):
+        times.append(chunk_times)
+        yaw.append(chunk_angles[:, 2].copy())  # Not a view, which would keep the whole chunk alive
+        speeds.append(engine(chunk_angles))
+    if not times:
+        return np.empty(0), np.empty(0), np.empty(0)
+    return spread_times(np.concatenate(times)), np.concatenate(yaw), np.concatenate(speeds)
+
+
+def spread_times(times):
+    """Samples of one read share its arrival time: space them evenly since the previous read instead"""
+    if len(times) < 2:
+        return times
+    last = np.flatnonzero(np.diff(times, append=np.inf) > 0)  # Last sample of each read
+    return np.interp(np.arange(len(times)), last, times[last])
+
+
+# Detectors
+def hysteresis_segments(values, below, above, inside=False):
+    """Segments where values drop under `below` and last until they rise over `above`.
+
+    Returns (starts, stops, inside): index arrays of the segment boundaries (stop exclusive) and whether
+    a segment is still open at the end. `inside` carries that state over from a previous batch, an
+    open segment then has no start and an unfinished one no stop."""
+    if not len(values):
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp), inside
+    index = np.arange(len(values))
+    last_below = np.maximum.accumulate(np.where(values < below, index, -1 if inside else -2))
+    last_above = np.maximum.accumulate(np.where(values > above, index, -2 if inside else -1))
+    state = (last_below > last_above).astype(np.int8)
+    edges = np.diff(state, prepend=np.int8(inside), append=state[-1])
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1), bool(state[-1])
+
+
+def yaw_turns(yaw):
+    """Indices where the unwrapped yaw completes another full turn (either direction)"""
+    if len(yaw) < 2:
+        return np.empty(0, dtype=np.intp)
+    unwrapped = np.degrees(np.unwrap(np.radians(yaw)))
+    travel = (unwrapped - unwrapped[0]) * np.sign(unwrapped[-1] - unwrapped[0])
+    turns = np.maximum.accumulate(np.floor(travel / 360))
+    return np.flatnonzero(np.diff(turns) > 0) + 1
+
+
+def lap_period(times, speeds):
+    """Dominant period (s) of the throttle pattern from its autocorrelation, None if not periodic"""
+    if len(times) < 2 or times[-1] - times[0] < 2 * MIN_LAP:
+        return None
+    grid = np.arange(times[0], times[-1], 1 / RESAMPLE_RATE)
+    signal = np.interp(grid, times, speeds)
+    signal -= signal.mean()
+    n = len(signal)
+    spectrum = np.fft.rfft(signal, 2 * n)
+    correlation = np.fft.irfft(spectrum * np.conj(spectrum))[:n]
+    if correlation[0] <= 0:
+        return None
+    correlation /= correlation[0]
+    low, high = int(MIN_LAP * RESAMPLE_RATE), min(int(MAX_LAP * RESAMPLE_RATE), n - 1)
+    if high <= low:
+        return None
+    lag = low + int(np.argmax(correlation[low:high]))
+    return lag / RESAMPLE_RATE if correlation[lag] >= MIN_CORRELATION else None
+
+
+def speed_laps(times, speeds, period, lift_starts):
+    """Lap boundaries at the start of the same lift every lap: the deepest lift of the first period,
+    then the lift starting closest to one period later (within LAP_TOLERANCE). Laps where that lift
+    was missed fall back to the deepest point of the search window"""
+    deepest = int(np.argmin(speeds[:np.searchsorted(times, times[0] + period)]))
+    before = lift_starts[lift_starts <= deepest]
+    boundaries = [int(before[-1]) if len(before) else deepest]
+    lift_times = times[lift_starts]
+    while True:
+        expected = times[boundaries[-1]] + period
+        low, high = expected - period * LAP_TOLERANCE, expected + period * LAP_TOLERANCE
+        start, stop = np.searchsorted(times, (low, high))
+        if stop >= len(times) or start >= stop:
+            break
+        first, last = np.searchsorted(lift_times, (low, high))
+        if last > first:
+            candidates = lift_starts[first:last]
+            boundaries.append(int(candidates[np.argmin(np.abs(times[candidates] - expected))]))
+        else:
+            boundaries.append(start + int(np.argmin(speeds[start:stop])))
+    return np.array(boundaries, dtype=np.intp)
+
+
+def detect_laps(times, yaw, speeds, lift_starts, method=AUTO):
+    """Lap boundary indices and the method used. Yaw turns when the IMU went round the track,
+    otherwise the repeating throttle pattern"""
+    if method in (AUTO, YAW):
+        turns = yaw_turns(yaw)
+        if method == YAW or len(turns) >= MIN_TURNS:
+            return np.concatenate(([0], turns)) if len(turns) else turns, YAW
+    period = lap_period(times, speeds)
+    if period is None:
+        return np.empty(0, dtype=np.intp), SPEED
+    return speed_laps(times, speeds, period, lift_starts), SPEED
+
+
+# Aggregates
+def lap_stats(times, speeds, boundaries, lift_starts):
+    """Per-lap aggregates between consecutive boundaries, all with reduceat passes"""
+    if len(boundaries) < 2:
+        return []
+    # reduceat sums each [boundary, next boundary) range, the range after the last one is dropped
+    dt = np.diff(times, append=times[-1])
+    full = np.add.reduceat((speeds >= FULL_THROTTLE) * dt, boundaries)[:-1]
+    sums = np.add.reduceat(speeds * dt, boundaries)[:-1]
+    peaks = np.maximum.reduceat(speeds, boundaries)[:-1]
+    lows = np.minimum.reduceat(speeds, boundaries)[:-1]
+    lifts = np.diff(np.searchsorted(lift_starts, boundaries))
+    laps = []
+    for lap, (start, stop) in enumerate(zip(boundaries[:-1], boundaries[1:])):
+        duration = times[stop] - times[start]
+        laps.append({
+            "lap": lap + 1,
+            "start": float(times[start]),
+            "time": float(duration),
+            "mean_speed": float(sums[lap] / duration) if duration else 0.,
+            "max_speed": float(peaks[lap]),
+            "min_speed": float(lows[lap]),
+            "full_throttle": float(full[lap] / duration) if duration else 0.,
+            "lifts": int(lifts[lap]),
+        })
+    return laps
+
+
+def lift_stats(times, speeds, starts, stops, boundaries):
+    """One entry per lift (corner): when, how long, how deep, and in which lap"""
+    laps = np.searchsorted(boundaries, starts, side="right") if len(boundaries) else np.zeros(len(starts), int)
+    lifts = []
+    for start, stop, lap in zip(starts, stops, laps):
+        lifts.append({
+            "lap": int(lap),  # 0 before the first boundary
+            "start": float(times[start]),
+            "time": float(times[stop - 1] - times[start]),
+            "min_speed": float(speeds[start:stop].min()),
+        })
+    return lifts
+
+
+def analyse(times, yaw, speeds, method=AUTO):
+    if not len(times):
+        return {"method": None, "laps": [], "lifts": []}
+    starts, stops, inside = hysteresis_segments(speeds, LIFT_BELOW, LIFT_ABOVE)
+    if inside:  # Session ended mid-lift
+        stops = np.append(stops, len(speeds))
+    boundaries, used = detect_laps(times, yaw, speeds, starts, method)
+    return {
+        "method": used,
+        "laps": lap_stats(times, speeds, boundaries, starts),
+        "lifts": lift_stats(times, speeds, starts, stops, boundaries),
+    }
+
+
+# Recordings and cache
+def cache_key(path, engine=None, axis=0, method=AUTO):
+    """Digest of everything the analysis of a recording depends on: the file, the options, the whole
+    speed mapping (an uncalibrated engine is replaced by the estimate, its curve never applies) and
+    every detection parameter"""
+    status = os.stat(path)
+    calibration = None
+    if engine is not None and engine.calibrated:
+        lut = None if engine.lut is None else [np.asarray(points, dtype=float).tolist() for points in engine.lut]
+        calibration = [engine.scale.tolist(), engine.offset, [float(value) for value in engine.dead_zone],
+                       float(engine.expo), lut]
+    inputs = {
+        "size": status.st_size,
+        "mtime": status.st_mtime,
+        "method": method,
+        "axis": axis,
+        "calibration": calibration,
+        "parameters": [ESTIMATE_PERCENTILES, RESAMPLE_RATE, MIN_LAP, MAX_LAP, MIN_CORRELATION, LAP_TOLERANCE,
+                       MIN_TURNS, LIFT_BELOW, LIFT_ABOVE, FULL_THROTTLE],
+    }
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode()).hexdigest()
+
+
+def analyse_recording(path, engine=None, axis=0, method=AUTO, use_cache=True):
+    """Analyse a session file, reusing the cached result when nothing changed"""
+    key = cache_key(path, engine, axis, method)
+    cache_path = path + CACHE_SUFFIX
+    if use_cache and os.path.exists(cache_path):
+        try:
+            with open(cache_path) as f:
+                cached = json.load(f)
+            if cached.get("key") == key:
+                return cached["result"]
+        except (OSError, ValueError):
+            pass  # Unreadable cache, recompute
+
+    times, yaw, speeds = load_signals(session_recorder.SessionReader(path), engine, axis)
+    result = analyse(times, yaw, speeds, method)
+    try:
+        with open(cache_path, "w") as f:
+            json.dump({"key": key, "result": result}, f)
+    except OSError:  # Read-only location, the result is still returned
+        pass
+    return result
+
+
+# Live stream
+class LiveLapTracker(object):
+    """Incremental laps and lifts on the live stream, batch by batch.
+
+    Laps are split on full yaw turns (the periodicity estimate needs the whole session), lifts with
+    the same hysteresis as offline, and the running lap's statistics use streaming_stats.RunningStats.
+    Small batches are gathered until LIVE_CHUNK samples or LIVE_DELAY seconds, then analysed in one
+    pass: the fixed cost of those NumPy calls would otherwise be paid every read of a few samples."""
+
+    def __init__(self):
+        self.laps = []  # Finished laps: dicts like the offline ones
+        self.lifts = 0  # Lifts in the running lap
+        self.current = streaming_stats.RunningStats(1)  # Speed of the running lap
+        self.lap_start = None
+        self._inside = False
+        self._last_yaw = None
+        self._travel = 0.  # Unwrapped yaw since the running lap started
+        self._turn_direction = 0
+        self._pending = []  # (times, yaw, speeds) of the batches not analysed yet
+        self._pending_count = 0
+
+    def extend(self, times, angles, speeds):
+        """times is a scalar or (N,) array, angles (N, 3), speeds (N,)"""
+        if not len(speeds):
+            return
+        # Copies, the caller may reuse its buffers before the chunk is analysed
+        times = np.full(len(speeds), times) if np.ndim(times) == 0 else np.array(times, dtype=float)
+        self._pending.append((times, np.array(angles[:, 2], dtype=float), np.array(speeds, dtype=float)))
+        self._pending_count += len(speeds)
+        if self._pending_count >= LIVE_CHUNK or times[-1] - self._pending[0][0][0] >= LIVE_DELAY:
+            self.flush()
+
+    def flush(self):
+        """Analyse the samples gathered so far"""
+        if not self._pending:
+            return
+        times, yaw, speeds = (np.concatenate(columns) for columns in zip(*self._pending))
+        self._pending = []
+        self._pending_count = 0
+        if self.lap_start is None:
+            self.lap_start = float(times[0])
+
+        starts, _, self._inside = hysteresis_segments(speeds, LIFT_BELOW, LIFT_ABOVE, self._inside)
+
+        previous = yaw[0] if self._last_yaw is None else self._last_yaw
+        steps = (np.diff(yaw, prepend=previous) + 180) % 360 - 180
+        travel = self._travel + np.cumsum(steps)
+        self._last_yaw = yaw[-1]
+        if not self._turn_direction and abs(travel[-1]) > 90:
+            self._turn_direction = np.sign(travel[-1])
+
+        # A chunk can hold several turns at high rates: split it at each one
+        begin, base = 0, 0.
+        while self._turn_direction:
+            done = np.flatnonzero((travel[begin:] - base) * self._turn_direction >= 360)
+            if not len(done):
+                break
+            end = begin + int(done[0])
+            self.current.extend(speeds[begin:end, None])
+            self.lifts += int(np.count_nonzero((starts >= begin) & (starts < end)))
+            self._finish_lap(float(times[end]))
+            begin, base = end, travel[end]
+        self._travel = float(travel[-1] - base)
+        self.current.extend(speeds[begin:, None])
+        self.lifts += int(np.count_nonzero(starts >= begin))
+
+    def _finish_lap(self, end_time):
+        stats = self.current
+        self.laps.append({
+            "lap": len(self.laps) + 1,
+            "start": self.lap_start,
+            "time": end_time - self.lap_start,
+            "mean_speed": float(stats.mean[0]),
+            "max_speed": float(stats.max[0]),
+            "min_speed": float(stats.min[0]),
+            "lifts": self.lifts,
+        })
+        self.current = streaming_stats.RunningStats(1)
+        self.lifts = 0
+        self.lap_start = end_time
+
+    @property
+    def last_lap(self):
+        return self.laps[-1] if self.laps else None
+
+
+if __name__ == '__main__':
+    import argparse
+    arg_parser = argparse.ArgumentParser(description="Lap times and per-lap statistics of a recorded session")
+    arg_parser.add_argument("recording")
+    arg_parser.add_argument("--min", nargs=3, type=float, metavar=("ROLL", "PITCH", "YAW"),
+                            help="calibration start position, estimated from the session when omitted")
+    arg_parser.add_argument("--max", nargs=3, type=float, metavar=("ROLL", "PITCH", "YAW"))
+    arg_parser.add_argument("--axis", choices=("roll", "pitch", "yaw"), default="roll")
+    arg_parser.add_argument("--method", choices=(AUTO, YAW, SPEED), default=AUTO)
+    arg_parser.add_argument("--no-cache", action="store_true")
+    args = arg_parser.parse_args()
+
+    axis = ("roll", "pitch", "yaw").index(args.axis)
+    engine = None
+    if args.min is not None and args.max is not None:
+        engine = speed_engine.SpeedEngine.from_axis(args.min, args.max, axis)
+    result = analyse_recording(args.recording, engine, axis, args.method, use_cache=not args.no_cache)
+
+    print(f"Laps split on {result['method']}, {len(result['lifts'])} lifts")
+    print(f"{'lap':>4} {'time (s)':>9} {'mean %':>7} {'max %':>6} {'full %':>7} {'lifts':>5}")
+    for lap in result["laps"]:
+        print(f"{lap['lap']:4d} {lap['time']:9.3f} {lap['mean_speed']:7.1f} {lap['max_speed']:6.1f} "
+              f"{lap['full_throttle'] * 100:7.1f} {lap['lifts']:5d}")
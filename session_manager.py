@@ -0,0 +1,132 @@
+import selectors
+import threading
+import time
+import numpy as np
+import serial
+import frame_decoder
+import sample_store
+import speed_engine
+import streaming_stats
+import transports
+
+DEFAULT_CAPACITY = 30 * 1000  # Samples kept per lane
+
+
+class Lane(object):
+    """One controller on the track: its transport, parser, sample store and calibration"""
+
+    def __init__(self, name, port, baudrate=transports.DEFAULT_BAUDRATE, capacity=DEFAULT_CAPACITY):
+        self.name = name
+        self.port = port
+        self.baudrate = baudrate
+        self.ser = None
+        self.parser = frame_decoder.FrameParser()
+        self.store = sample_store.SampleStore(capacity)
+
+        # Calibration
+        self.min_pos = np.zeros(3)
+        self.max_pos = np.zeros(3)
+        self.calibration = streaming_stats.CalibrationCapture()
+        self.speed_engine = speed_engine.SpeedEngine()  # 0 until calibrated
+        self.speed = 0
+
+    def connect(self):
+        try:
+            self.ser = transports.open_transport(self.port, self.baudrate, timeout=0)
+        except serial.serialutil.SerialException:
+            print(f"{self.name}: Connection Failed")
+            self.ser = None
+        return self.ser is not None
+
+    def fileno(self):
+        """File descriptor to wait on, None when the transport has none (Windows ports, simulators)"""
+        try:
+            return self.ser.fileno()
+        except (AttributeError, OSError, serial.SerialException):
+            return None
+
+    def poll(self, time_point):
+        """Consume whatever is waiting without blocking. Returns the number of new angle samples"""
+        waiting = self.ser.in_waiting
+        if not waiting:
+            return 0
+        angles = self.parser.feed(self.ser.read(waiting))["angle"]
+        if len(angles):
+            speeds = self.speed_engine(angles)
+            self.store.extend(time_point, angles, speeds)
+            self.calibration.extend(angles)
+            self.speed = speeds[-1]
+        return len(angles)
+
+    def start_cal(self):
+        self.calibration.start()
+
+    def end_cal(self, axis):
+        """Stop the travel capture and rebuild the speed mapping. Returns whether it is usable"""
+        stats = self.calibration.stop()
+        if not stats.count:
+            return False
+        self.min_pos, self.max_pos = streaming_stats.travel(stats)
+        self.speed_engine = speed_engine.SpeedEngine.from_axis(self.min_pos, self.max_pos, axis)
+        return self.speed_engine.calibrated
+
+    def close(self):
+        if self.ser is not None:
+            self.ser.close()
+
+
+class SessionManager(object):
+    """Acquires several lanes at once from a single worker thread.
+
+    When every transport exposes a file descriptor, the thread sleeps in one selector call until any of
+    them has data, otherwise it polls them all and naps briefly when none had anything. Either way one
+    wake-up serves every lane, so adding lanes costs far less than adding threads."""
+
+    POLL_INTERVAL = 0.001
+
+    def __init__(self, ports, baudrate=transports.DEFAULT_BAUDRATE, capacity=DEFAULT_CAPACITY):
+        self.lanes = [Lane(f"Lane {i + 1}", port, baudrate, capacity) for i, port in enumerate(ports)]
+        self.threadkill = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.t0 = time.time()
+
+    @property
+    def count(self):
+        """Samples acquired over all lanes, lets one RenderScheduler watch every lane"""
+        return sum(lane.store.count for lane in self.lanes)
+
+    def start(self):
+        """Connect every lane and start acquiring. Returns the lanes that connected"""
+        connected = [lane for lane in self.lanes if lane.connect()]
+        if connected:
+            self.thread.start()
+        return connected
+
+    def stop(self):
+        self.threadkill.set()
+        if self.thread.is_alive():
+            self.thread.join()
+        for lane in self.lanes:
+            lane.close()
+
+    def _run(self):
+        lanes = [lane for lane in self.lanes if lane.ser is not None]
+        selector = None
+        if all(lane.fileno() is not None for lane in lanes):
+            selector = selectors.DefaultSelector()
+            for lane in lanes:
+                selector.register(lane.fileno(), selectors.EVENT_READ, lane)
+
+        while not self.threadkill.is_set():
+            if selector is not None:
+                # Timeout so that threadkill is noticed even when every device is quiet
+                ready = [key.data for key, _ in selector.select(timeout=0.1)]
+            else:
+                ready = lanes
+            time_point = time.time() - self.t0
+            received = sum(lane.poll(time_point) for lane in ready)
+            if selector is None and not received:
+                time.sleep(self.POLL_INTERVAL)
+
+        if selector is not None:
+            selector.close()
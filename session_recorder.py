@@ -0,0 +1,110 @@
+import os
+import queue
+import struct
+import threading
+import numpy as np
+import frame_decoder
+from frame_decoder import FRAME_LEN, PACKET_TYPES, PACKET_SCALES
+
+# File layout: 16-byte header (magic, session start epoch) then fixed 19-byte records
+MAGIC = b"SCXREC1\0"
+HEADER = struct.Struct("<8sd")
+RECORD_DTYPE = np.dtype([("time", "<f8"), ("frame", "u1", (FRAME_LEN,))])
+
+_PACKET_IDS = {name: packet_id for packet_id, name in PACKET_TYPES.items()}
+
+
+def is_session_file(path):
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+class SessionRecorder(object):
+    """Appends raw frames and their host arrival time to a session file.
+
+    write() only puts the batch on a queue, a background thread does the file I/O, so the acquisition
+    thread never blocks on the disk. close() flushes whatever is still queued."""
+
+    def __init__(self, path, start_time=0.):
+        self.path = path
+        self._file = open(path, "wb")
+        self._file.write(HEADER.pack(MAGIC, start_time))
+        self._queue = queue.SimpleQueue()
+        self.records_written = 0
+
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def write(self, timestamp, raw_frames):
+        """Queue an (N, FRAME_LEN) uint8 batch of frames that arrived at `timestamp` (seconds)"""
+        if len(raw_frames):
+            self._queue.put((timestamp, raw_frames))
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+        self._file.close()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            timestamp, raw_frames = item
+            records = np.empty(len(raw_frames), dtype=RECORD_DTYPE)
+            records["time"] = timestamp
+            records["frame"] = raw_frames
+            self._file.write(records.tobytes())
+            self.records_written += len(records)
+        self._file.flush()
+
+
+class SessionReader(object):
+    """Memory-mapped, read-only view of a session file.
+
+    Nothing is loaded up front: slicing by record index or by time only touches the pages involved,
+    so multi-hour sessions can be scrubbed and analysed without fitting in RAM."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            magic, self.start_time = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a session recording")
+
+        # A trailing partial record (recorder killed mid-write) is ignored
+        n_records = (os.path.getsize(path) - HEADER.size) // RECORD_DTYPE.itemsize
+        if n_records:
+            self.records = np.memmap(path, dtype=RECORD_DTYPE, mode="r", offset=HEADER.size, shape=(n_records,))
+        else:
+            self.records = np.empty(0, dtype=RECORD_DTYPE)
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def times(self):
+        return self.records["time"]
+
+    @property
+    def duration(self):
+        return float(self.times[-1] - self.times[0]) if len(self) else 0.
+
+    def index_at(self, t):
+        """Index of the first record at or after time t"""
+        return int(np.searchsorted(self.times, t, side="left"))
+
+    def time_slice(self, t_start, t_end):
+        return slice(self.index_at(t_start), self.index_at(t_end))
+
+    def raw_bytes(self, start=0, stop=None):
+        """The frames of a record range as one contiguous byte string, ready to be re-parsed"""
+        return np.ascontiguousarray(self.records["frame"][start:stop]).tobytes()
+
+    def packets(self, name="angle", start=0, stop=None):
+        """Decode one packet type over a record range. Returns (times, (N, 3) values)"""
+        records = self.records[start:stop]
+        records = records[records["frame"][:, 1] == _PACKET_IDS[name]]
+        frames = np.ascontiguousarray(records["frame"]).ravel()
+        starts = np.arange(len(records)) * FRAME_LEN
+        return np.array(records["time"]), frame_decoder.frame_values(frames, starts, PACKET_SCALES[_PACKET_IDS[name]])
@@ -0,0 +1,66 @@
+import numpy as np
+
+MIN_SPAN = 1e-6  # Calibration ranges narrower than this (degrees) are treated as empty
+LUT_SIZE = 1025  # Points of the precomputed response curve
+
+
+class SpeedEngine(object):
+    """Calibration -> speed mapping, precomputed once and applied to whole (N, 3) batches.
+
+    The linear part collapses to one (3,) scale vector and an offset: speed = angles @ scale + offset,
+    clamped to 0-100 %. Non-linear responses (dead zones, exponential throttle, user lookup tables) are
+    baked into a single lookup table when the engine is built, so any curve costs one np.interp."""
+
+    def __init__(self, min_pos=(0, 0, 0), max_pos=(0, 0, 0), weights=(0, 0, 0), dead_zone=(0., 100.), expo=0.,
+                 lut=None):
+        min_pos = np.asarray(min_pos, dtype=float)
+        max_pos = np.asarray(max_pos, dtype=float)
+        weights = np.asarray(weights, dtype=float)
+        span = max_pos - min_pos
+
+        # An axis with no range can't be mapped, the engine then stays at 0 instead of dividing by zero
+        empty = (np.abs(span) < MIN_SPAN) & (weights != 0)
+        self.calibrated = bool(np.any(weights != 0) and not np.any(empty))
+        if self.calibrated:
+            self.scale = weights * 100 / np.where(weights != 0, span, 1)
+            self.offset = -float(min_pos @ self.scale)
+        else:
+            self.scale = np.zeros(3)
+            self.offset = 0.
+
+        self.min_pos = min_pos
+        self.max_pos = max_pos
+        self.weights = weights
+        self.dead_zone = dead_zone
+        self.expo = expo
+        self.lut = lut
+        self._curve = self._build_curve(dead_zone, expo, lut)
+
+    @classmethod
+    def from_axis(cls, min_pos, max_pos, axis, **kwargs):
+        """Engine driven by a single axis (0 roll, 1 pitch, 2 yaw)"""
+        return cls(min_pos, max_pos, np.eye(3)[axis], **kwargs)
+
+    @staticmethod
+    def _build_curve(dead_zone, expo, lut):
+        """Response curve sampled on LUT_SIZE points of 0-100 %, None when it is the identity"""
+        low, high = dead_zone
+        if (low, high) == (0, 100) and not expo and lut is None:
+            return None
+        x = np.linspace(0, 100, LUT_SIZE)
+        y = np.clip((x - low) / max(high - low, MIN_SPAN), 0, 1)
+        if expo:
+            y = np.expm1(expo * y) / np.expm1(expo)
+        y *= 100
+        if lut is not None:
+            y = np.interp(y, *lut)
+        return x, y
+
+    def __call__(self, angles):
+        """Speeds in % for an (N, 3) array of (roll, pitch, yaw)"""
+        speeds = np.asarray(angles, dtype=float) @ self.scale
+        speeds += self.offset
+        np.clip(speeds, 0, 100, out=speeds)
+        if self._curve is not None:
+            speeds = np.interp(speeds, *self._curve)
+        return np.round(speeds, 3, out=speeds)
@@ -0,0 +1,93 @@
+import threading
+import numpy as np
+
+
+class RunningStats(object):
+    """Running min, max, mean and variance per channel, updated batch by batch without keeping samples.
+
+    Batches are merged with the parallel form of Welford's algorithm (Chan et al.), which stays
+    numerically stable and costs O(1) per sample whatever was accumulated before."""
+
+    def __init__(self, channels=3):
+        self.channels = channels
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.mean = np.zeros(self.channels)
+        self._m2 = np.zeros(self.channels)  # Sum of squared deviations from the mean
+        self.min = np.full(self.channels, np.inf)
+        self.max = np.full(self.channels, -np.inf)
+        self.first = np.full(self.channels, np.nan)
+        self.last = np.full(self.channels, np.nan)
+
+    def extend(self, values):
+        """Add one (channels,) sample or an (N, channels) batch"""
+        values = np.atleast_2d(values)
+        n = len(values)
+        if not n:
+            return
+        batch_mean = values.mean(axis=0)
+        batch_m2 = ((values - batch_mean) ** 2).sum(axis=0)
+
+        total = self.count + n
+        delta = batch_mean - self.mean
+        self.mean = self.mean + delta * (n / total)
+        self._m2 = self._m2 + batch_m2 + delta ** 2 * (self.count * n / total)
+        self.count = total
+
+        np.minimum(self.min, values.min(axis=0), out=self.min)
+        np.maximum(self.max, values.max(axis=0), out=self.max)
+        if np.isnan(self.first[0]):
+            self.first = values[0].astype(float)
+        self.last = values[-1].astype(float)
+
+    @property
+    def variance(self):
+        """Sample variance, nan below two samples"""
+        return self._m2 / (self.count - 1) if self.count > 1 else np.full(self.channels, np.nan)
+
+    @property
+    def std(self):
+        return np.sqrt(self.variance)
+
+
+class CalibrationCapture(object):
+    """Start/stop capture of the controller's travel over the streaming statistics.
+
+    The acquisition thread feeds every batch, only those between start() and stop() are accumulated.
+    stop() returns the RunningStats of the capture: no sample arrays and no store indices are involved,
+    so clearing or wrapping the sample store during a calibration can't break it."""
+
+    def __init__(self, channels=3):
+        self.channels = channels
+        self.stats = RunningStats(channels)
+        self.active = False
+        self._lock = threading.Lock()  # start/stop come from the GUI thread, extend from acquisition
+
+    def start(self):
+        with self._lock:
+            self.stats = RunningStats(self.channels)
+            self.active = True
+
+    def extend(self, values):
+        if not self.active:
+            return
+        with self._lock:
+            if self.active:
+                self.stats.extend(values)
+
+    def stop(self):
+        """End the capture. Returns its RunningStats (count 0 when nothing arrived)"""
+        with self._lock:
+            self.active = False
+            return self.stats
+
+
+def travel(stats):
+    """(start_pos, end_pos) per channel of a calibration capture.
+
+    The extrema of the captured sweep, ordered by the direction of the movement from its first to its
+    last sample, so that a controller moved towards negative angles still maps start -> 0 %."""
+    forward = stats.last >= stats.first
+    return np.where(forward, stats.min, stats.max), np.where(forward, stats.max, stats.min)
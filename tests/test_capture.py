@@ -0,0 +1,20 @@
+import threading
+import numpy as np
+import capture
+import frame_decoder
+import transports
+
+
+def test_replay_stops_when_exhausted(tmp_path):
+    angles = np.column_stack((np.linspace(-30, 30, 500), np.zeros(500), np.zeros(500)))
+    path = tmp_path / "capture.bin"
+    path.write_bytes(frame_decoder.encode_frames(frame_decoder.ANGLE_ID, angles).tobytes())
+    ser = transports.open_transport(f"replay://{path}?speed=0", timeout=capture.READ_TIMEOUT)
+    rows = []
+    run = capture.Capture(ser, write=rows.append)
+    thread = threading.Thread(target=run.run, daemon=True)  # No duration: only the end of the replay stops it
+    thread.start()
+    thread.join(10)
+    assert not thread.is_alive()
+    assert run.samples == 500
+    assert np.allclose(np.concatenate(rows)[:, 1:4], angles, atol=frame_decoder.ANGLE_SCALE)
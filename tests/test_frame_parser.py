@@ -0,0 +1,106 @@
+import numpy as np
+import pytest
+import frame_decoder
+from frame_decoder import ANGLE_ID, ANGLE_SCALE, FRAME_LEN, GYRO_ID
+
+ANGLES = np.array([[10., -20., 30.], [1., 2., 3.], [-170., 5., 179.]])
+
+
+def frames(values=ANGLES, packet_id=ANGLE_ID):
+    return frame_decoder.encode_frames(packet_id, values).tobytes()
+
+
+def mixed_stream(n, corruption, seed=0):
+    """Angle and gyro frames with `corruption` of the frames cut short or given a bad checksum"""
+    rng = np.random.default_rng(seed)
+    angles = rng.uniform(-180, 180, (n, 3))
+    rows = np.stack((frame_decoder.encode_frames(ANGLE_ID, angles),
+                     frame_decoder.encode_frames(GYRO_ID, rng.uniform(-500, 500, (n, 3)))), axis=1)
+    stream = bytearray()
+    for frame in rows.reshape(-1, FRAME_LEN):
+        frame = bytearray(frame.tobytes())
+        if rng.random() < corruption:
+            if rng.random() < 0.5:
+                frame[-1] ^= 0xFF
+            else:
+                frame = frame[:int(rng.integers(1, FRAME_LEN))]
+        stream += frame
+    return bytes(stream)
+
+
+def feed_in_chunks(stream, sizes):
+    parser = frame_decoder.FrameParser()
+    decoded = {}
+    start = 0
+    for size in sizes:
+        for name, values in parser.feed(stream[start:start + size]).items():
+            decoded.setdefault(name, []).append(values)
+        start += size
+    return parser, {name: np.concatenate(values) for name, values in decoded.items()}
+
+
+@pytest.mark.parametrize("chunk", [b"", frames()[:5]])
+def test_incomplete_input_decodes_nothing(chunk):
+    parser = frame_decoder.FrameParser()
+    assert len(parser.feed(chunk)["angle"]) == 0
+    assert parser.stats()["dropped_frames"] == 0
+
+
+@pytest.mark.parametrize("repeat", [1, 100])  # Scalar and vectorised paths
+def test_decodes_values(repeat):
+    parser = frame_decoder.FrameParser()
+    decoded = parser.feed(frames(np.tile(ANGLES, (repeat, 1))))["angle"]
+    assert np.allclose(decoded, np.tile(ANGLES, (repeat, 1)), atol=ANGLE_SCALE)
+    assert parser.frame_counts["angle"] == 3 * repeat
+
+
+def test_frame_split_across_feeds():
+    parser = frame_decoder.FrameParser()
+    stream = frames()
+    assert len(parser.feed(stream[:16])["angle"]) == 1
+    assert np.allclose(parser.feed(stream[16:])["angle"], ANGLES[1:], atol=ANGLE_SCALE)
+
+
+def test_bad_checksum_is_skipped():
+    stream = bytearray(frames())
+    stream[FRAME_LEN + FRAME_LEN - 1] ^= 0xFF
+    parser = frame_decoder.FrameParser()
+    decoded = parser.feed(bytes(stream))["angle"]
+    assert np.allclose(decoded, ANGLES[[0, 2]], atol=ANGLE_SCALE)
+    assert parser.stats()["corrupt_frames"] == 1
+    assert parser.stats()["dropped_frames"] == 1
+
+
+def test_leading_garbage_is_skipped():
+    parser = frame_decoder.FrameParser()
+    decoded = parser.feed(b"\x01\x02\x03" + frames())["angle"]
+    assert np.allclose(decoded, ANGLES, atol=ANGLE_SCALE)
+    assert parser.stats()["skipped_bytes"] == 3
+
+
+@pytest.mark.parametrize("corruption", [0., 0.1, 0.3])
+@pytest.mark.parametrize("sizes", [[1], [7], [33], [FRAME_LEN], [5000], "random"])
+def test_results_do_not_depend_on_chunking(corruption, sizes):
+    stream = mixed_stream(300, corruption)
+    if sizes == "random":
+        sizes = np.random.default_rng(1).integers(1, 200, len(stream)).tolist()
+    else:
+        sizes = sizes * (len(stream) // sizes[0] + 1)
+    whole, expected = feed_in_chunks(stream, [len(stream)])
+    chunked, decoded = feed_in_chunks(stream, sizes)
+    assert chunked.stats() == whole.stats()
+    for name in expected:
+        assert np.array_equal(decoded[name], expected[name])
+
+
+@pytest.mark.parametrize("corruption", [0., 0.3])
+@pytest.mark.parametrize("size", [5, 100, frame_decoder.SCALAR_MAX_BYTES + 3, 3000])
+def test_scalar_and_vector_paths_agree(monkeypatch, corruption, size):
+    stream = mixed_stream(150, corruption, seed=2)[:size]
+    monkeypatch.setattr(frame_decoder, "SCALAR_MAX_BYTES", len(stream))
+    scalar, expected = feed_in_chunks(stream, [size])
+    monkeypatch.setattr(frame_decoder, "SCALAR_MAX_BYTES", -1)
+    vector, decoded = feed_in_chunks(stream, [size])
+    assert vector.stats() == scalar.stats()
+    for name in expected:
+        assert np.array_equal(decoded[name], expected[name])
@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+import lod_pyramid
+
+RATE = 1000.
+
+
+@pytest.fixture(scope="module")
+def session():
+    """Noise with positive and negative one-sample spikes, added in uneven batches"""
+    rng = np.random.default_rng(0)
+    n = 200000
+    times = np.arange(n) / RATE
+    values = rng.normal(0, 1, (n, 2)).astype(np.float32)
+    spikes = np.sort(rng.choice(n, 40, replace=False))
+    values[spikes[0::2], 0] = 100 + np.arange(20)
+    values[spikes[1::2], 1] = -100 - np.arange(20)
+    pyramid = lod_pyramid.MinMaxPyramid(2)
+    start = 0
+    while start < n:
+        stop = start + int(rng.integers(1, 5000))
+        pyramid.extend(times[start:stop], values[start:stop])
+        start = stop
+    return pyramid, times, values, spikes
+
+
+def test_levels_are_built(session):
+    pyramid, times, _, _ = session
+    assert len(pyramid) == len(times)
+    assert len(pyramid.levels) > 5
+    assert pyramid.levels[0].hi is pyramid.levels[0].lo  # Raw samples are stored once
+
+
+@pytest.mark.parametrize("t_start, t_end, width", [(0, 200, 500), (0, 200, 50), (13.7, 151.2, 300), (50, 52, 1000)])
+def test_every_spike_survives(session, t_start, t_end, width):
+    pyramid, times, values, spikes = session
+    x, y = pyramid.query(t_start, t_end, width)
+    assert len(x) <= 2 * width + 4
+    inside = spikes[(times[spikes] >= t_start) & (times[spikes] <= t_end)]
+    for spike in inside:
+        # The pixel column holding the spike's time reaches at least as far (two spikes may share it)
+        column = y[max(np.searchsorted(x, times[spike], side="right") - 2, 0):][:3]
+        if values[spike, 0] >= 100:
+            assert column[:, 0].max() >= values[spike, 0]
+        else:
+            assert column[:, 1].min() <= values[spike, 1]
+
+
+@pytest.mark.parametrize("t_start, t_end, width", [(0, 200, 500), (13.7, 151.2, 300), (199, 200, 100)])
+def test_extrema_match_the_raw_samples(session, t_start, t_end, width):
+    pyramid, times, values, _ = session
+    _, y = pyramid.query(t_start, t_end, width)
+    inside = values[(times >= t_start) & (times <= t_end)]
+    # Blocks straddling the edges may add a little from just outside, never lose anything inside
+    assert np.all(y.max(axis=0) >= inside.max(axis=0))
+    assert np.all(y.min(axis=0) <= inside.min(axis=0))
+
+
+def test_short_range_is_raw(session):
+    pyramid, times, values, _ = session
+    x, y = pyramid.query(10, 10.05, 1000)
+    first = np.searchsorted(times, 10, side="right") - 1
+    assert np.array_equal(x, times[first:first + len(x)])
+    assert np.array_equal(y, values[first:first + len(x)])
+
+
+def test_empty_pyramid():
+    x, y = lod_pyramid.MinMaxPyramid(3).query(0, 10, 100)
+    assert len(x) == 0 and y.shape == (0, 3)
@@ -0,0 +1,119 @@
+import time
+import numpy as np
+import pytest
+import net_stream
+from frame_decoder import ANGLE_SCALE
+
+
+def batch(n, start=0., seed=0):
+    rng = np.random.default_rng(seed)
+    times = start + np.arange(n) * 0.001
+    return times, rng.uniform(-180, 180, (n, 3)), rng.uniform(0, 100, n)
+
+
+def split(messages):
+    """(header, payload) of every message in encoded bytes"""
+    parts = []
+    while messages:
+        count = net_stream.HEADER.unpack_from(messages)[1]
+        size = net_stream.HEADER.size + count * net_stream.SAMPLE.itemsize
+        parts.append((messages[:net_stream.HEADER.size], messages[net_stream.HEADER.size:size]))
+        messages = messages[size:]
+    return parts
+
+
+def read(client, timeout=5.):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        received = client.read()
+        if received is not None:
+            return received
+    raise AssertionError("nothing received")
+
+
+def wait_for(condition, timeout=5.):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_encode_decode_round_trip():
+    times, angles, speeds = batch(100, 1.7e9)
+    (header, payload), = split(net_stream.encode(times, angles, speeds))
+    decoded_times, decoded_angles, decoded_speeds = net_stream.decode(header, payload)
+    assert np.allclose(decoded_times, times, atol=1e-6)
+    assert np.allclose(decoded_angles, angles, atol=ANGLE_SCALE)
+    assert np.allclose(decoded_speeds, speeds, atol=net_stream.SPEED_SCALE)
+
+
+def test_one_time_for_the_whole_batch():
+    _, angles, speeds = batch(5)
+    (header, payload), = split(net_stream.encode(12.5, angles, speeds))
+    times, _, _ = net_stream.decode(header, payload)
+    assert np.array_equal(times, np.full(5, 12.5))
+
+
+def test_large_batches_are_split():
+    times, angles, speeds = batch(net_stream.MAX_SAMPLES + 10)
+    parts = split(net_stream.encode(times, angles, speeds))
+    assert len(parts) == 2
+    decoded = np.concatenate([net_stream.decode(*part)[1] for part in parts])
+    assert np.allclose(decoded, angles, atol=ANGLE_SCALE)
+
+
+def test_bad_magic():
+    header, payload = split(net_stream.encode(*batch(3)))[0]
+    with pytest.raises(ValueError):
+        net_stream.decode(b"XX" + header[2:], payload)
+
+
+@pytest.fixture
+def server():
+    server = net_stream.StreamServer("127.0.0.1", 0, queue_size=4).start()
+    yield server
+    server.stop()
+
+
+def test_localhost_round_trip(server):
+    client = net_stream.StreamClient(*server.address)
+    try:
+        wait_for(lambda: server.clients)
+        sent = [batch(50, i, seed=i) for i in range(3)]
+        for times, angles, speeds in sent:
+            server.publish(times, angles, speeds)
+        for times, angles, speeds in sent:
+            received = read(client)
+            assert np.allclose(received[0], times, atol=1e-6)
+            assert np.allclose(received[1], angles, atol=ANGLE_SCALE)
+            assert np.allclose(received[2], speeds, atol=net_stream.SPEED_SCALE)
+        assert client.received == 150
+    finally:
+        client.close()
+
+
+def test_stalled_client_drops_oldest(server):
+    client = net_stream.StreamClient(*server.address)
+    try:
+        wait_for(lambda: server.clients)
+        # The client reads nothing while far more than the socket buffers can hold is published
+        count = 3000
+        start = time.perf_counter()
+        for i in range(count):
+            _, angles, speeds = batch(1000)
+            server.publish(float(i), angles, speeds)
+        assert time.perf_counter() - start < 5  # Publishing never waited on the client
+        wait_for(lambda: sum(dropped for _, dropped in server.client_stats().values()) > 0)
+
+        # Once it reads again, what it gets ends with the newest batches: the oldest queued were dropped
+        last = []
+        while True:
+            received = client.read()
+            if received is None:
+                break
+            last = (last + [int(received[0][0])])[-5:]
+        assert last[-4:] == list(range(count - 4, count))
+        queued, dropped = next(iter(server.client_stats().values()))
+        assert dropped > 0 and queued == 0
+    finally:
+        client.close()
@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+import orientation_filter
+from orientation_filter import OneEuroFilter, first_order, smoothing_gain, wrap_angle
+
+
+def first_order_loop(x, alpha, y0):
+    y = np.empty_like(x)
+    previous = np.array(y0, dtype=float)
+    for n in range(len(x)):
+        previous = (1 - alpha[n]) * previous + alpha[n] * x[n]
+        y[n] = previous
+    return y
+
+
+def one_euro_loop(values, period, min_cutoff, beta, d_cutoff):
+    """Per-sample One-Euro filter as published, for one channel"""
+    out = np.empty_like(values)
+    raw = value = values[0]
+    speed = 0.
+    for n, x in enumerate(values):
+        d_gain = smoothing_gain(d_cutoff, period)
+        speed = (1 - d_gain) * speed + d_gain * (x - raw) / period
+        gain = smoothing_gain(min_cutoff + beta * abs(speed), period)
+        value = (1 - gain) * value + gain * x
+        raw = x
+        out[n] = value
+    return out
+
+
+@pytest.mark.parametrize("low, high", [(0., 0.1), (0.5, 1.), (0.9, 1.)])  # Strong gains restart the products
+def test_first_order_matches_the_recurrence(low, high):
+    rng = np.random.default_rng(0)
+    x = rng.normal(0, 10, (5000, 3))
+    alpha = rng.uniform(low, high, x.shape)
+    y0 = np.array([1., -2., 3.])
+    assert np.allclose(first_order(x, alpha, y0), first_order_loop(x, alpha, y0))
+
+
+def test_first_order_batches_chain():
+    rng = np.random.default_rng(1)
+    x = rng.normal(0, 10, (1000, 2))
+    alpha = rng.uniform(0, 0.2, x.shape)
+    whole = first_order(x, alpha, np.zeros(2))
+    first = first_order(x[:300], alpha[:300], np.zeros(2))
+    second = first_order(x[300:], alpha[300:], first[-1])
+    assert np.allclose(np.vstack((first, second)), whole)
+
+
+def test_wrap_angle():
+    assert np.allclose(wrap_angle(np.array([-540., -181., -180., 0., 180., 181., 540.])),
+                       [180., 179., 180., 0., 180., -179., 180.])
+
+
+def test_one_euro_crossing_180_does_not_swing():
+    # Hovering around ±180°: the raw angles alternate between 179 and -179
+    values = np.tile([[179., 0., -179.], [-179., 0., 179.]], (200, 1))
+    one_euro = OneEuroFilter(min_cutoff=1., beta=0.)
+    filtered = np.vstack([one_euro(batch, 0.005) for batch in np.split(values, 40)])
+    assert np.all(np.abs(filtered[:, [0, 2]]) > 178)
+    assert np.all(np.abs(filtered) <= 180)
+
+
+def test_one_euro_steady_turn_through_180():
+    values = wrap_angle(np.arange(170., 200., 0.1))[:, None] * np.ones(3)
+    filtered = OneEuroFilter(min_cutoff=5., beta=0.)(values, 0.005)
+    steps = wrap_angle(np.diff(filtered, axis=0))
+    assert np.all(np.abs(steps) < 1)
+
+
+@pytest.mark.parametrize("beta", [0., 0.05, 1.])
+def test_one_euro_matches_the_per_sample_filter(beta):
+    rng = np.random.default_rng(2)
+    t = np.arange(2000) * 0.005
+    values = 60 * np.sin(2 * np.pi * 0.5 * t)[:, None] + rng.normal(0, 1, (len(t), 3))
+    one_euro = OneEuroFilter(min_cutoff=1., beta=beta)
+    filtered = np.vstack([one_euro(batch, 0.005) for batch in np.array_split(values, 37)])
+    for channel in range(3):
+        expected = one_euro_loop(values[:, channel], 0.005, 1., beta, orientation_filter.DERIVATIVE_CUTOFF)
+        assert np.allclose(filtered[:, channel], expected)
+
+
+def test_one_euro_cutoff_rises_with_speed():
+    t = np.arange(400) * 0.005
+    ramp = np.column_stack((t * 100, t * 100, t * 100)) - 100  # 100 °/s, -100 to 100
+    lag = {beta: ramp[-1, 0] - OneEuroFilter(min_cutoff=1., beta=beta)(ramp, 0.005)[-1, 0] for beta in (0., 0.5)}
+    assert 0 < lag[0.5] < lag[0.] / 5
+    # At rest the cutoff is min_cutoff: a first-order low-pass with that time constant
+    step = np.vstack((np.zeros((1, 3)), np.full((400, 3), 10.)))
+    filtered = OneEuroFilter(min_cutoff=1., beta=0.)(step, 0.005)
+    gain = smoothing_gain(1., 0.005)
+    assert np.allclose(filtered[1:, 0], 10 * (1 - (1 - gain) ** np.arange(1, 401)))
@@ -0,0 +1,46 @@
+import json
+import pytest
+import profile_store
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "profiles.json")
+
+
+def write(path, profiles, active=None):
+    with open(path, "w") as f:
+        json.dump({"active": active, "profiles": profiles}, f)
+
+
+def test_round_trip(path):
+    store = profile_store.ProfileStore(path)
+    store.put(profile_store.Profile("lane 1", port="COM7", axis=1, min_pos=(0, -20, 0), max_pos=(0, 25, 0),
+                                    expo=1.5, lut=[[0, 100], [0, 90]]))
+    profile = profile_store.ProfileStore(path).find()
+    assert profile.name == "lane 1" and profile.port == "COM7" and profile.axis == 1
+    assert profile.to_dict() == store.get("lane 1").to_dict()
+    assert profile.engine().calibrated
+
+
+def test_missing_file_is_empty(path):
+    assert profile_store.ProfileStore(path).names() == []
+
+
+@pytest.mark.parametrize("fields", [
+    {"port": "COM5", "colour": "red"},  # Unknown field
+    {"axis": "sideways"},
+    {"min_pos": 5},
+    {"window": 10, "max_pos": ["a", "b", "c"]},
+])
+def test_bad_profiles_raise_value_error(path, fields):
+    write(path, {"lane 1": fields})
+    with pytest.raises(ValueError, match="lane 1"):
+        profile_store.ProfileStore(path)
+
+
+def test_corrupt_file_raises_value_error(path):
+    with open(path, "w") as f:
+        f.write("{not json")
+    with pytest.raises(ValueError):
+        profile_store.ProfileStore(path)
@@ -0,0 +1,30 @@
+import pytest
+import session_analytics
+import speed_engine
+
+
+@pytest.fixture
+def recording(tmp_path):
+    path = tmp_path / "race.rec"
+    path.write_bytes(b"\0" * 64)
+    return str(path)
+
+
+def engine(**kwargs):
+    return speed_engine.SpeedEngine.from_axis((-30, 0, 0), (30, 0, 0), 0, **kwargs)
+
+
+def test_cache_key_is_stable(recording):
+    assert session_analytics.cache_key(recording, engine()) == session_analytics.cache_key(recording, engine())
+
+
+@pytest.mark.parametrize("curve", [dict(dead_zone=(5., 95.)), dict(expo=2.), dict(lut=([0, 100], [0, 80]))])
+def test_cache_key_covers_the_response_curve(recording, curve):
+    assert session_analytics.cache_key(recording, engine(**curve)) != session_analytics.cache_key(recording, engine())
+
+
+@pytest.mark.parametrize("name", ["RESAMPLE_RATE", "MIN_CORRELATION", "LAP_TOLERANCE", "LIFT_BELOW"])
+def test_cache_key_covers_detection_parameters(recording, monkeypatch, name):
+    before = session_analytics.cache_key(recording, engine())
+    monkeypatch.setattr(session_analytics, name, getattr(session_analytics, name) * 2)
+    assert session_analytics.cache_key(recording, engine()) != before
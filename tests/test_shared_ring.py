@@ -0,0 +1,114 @@
+import threading
+import numpy as np
+import pytest
+import acquisition_process
+
+
+@pytest.fixture
+def ring():
+    ring = acquisition_process.SharedRing(capacity=8)
+    yield ring
+    ring.close()
+    ring.unlink()
+
+
+def angles(start, n):
+    return np.arange(start, start + n, dtype=float)[:, None] * (1., 2., 3.)
+
+
+def test_reads_rows_in_order(ring):
+    ring.write(1., angles(0, 3))
+    ring.write(2., angles(3, 2))
+    times, values = ring.read_new()
+    assert times.tolist() == [1., 1., 1., 2., 2.]
+    assert np.array_equal(values, angles(0, 5))
+    assert ring.overruns == 0
+
+
+def test_nothing_new(ring):
+    ring.write(1., angles(0, 3))
+    ring.read_new()
+    times, values = ring.read_new()
+    assert len(times) == 0 and values.shape == (0, 3)
+
+
+def test_wraps_around(ring):
+    for start in range(0, 20, 4):
+        ring.write(float(start), angles(start, 4))
+        _, values = ring.read_new()
+        assert np.array_equal(values, angles(start, 4))
+    assert ring.overruns == 0
+
+
+def test_lapped_reader_counts_overruns(ring):
+    ring.write(1., angles(0, 6))
+    ring.write(2., angles(6, 6))
+    _, values = ring.read_new()
+    assert np.array_equal(values, angles(4, 8))
+    assert ring.overruns == 4
+
+
+def test_batch_larger_than_ring_counts_cut_rows(ring):
+    ring.write(1., angles(0, 20))
+    assert ring.sequence == 20
+    _, values = ring.read_new()
+    assert np.array_equal(values, angles(12, 8))
+    assert ring.overruns == 12
+
+    ring.write(2., angles(20, 2))
+    _, values = ring.read_new()
+    assert np.array_equal(values, angles(20, 2))
+    assert ring.overruns == 12
+
+
+def test_rows_of_a_write_in_progress_are_dropped(ring):
+    ring.write(1., angles(0, 8))
+    # The writer announced rows 8-10 and overwrote the first two slots, but hasn't published them yet
+    ring.header[acquisition_process.PENDING] = 11
+    ring.rows[[0, 1], 1:] = -1.
+    _, values = ring.read_new()
+    assert np.array_equal(values, angles(3, 5))
+    assert ring.overruns == 3
+
+
+def test_concurrent_writer_lapping_the_reader():
+    ring = acquisition_process.SharedRing(capacity=64)
+    total = 200000
+    done = threading.Event()
+
+    def write():
+        rng = np.random.default_rng(0)
+        start = 0
+        while start < total:
+            n = int(rng.integers(1, 100))
+            ring.write(float(start), angles(start, n))
+            start += n
+        done.set()
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    received = 0
+    try:
+        while not done.is_set() or ring.read_sequence < ring.sequence:
+            _, values = ring.read_new()
+            # Row k holds (k, 2k, 3k): a torn or lapped row can't be at its own sequence number
+            expected = angles(ring.read_sequence - len(values), len(values))
+            assert np.array_equal(values, expected)
+            received += len(values)
+    finally:
+        writer.join()
+        ring.close()
+        ring.unlink()
+    assert ring.overruns > 0
+    assert received + ring.overruns == ring.read_sequence
+
+
+def test_attach_by_name(ring):
+    reader = acquisition_process.SharedRing(name=ring.name)
+    try:
+        assert reader.capacity == ring.capacity
+        ring.write(1., angles(0, 3))
+        _, values = reader.read_new()
+        assert np.array_equal(values, angles(0, 3))
+    finally:
+        reader.close()
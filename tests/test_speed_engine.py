@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+import speed_engine
+
+
+def roll(*values):
+    return np.column_stack((values, np.zeros(len(values)), np.zeros(len(values))))
+
+
+def test_uncalibrated_engine_is_zero():
+    engine = speed_engine.SpeedEngine()
+    assert not engine.calibrated
+    assert np.array_equal(engine(roll(-90, 0, 90)), [0, 0, 0])
+
+
+@pytest.mark.parametrize("width", [0., speed_engine.MIN_SPAN / 2])
+def test_zero_width_calibration_stays_at_zero(width):
+    engine = speed_engine.SpeedEngine.from_axis((10, 0, 0), (10 + width, 0, 0), 0)
+    assert not engine.calibrated
+    speeds = engine(roll(9, 10, 11))
+    assert np.all(np.isfinite(speeds)) and np.array_equal(speeds, [0, 0, 0])
+
+
+def test_unused_axis_without_range_is_fine():
+    engine = speed_engine.SpeedEngine.from_axis((-30, 5, 5), (30, 5, 5), 0)
+    assert engine.calibrated
+    assert np.allclose(engine(roll(-30, 0, 30)), [0, 50, 100])
+
+
+def test_linear_mapping_is_clamped():
+    engine = speed_engine.SpeedEngine.from_axis((-30, 0, 0), (30, 0, 0), 0)
+    assert np.allclose(engine(roll(-60, -30, -15, 0, 30, 60)), [0, 0, 25, 50, 100, 100])
+
+
+def test_reversed_span():
+    engine = speed_engine.SpeedEngine.from_axis((30, 0, 0), (-30, 0, 0), 0)
+    assert engine.calibrated
+    assert np.allclose(engine(roll(60, 30, 15, 0, -30, -60)), [0, 0, 25, 50, 100, 100])
+
+
+def test_dead_zone():
+    engine = speed_engine.SpeedEngine.from_axis((0, 0, 0), (100, 0, 0), 0, dead_zone=(10., 90.))
+    assert np.allclose(engine(roll(0, 10, 50, 90, 100)), [0, 0, 50, 100, 100], atol=0.1)
+
+
+def test_expo():
+    engine = speed_engine.SpeedEngine.from_axis((0, 0, 0), (100, 0, 0), 0, expo=2.)
+    speeds = engine(roll(0, 25, 50, 75, 100))
+    expected = 100 * np.expm1(2 * np.array([0, .25, .5, .75, 1])) / np.expm1(2)
+    assert np.allclose(speeds, expected, atol=0.1)
+    assert speeds[2] < 50  # Softer start
+
+
+def test_lut_interpolation():
+    lut = ([0, 50, 100], [0, 20, 100])
+    engine = speed_engine.SpeedEngine.from_axis((0, 0, 0), (100, 0, 0), 0, lut=lut)
+    assert np.allclose(engine(roll(0, 25, 50, 75, 100)), [0, 10, 20, 60, 100], atol=0.1)
+
+
+def test_identity_curve_is_not_built():
+    assert speed_engine.SpeedEngine.from_axis((0, 0, 0), (100, 0, 0), 0)._curve is None
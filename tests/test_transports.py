@@ -0,0 +1,19 @@
+import pytest
+import serial
+import transports
+
+
+@pytest.mark.parametrize("port", ["synthetic://?rate=abc", "synthetic://?seed=1.5",
+                                  "replay:///no/such/capture.bin", "replay:///no/such/capture.bin?speed=fast"])
+def test_bad_port_strings_raise_serial_exception(port):
+    with pytest.raises(serial.SerialException):
+        transports.open_transport(port)
+
+
+def test_synthetic_options():
+    transport = transports.open_transport("synthetic://?rate=250&corruption=0.5&seed=3")
+    try:
+        assert isinstance(transport, transports.SyntheticTransport)
+        assert transport.rate == 250
+    finally:
+        transport.close()
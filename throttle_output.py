@@ -0,0 +1,144 @@
+import bisect
+import socket
+import struct
+import time
+from urllib.parse import urlsplit
+import numpy as np
+import transports
+
+THROTTLE_PACKET = struct.Struct("<If")  # Sequence number, speed %
+DEFAULT_BUDGET = 0.005  # Seconds from serial arrival to throttle command
+
+# Histogram bins: 1 µs to 1 s, 20 per decade
+BIN_EDGES = np.logspace(-6, 0, 121).tolist()
+
+
+class LocalSink(object):
+    """Stand-in when no controller is attached: keeps the last command"""
+
+    def __init__(self):
+        self.last = None
+
+    def send(self, packet):
+        self.last = packet
+
+    def close(self):
+        pass
+
+
+class SocketSink(object):
+    """Datagram sink (UDP or Unix socket). Never blocks: a full socket buffer drops the command"""
+
+    def __init__(self, family, address):
+        self.sock = socket.socket(family, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+        self.sock.connect(address)
+
+    def send(self, packet):
+        try:
+            self.sock.send(packet)
+        except BlockingIOError:
+            pass
+
+    def close(self):
+        self.sock.close()
+
+
+class SerialSink(object):
+    """Writes commands to a serial port (or any transport URL)"""
+
+    def __init__(self, port, baudrate=transports.DEFAULT_BAUDRATE):
+        self.ser = transports.open_transport(port, baudrate, write_timeout=0)
+
+    def send(self, packet):
+        self.ser.write(packet)
+
+    def close(self):
+        self.ser.close()
+
+
+def open_sink(url=None):
+    """None/local, udp://host:port, unix:///path/to/socket, or anything open_transport accepts"""
+    if not url or url == "local":
+        return LocalSink()
+    parts = urlsplit(url)
+    if parts.scheme == "udp":
+        return SocketSink(socket.AF_INET, (parts.hostname, parts.port))
+    if parts.scheme == "unix":
+        return SocketSink(socket.AF_UNIX, parts.path)
+    return SerialSink(url)
+
+
+class LatencyHistogram(object):
+    """Log-binned histogram of durations, O(log bins) per sample"""
+
+    def __init__(self):
+        self.counts = np.zeros(len(BIN_EDGES) + 1, dtype=np.int64)
+        self.total = 0
+
+    def add(self, seconds):
+        self.counts[bisect.bisect_left(BIN_EDGES, seconds)] += 1
+        self.total += 1
+
+    def percentile(self, q):
+        """Upper edge (seconds) of the bin holding the q-th percentile, nan while empty"""
+        if not self.total:
+            return float("nan")
+        index = int(np.searchsorted(np.cumsum(self.counts), q / 100 * self.total))
+        return BIN_EDGES[min(index, len(BIN_EDGES) - 1)]
+
+
+class LatencyTracker(object):
+    """Latency from serial arrival to each later stage of the pipeline.
+
+    Stamps are time.perf_counter() values keyed by stage. Stages missing from a set of stamps (for
+    example 'decoded' when decoding happened in another process) are simply not recorded."""
+
+    STAGES = ("decoded", "speed", "emitted")
+
+    def __init__(self, budget=DEFAULT_BUDGET):
+        self.budget = budget
+        self.histograms = {stage: LatencyHistogram() for stage in self.STAGES}
+        self.over_budget = 0
+
+    def record(self, stamps):
+        arrival = stamps["arrival"]
+        for stage in self.STAGES:
+            if stage in stamps:
+                self.histograms[stage].add(stamps[stage] - arrival)
+        if "emitted" in stamps and stamps["emitted"] - arrival > self.budget:
+            self.over_budget += 1
+
+    def summary(self):
+        """p50/p99 in milliseconds and sample count per stage"""
+        return {
+            stage: {
+                "p50_ms": histogram.percentile(50) * 1e3,
+                "p99_ms": histogram.percentile(99) * 1e3,
+                "count": histogram.total,
+            }
+            for stage, histogram in self.histograms.items()
+        }
+
+
+class ThrottleOutput(object):
+    """Sends each new speed to the car controller straight from the acquisition path.
+    Sink errors are counted, never raised, so a missing controller can't stall acquisition"""
+
+    def __init__(self, sink=None, budget=DEFAULT_BUDGET):
+        self.sink = LocalSink() if sink is None else sink
+        self.latency = LatencyTracker(budget)
+        self.sequence = 0
+        self.errors = 0
+
+    def emit(self, speed, stamps):
+        try:
+            self.sink.send(THROTTLE_PACKET.pack(self.sequence & 0xFFFFFFFF, speed))
+        except OSError:
+            self.errors += 1
+        self.sequence += 1
+        stamps["emitted"] = time.perf_counter()
+        self.latency.record(stamps)
+
+    def close(self):
+        self.sink.close()
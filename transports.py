@@ -0,0 +1,264 @@
+"""Byte sources the readers can consume like a pyserial port (read, in_waiting, close).
+
+open_transport() picks the backend from a port string:
+    COM5, /dev/ttyUSB0, socket://host:port, loop://   -> pyserial (serial_for_url)
+    synthetic://?rate=500&corruption=0.01&seed=1       -> generated IMU stream
+    replay:///path/to/capture.bin?speed=4&loop=1       -> raw byte capture or session recording
+PtyLoopback feeds any of the simulated sources through a pseudo-terminal, so the real pyserial code
+path can be exercised on a Linux box without hardware."""
+import os
+import threading
+import time
+from urllib.parse import urlsplit, parse_qsl
+import numpy as np
+import serial
+import frame_decoder
+import session_recorder
+from frame_decoder import FRAME_LEN, ACCEL_ID, GYRO_ID, ANGLE_ID
+
+DEFAULT_PORT = "COM5"
+DEFAULT_BAUDRATE = 115200
+
+
+def open_transport(port=DEFAULT_PORT, baudrate=DEFAULT_BAUDRATE, **kwargs):
+    """Open the backend matching the port string. Raises serial.SerialException on failure, malformed
+    options included, so callers handling a failed connection also handle a mistyped port string"""
+    try:
+        return _open_backend(port, baudrate, **kwargs)
+    except ValueError as e:
+        raise serial.SerialException(f"Bad port {port}: {e}")
+
+
+def _open_backend(port, baudrate, **kwargs):
+    parts = urlsplit(port)
+    options = dict(parse_qsl(parts.query))
+    options.update(kwargs)
+    if parts.scheme == "synthetic":
+        return SyntheticTransport(
+            rate=float(options.get("rate", SyntheticTransport.DEFAULT_RATE)),
+            corruption=float(options.get("corruption", 0)),
+            seed=int(options["seed"]) if "seed" in options else None,
+            timeout=kwargs.get("timeout"),
+        )
+    if parts.scheme == "replay" and _is_session(parts.netloc + parts.path):
+        return SessionReplayTransport(
+            parts.netloc + parts.path,
+            speed=float(options.get("speed", 1)),
+            loop=bool(int(options.get("loop", 0))),
+            timeout=kwargs.get("timeout"),
+        )
+    if parts.scheme == "replay":
+        return ReplayTransport(
+            parts.netloc + parts.path,
+            rate=float(options.get("rate", ReplayTransport.DEFAULT_RATE)),
+            speed=float(options.get("speed", 1)),
+            loop=bool(int(options.get("loop", 0))),
+            timeout=kwargs.get("timeout"),
+        )
+    return serial.serial_for_url(port, baudrate=baudrate, **kwargs)
+
+
+def _is_session(path):
+    try:
+        return session_recorder.is_session_file(path)
+    except OSError as e:
+        raise serial.SerialException(f"Could not open replay file {path}: {e}")
+
+
+class PacedTransport(object):
+    """Base class of the simulated transports: bytes become readable at a fixed rate, like on a real port.
+
+    Subclasses implement _produce(n) returning the bytes of the next n units (samples or frames) and
+    set self.exhausted when there is nothing left. A rate of 0 releases data as fast as it is read."""
+
+    UNPACED_BATCH = 1000  # Units released per read when unpaced
+
+    def __init__(self, rate, timeout=None):
+        self.rate = rate
+        self.poll_interval = 1 / rate if rate else 0  # Sleep while waiting for more data
+        self.timeout = timeout  # pyserial semantics: None blocks until size bytes were read
+        self.is_open = True
+        self.exhausted = False
+        self._buffer = bytearray()
+        self._t0 = None
+        self._released = 0  # Units handed to the buffer so far
+
+    def _produce(self, n):
+        raise NotImplementedError
+
+    def _due(self, elapsed):
+        """Number of units that should have been released after `elapsed` seconds"""
+        return int(elapsed * self.rate)
+
+    def _pump(self):
+        now = time.perf_counter()
+        if self._t0 is None:
+            self._t0 = now
+        if self.rate:
+            due = self._due(now - self._t0) - self._released
+        else:
+            due = self.UNPACED_BATCH
+        if due > 0 and not self.exhausted:
+            self._buffer += self._produce(due)
+            self._released += due
+
+    @property
+    def in_waiting(self):
+        self._pump()
+        return len(self._buffer)
+
+    def read(self, size=1):
+        deadline = None if self.timeout is None else time.perf_counter() + self.timeout
+        self._pump()
+        while len(self._buffer) < size and not self.exhausted and self.is_open:
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+            time.sleep(self.poll_interval)
+            self._pump()
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+    def write(self, data):
+        return len(data)
+
+    def reset_input_buffer(self):
+        self._buffer.clear()
+
+    def close(self):
+        self.is_open = False
+
+
+class SyntheticTransport(PacedTransport):
+    """Simulated IMU sending accel, gyro and angle packets for a slow sinusoidal motion.
+    A fraction `corruption` of the frames gets one byte flipped, so its checksum fails"""
+
+    DEFAULT_RATE = 200  # Samples/s, each sample is three frames
+
+    def __init__(self, rate=DEFAULT_RATE, corruption=0., seed=None, timeout=None):
+        super(SyntheticTransport, self).__init__(rate, timeout=timeout)
+        self.corruption = corruption
+        self.rng = np.random.default_rng(seed)
+        self.sample_period = 1 / rate if rate else 1 / self.DEFAULT_RATE
+
+    def _produce(self, n):
+        t = (self._released + np.arange(n)) * self.sample_period
+        w = 2 * np.pi * np.array([0.5, 0.3, 0.1])  # Roll, pitch, yaw frequencies
+        amplitude = np.array([30., 20., 90.])
+        angles = amplitude * np.sin(np.outer(t, w))
+        gyro = amplitude * w * np.cos(np.outer(t, w))
+        roll, pitch = np.radians(angles[:, 0]), np.radians(angles[:, 1])
+        accel = np.column_stack((-np.sin(pitch), np.sin(roll) * np.cos(pitch), np.cos(roll) * np.cos(pitch)))
+
+        frames = np.stack((
+            frame_decoder.encode_frames(ACCEL_ID, accel),
+            frame_decoder.encode_frames(GYRO_ID, gyro),
+            frame_decoder.encode_frames(ANGLE_ID, angles),
+        ), axis=1).reshape(-1, FRAME_LEN)
+
+        if self.corruption:
+            hit = np.flatnonzero(self.rng.random(len(frames)) < self.corruption)
+            columns = self.rng.integers(0, FRAME_LEN, size=hit.size)
+            frames[hit, columns] ^= self.rng.integers(1, 256, size=hit.size, dtype=np.uint8)
+        return frames.tobytes()
+
+
+class ReplayTransport(PacedTransport):
+    """Replays a raw byte capture of the serial port, paced at `rate` frames/s times `speed`.
+    A speed of 0 replays as fast as the reader can consume"""
+
+    DEFAULT_RATE = 600  # Frames/s, a 200 Hz IMU sending three packets per sample
+
+    def __init__(self, path, rate=DEFAULT_RATE, speed=1., loop=False, timeout=None):
+        super(ReplayTransport, self).__init__(rate * speed, timeout=timeout)
+        try:
+            with open(path, "rb") as f:
+                self.data = f.read()
+        except OSError as e:
+            raise serial.SerialException(f"Could not open replay file {path}: {e}")
+        self.loop = loop
+        self._offset = 0
+
+    def _produce(self, n):
+        chunk = bytearray()
+        wanted = n * FRAME_LEN
+        while len(chunk) < wanted:
+            piece = self.data[self._offset:self._offset + wanted - len(chunk)]
+            chunk += piece
+            self._offset += len(piece)
+            if self._offset >= len(self.data):
+                if not self.loop or not self.data:
+                    self.exhausted = True
+                    break
+                self._offset = 0
+        return bytes(chunk)
+
+
+class SessionReplayTransport(PacedTransport):
+    """Replays a session recording with its original timing (scaled by `speed`) from a memory map.
+    A speed of 0 replays as fast as the reader can consume"""
+
+    def __init__(self, path, speed=1., loop=False, timeout=None):
+        super(SessionReplayTransport, self).__init__(speed, timeout=timeout)
+        self.poll_interval = 0.001 if speed else 0
+        try:
+            self.session = session_recorder.SessionReader(path)
+        except (OSError, ValueError) as e:
+            raise serial.SerialException(f"Could not open session {path}: {e}")
+        self.loop = loop
+        self._offset = 0  # Next record to release
+        self._lap_start = 0  # _released value when the current pass over the session began
+        self._elapsed_offset = 0.  # Session time covered by the previous passes
+
+    def _due(self, elapsed):
+        times = self.session.times
+        if not len(times):
+            return 0
+        session_time = times[0] + elapsed * self.rate - self._elapsed_offset
+        return self._lap_start + int(np.searchsorted(times, session_time, side="right"))
+
+    def _produce(self, n):
+        stop = min(self._offset + n, len(self.session))
+        data = self.session.raw_bytes(self._offset, stop)
+        self._offset = stop
+        if self._offset >= len(self.session):
+            if self.loop and len(self.session):
+                self._offset = 0
+                self._lap_start = self._released + n
+                self._elapsed_offset += self.session.duration
+            else:
+                self.exhausted = True
+        return data
+
+
+class PtyLoopback(object):
+    """Copies a simulated transport into a pseudo-terminal (Linux/macOS only).
+    Open self.port with pyserial to read it exactly like a physical device"""
+
+    def __init__(self, source):
+        import pty
+        import tty
+        self.source = source
+        self._master, self._slave = pty.openpty()
+        tty.setraw(self._slave)
+        self.port = os.ttyname(self._slave)
+
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set() and not self.source.exhausted:
+            data = self.source.read(max(self.source.in_waiting, 1))
+            if data:
+                os.write(self._master, data)
+
+    def open(self, baudrate=DEFAULT_BAUDRATE, **kwargs):
+        return serial.Serial(self.port, baudrate=baudrate, **kwargs)
+
+    def close(self):
+        self._stop.set()
+        self.source.close()
+        self._thread.join(timeout=1)
+        os.close(self._master)
+        os.close(self._slave)